@@ -0,0 +1,222 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+
+from metrics import AUTH_LOOKUP_SECONDS
+
+logger = logging.getLogger(__name__)
+
+AUTH_CACHE_TTL = 60.0
+AUTH_CACHE_MAX_SIZE = 10000
+
+
+def parse_authorization_time(value):
+    # Handle the different timestamp shapes Firestore and the admin panel store
+    if hasattr(value, 'timestamp'):
+        # Firestore Timestamp object
+        parsed = datetime.fromtimestamp(value.timestamp())
+    elif isinstance(value, dict) and '_seconds' in value:
+        # Firestore Timestamp as dict
+        parsed = datetime.fromtimestamp(value['_seconds'])
+    elif isinstance(value, str):
+        parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    else:
+        parsed = datetime.fromisoformat(str(value).replace('Z', '+00:00'))
+
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(None)
+    return parsed.replace(tzinfo=None)
+
+
+class AuthorizationEntry:
+    """A visitor document (or its absence) with the authorizationTill window parsed once."""
+
+    __slots__ = ("plate", "doc_id", "visitor", "auth_from", "auth_to", "parse_error", "loaded_at")
+
+    def __init__(self, plate, doc_id=None, visitor=None):
+        self.plate = plate
+        self.doc_id = doc_id
+        self.visitor = visitor
+        self.auth_from = None
+        self.auth_to = None
+        self.parse_error = None
+        self.loaded_at = time.monotonic()
+
+        if visitor:
+            authorization_till = visitor.get("authorizationTill") or {}
+            try:
+                if authorization_till.get("from"):
+                    self.auth_from = parse_authorization_time(authorization_till["from"])
+                if authorization_till.get("to"):
+                    self.auth_to = parse_authorization_time(authorization_till["to"])
+            except Exception as e:
+                self.parse_error = e
+
+    def status(self, current_time=None):
+        plate = self.plate
+        visitor = self.visitor
+        if not visitor:
+            logger.debug("Vehicle %s: UNAUTHORIZED (not found in visitor database)", plate)
+            return "unauthorized"
+
+        visitor_type = visitor.get("visitorType", "").lower()
+        is_approved = visitor.get("isApproved", True)
+
+        if visitor_type == "authorized":
+            # Authorized vehicles are always allowed (no time restrictions)
+            logger.debug("Vehicle %s: AUTHORIZED (permanent access)", plate)
+            return "authorized"
+
+        if visitor_type != "visitor" or not is_approved:
+            logger.debug("Vehicle %s: UNAUTHORIZED (visitor not approved or wrong visitor type)", plate)
+            return "unauthorized"
+
+        # Visitor vehicles need time-based validation
+        current_time = (current_time or datetime.utcnow()).replace(tzinfo=None)
+        if self.parse_error is not None:
+            logger.warning("Vehicle %s: error parsing authorization times: %s", plate, self.parse_error)
+            within_time_period = False
+        elif self.auth_from is None and self.auth_to is None:
+            # No time restrictions specified - treat as unauthorized for safety
+            logger.debug("Vehicle %s: no authorization time period specified", plate)
+            within_time_period = False
+        elif self.auth_from is not None and current_time < self.auth_from:
+            logger.debug("Vehicle %s: current time %s is before authorized time %s", plate, current_time, self.auth_from)
+            within_time_period = False
+        elif self.auth_to is not None and current_time > self.auth_to:
+            logger.debug("Vehicle %s: current time %s is after authorized time %s", plate, current_time, self.auth_to)
+            within_time_period = False
+        else:
+            within_time_period = True
+
+        if within_time_period:
+            logger.debug("Vehicle %s: VISITOR (authorized within time period)", plate)
+            return "visitor"
+        logger.debug("Vehicle %s: UNAUTHORIZED (visitor outside allowed time period)", plate)
+        return "unauthorized"
+
+
+class AuthorizationCache:
+    """Plate -> visitor lookup cache with TTL, LRU eviction and change-feed invalidation.
+
+    `visitors` only needs `find_by_plate(plate)` and, for invalidation, `watch(callback)`
+    (see storage.py), so a small fake works in tests.
+    """
+
+    def __init__(self, visitors, ttl=AUTH_CACHE_TTL, max_size=AUTH_CACHE_MAX_SIZE):
+        self.visitors = visitors
+        self.ttl = ttl
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._plate_by_doc = {}
+        # Bumped by every invalidate(); a lookup that raced with one does not store its result
+        self._generation = 0
+        self._lock = threading.Lock()
+        self._watch = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def _fetch(self, plate):
+        found = self.visitors.find_by_plate(plate)
+        if found is None:
+            return AuthorizationEntry(plate)
+        doc_id, visitor = found
+        return AuthorizationEntry(plate, doc_id, visitor)
+
+    def get(self, plate):
+        start = time.perf_counter()
+        with self._lock:
+            entry = self._entries.get(plate)
+            if entry is not None:
+                if time.monotonic() - entry.loaded_at < self.ttl:
+                    self._entries.move_to_end(plate)
+                    self.hits += 1
+                    AUTH_LOOKUP_SECONDS.observe(time.perf_counter() - start, result="hit")
+                    return entry
+                self._remove(plate)
+                self.expirations += 1
+            self.misses += 1
+            generation = self._generation
+
+        # Query outside the lock so one slow lookup does not block other plates
+        entry = self._fetch(plate)
+
+        with self._lock:
+            # A change that arrived during the query may not be in its result, so it is not cached
+            if generation == self._generation:
+                self._entries[plate] = entry
+                self._entries.move_to_end(plate)
+                if entry.doc_id is not None:
+                    self._plate_by_doc[entry.doc_id] = plate
+                while len(self._entries) > self.max_size:
+                    _, old_entry = self._entries.popitem(last=False)
+                    self._forget_doc(old_entry)
+                    self.evictions += 1
+        AUTH_LOOKUP_SECONDS.observe(time.perf_counter() - start, result="miss")
+        return entry
+
+    def get_status(self, plate, current_time=None):
+        try:
+            return self.get(plate).status(current_time)
+        except Exception as e:
+            logger.error("Visitor lookup error for plate %s: %s", plate, e)
+            return "unauthorized"
+
+    def _forget_doc(self, entry):
+        if entry.doc_id is not None and self._plate_by_doc.get(entry.doc_id) == entry.plate:
+            del self._plate_by_doc[entry.doc_id]
+
+    def _remove(self, plate):
+        entry = self._entries.pop(plate, None)
+        if entry is not None:
+            self._forget_doc(entry)
+
+    def invalidate(self, plate=None, doc_id=None):
+        with self._lock:
+            self._generation += 1
+            if plate is None and doc_id is None:
+                self.invalidations += len(self._entries)
+                self._entries.clear()
+                self._plate_by_doc.clear()
+                return
+            for key in {plate, self._plate_by_doc.get(doc_id)}:
+                if key is not None and key in self._entries:
+                    self._remove(key)
+                    self.invalidations += 1
+
+    def _on_changes(self, changes):
+        # Drop both the new plate and whatever plate the document used to have
+        for doc_id, visitor, removed in changes:
+            self.invalidate(plate=(visitor or {}).get("plate"), doc_id=doc_id)
+
+    def start_listener(self):
+        if self._watch is None:
+            self._watch = self.visitors.watch(self._on_changes)
+        return self._watch
+
+    def stop_listener(self):
+        if self._watch is not None:
+            self._watch.unsubscribe()
+            self._watch = None
+
+    def stats(self):
+        with self._lock:
+            size = len(self._entries)
+        lookups = self.hits + self.misses
+        return {
+            "size": size,
+            "max_size": self.max_size,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "invalidations": self.invalidations,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "listening": self._watch is not None,
+        }
@@ -0,0 +1,64 @@
+"""Scaling of chunked /process-video decoding across worker processes.
+
+Runs the same long video with 1, 2, 4, ... workers and checks that every run finds the same
+plate readings at the same frames as the single-worker run. Uses the server defaults (motion
+sampling, tracking, CHUNK_OVERLAP_FRAMES); --sampling fixed --no-tracking --overlap 0 is the
+stateless configuration, where the readings must match exactly.
+
+Usage (from the API directory):
+    python benchmarks/chunked_video_benchmark.py long_video.mp4 --workers 1 2 4 8
+    python benchmarks/chunked_video_benchmark.py long_video.mp4 --overlap 0    # chunks without warm-up
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from sampling import SAMPLING_MODE  # noqa: E402
+from tracking import TRACKING_ENABLED  # noqa: E402
+from video_chunks import (  # noqa: E402
+    CHUNK_OVERLAP_FRAMES, count_frames, create_video_pool, merge_detections, submit_chunks,
+)
+
+
+def run(video, workers, weights, sampling, tracking, overlap):
+    with create_video_pool(weights, workers) as pool:
+        # Load the models in every worker before timing
+        list(pool.map(abs, range(workers)))
+        total_frames = count_frames(video)
+        start = time.perf_counter()
+        futures = submit_chunks(pool, video, total_frames, workers, sampling=sampling, tracking=tracking,
+                                overlap=overlap)
+        detections = merge_detections([f.result() for f in futures], overlap)
+        return time.perf_counter() - start, [(n, text) for n, _, text, _ in detections], len(futures)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("video")
+    parser.add_argument("--weights", default="weights/license_plate_detector.pt")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, os.cpu_count() or 4])
+    parser.add_argument("--sampling", default=SAMPLING_MODE, choices=["fixed", "motion"])
+    parser.add_argument("--tracking", action=argparse.BooleanOptionalAction, default=TRACKING_ENABLED)
+    parser.add_argument("--overlap", type=int, default=CHUNK_OVERLAP_FRAMES, help="warm-up frames per chunk")
+    args = parser.parse_args()
+    print(f"sampling={args.sampling} tracking={args.tracking} overlap={args.overlap}")
+
+    baseline_seconds, baseline = None, None
+    print(f"{'workers':>8} {'chunks':>7} {'seconds':>9} {'speedup':>8} {'same readings':>14} {'same plates':>12} "
+          f"{'missing':>8} {'extra':>6}")
+    for workers in args.workers:
+        seconds, detections, chunks = run(args.video, workers, args.weights, args.sampling, args.tracking,
+                                          args.overlap)
+        if baseline is None:
+            baseline_seconds, baseline = seconds, detections
+        # Plates are what ends up logged, readings also compare the frame each plate was released at
+        plates, baseline_plates = {text for _, text in detections}, {text for _, text in baseline}
+        print(f"{workers:>8} {chunks:>7} {seconds:>9.1f} {baseline_seconds / seconds:>8.2f} "
+              f"{str(detections == baseline):>14} {str(plates == baseline_plates):>12} "
+              f"{len(baseline_plates - plates):>8} {len(plates - baseline_plates):>6}")
+
+
+if __name__ == "__main__":
+    main()
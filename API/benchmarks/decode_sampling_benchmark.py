@@ -0,0 +1,84 @@
+"""Time spent reading a video when every frame is read() vs grab()bing skipped frames vs seeking past them.
+
+Only the decode is measured (no YOLO / OCR); every mode must return the same sampled frame numbers.
+The seek mode shows where the measured seek/grab crossover lands for each clip's keyframe interval.
+
+Usage (from the API directory):
+    python benchmarks/decode_sampling_benchmark.py clip1.mp4 [clip2.mp4 ...] [--stride 25] [--lowres 1]
+"""
+import argparse
+import os
+import sys
+import time
+
+import cv2
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from detection import SEEK_MIN_GAP, iter_sampled_frames, open_video  # noqa: E402
+from sampling import FixedSampler  # noqa: E402
+
+
+def read_every_frame(video, stride):
+    # The previous loop: full read() (decode + BGR conversion) of every frame
+    cap = cv2.VideoCapture(video, cv2.CAP_FFMPEG)
+    sampled, frame_count = [], 0
+    try:
+        while True:
+            ret, _ = cap.read()
+            if not ret:
+                break
+            frame_count += 1
+            if frame_count % stride == 0:
+                sampled.append(frame_count)
+    finally:
+        cap.release()
+    return sampled, frame_count
+
+
+def read_sampled(video, stride, seek_gap, lowres=0):
+    cap = open_video(video, lowres)
+    sampler = FixedSampler(stride)
+    try:
+        sampled = [n for n, _, _ in iter_sampled_frames(cap, sampler=sampler, seek_gap=seek_gap)]
+    finally:
+        cap.release()
+    return sampled, sampler.frames_seen
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("videos", nargs="+")
+    parser.add_argument("--stride", type=int, default=25)
+    parser.add_argument("--seek-gap", type=int, default=SEEK_MIN_GAP,
+                        help="minimum gap for the seek mode; it then seeks only while seeking measures faster")
+    parser.add_argument("--lowres", type=int, default=0, help="also run grab mode with FFmpeg lowres decoding")
+    args = parser.parse_args()
+
+    modes = [
+        ("read", lambda video: read_every_frame(video, args.stride)),
+        ("grab", lambda video: read_sampled(video, args.stride, 0)),
+        ("seek", lambda video: read_sampled(video, args.stride, args.seek_gap)),
+    ]
+    if args.lowres:
+        modes.append((f"lowres{args.lowres}", lambda video: read_sampled(video, args.stride, 0, args.lowres)))
+
+    print(f"{'clip':<30} {'mode':<8} {'frames':>7} {'sampled':>8} {'seconds':>8} {'ms/sample':>10} {'speedup':>8}")
+    for video in args.videos:
+        name = os.path.basename(video)[:30]
+        baseline_seconds, baseline_sampled = None, None
+        for mode, run in modes:
+            start = time.perf_counter()
+            sampled, frames = run(video)
+            seconds = time.perf_counter() - start
+            if baseline_seconds is None:
+                baseline_seconds, baseline_sampled = seconds, sampled
+            speedup = baseline_seconds / max(seconds, 1e-9)
+            print(f"{name:<30} {mode:<8} {frames:>7} {len(sampled):>8} {seconds:>8.2f} "
+                  f"{1000 * seconds / max(len(sampled), 1):>10.2f} {speedup:>7.1f}x")
+            if sampled != baseline_sampled:
+                print(f"  {mode}: sampled frames differ from read() "
+                      f"({len(set(sampled) ^ set(baseline_sampled))} mismatches)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""Per-frame latency and throughput of the plate detector backends on CPU.
+
+Compares ultralytics (PyTorch), ONNX Runtime and OpenVINO on frames sampled from a clip and
+checks that the exported backends find the same boxes as ultralytics (IoU >= --tolerance).
+
+Usage (from the API directory):
+    python benchmarks/detector_backend_benchmark.py clip.mp4 --threads 4 --batch 1 8
+"""
+import argparse
+import os
+import sys
+import time
+
+import cv2
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from detection import iter_batches, iter_sampled_frames  # noqa: E402
+from detector_backends import create_detector  # noqa: E402
+from tracking import iou  # noqa: E402
+
+
+def load_frames(video, stride, limit):
+    cap = cv2.VideoCapture(video, cv2.CAP_FFMPEG)
+    frames = []
+    try:
+        for _, frame, _ in iter_sampled_frames(cap, stride):
+            frames.append(frame)
+            if len(frames) >= limit:
+                break
+    finally:
+        cap.release()
+    if not frames:
+        raise SystemExit(f"No frames read from {video}")
+    return frames
+
+
+def matches(reference, boxes, tolerance):
+    # Every reference box has a partner with IoU >= tolerance and the counts agree
+    if len(reference) != len(boxes):
+        return False
+    return all(any(iou(r, b) >= tolerance for b in boxes) for r in reference)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("video")
+    parser.add_argument("--weights", default="weights/license_plate_detector.pt")
+    parser.add_argument("--backends", nargs="+", default=["ultralytics", "onnx", "openvino"])
+    parser.add_argument("--threads", type=int, default=0)
+    parser.add_argument("--batch", type=int, nargs="+", default=[1, 8])
+    parser.add_argument("--frames", type=int, default=64)
+    parser.add_argument("--stride", type=int, default=25)
+    parser.add_argument("--tolerance", type=float, default=0.9)
+    args = parser.parse_args()
+
+    frames = load_frames(args.video, args.stride, args.frames)
+    reference = None
+    print(f"{len(frames)} frames, threads={args.threads or 'default'}")
+    print(f"{'backend':<12} {'batch':>5} {'warm-up s':>10} {'ms/frame':>9} {'frames/s':>9} {'match':>7}")
+    for name in args.backends:
+        start = time.perf_counter()
+        try:
+            detector = create_detector(name, args.weights, args.threads)
+        except RuntimeError as e:
+            print(f"{name:<12} unavailable ({e})")
+            continue
+        detector.warmup()
+        warmup = time.perf_counter() - start
+
+        for batch_size in args.batch:
+            start = time.perf_counter()
+            boxes = [b for batch in iter_batches(frames, batch_size) for b in detector.detect(batch)]
+            elapsed = time.perf_counter() - start
+            if reference is None:
+                reference = boxes
+            agree = sum(matches(r, b, args.tolerance) for r, b in zip(reference, boxes))
+            print(f"{name:<12} {batch_size:>5} {warmup:>10.2f} {1000 * elapsed / len(frames):>9.2f} "
+                  f"{len(frames) / elapsed:>9.2f} {agree:>3}/{len(frames)}")
+
+
+if __name__ == "__main__":
+    main()
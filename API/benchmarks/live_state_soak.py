@@ -0,0 +1,93 @@
+"""Soak check: memory of seen_vehicles and live_feed_logs over a simulated week of 24/7 live feed.
+
+Replays synthetic plate readings (regular visitors plus random OCR garbage) on a simulated clock
+through SeenVehicles and EventLog and samples traced memory once per simulated day. Exits with
+status 1 if memory after the first day grows by more than --tolerance. --baseline runs the old
+dict of ISO strings + list of logs for comparison.
+
+Usage (from the API directory):
+    python benchmarks/live_state_soak.py [--days 7] [--events-per-minute 20] [--garbage 0.3] [--baseline]
+"""
+import argparse
+import os
+import random
+import string
+import sys
+import tracemalloc
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from live_state import LOG_DEDUP_SECONDS, EventLog, SeenVehicles  # noqa: E402
+
+
+class DictSeenVehicles:
+    # The previous structure: one dict of ISO strings per plate ever logged
+    def __init__(self):
+        self._vehicles = {}
+
+    def __len__(self):
+        return len(self._vehicles)
+
+    def logged_within(self, plate, when, seconds):
+        vehicle = self._vehicles.get(plate)
+        return vehicle is not None and when - datetime.fromisoformat(vehicle["last_logged_time"]) < timedelta(seconds=seconds)
+
+    def record(self, plate, when, status):
+        self._vehicles[plate] = {"last_logged_time": when.isoformat(), "last_status": status}
+
+
+def random_plate(rng):
+    return "".join(rng.choice(string.ascii_uppercase + string.digits) for _ in range(rng.randint(4, 10)))
+
+
+def soak(days, events_per_minute, garbage, visitors, baseline, seed=1):
+    rng = random.Random(seed)
+    regulars = [random_plate(rng) for _ in range(visitors)]
+    seen, events = (DictSeenVehicles(), []) if baseline else (SeenVehicles(), EventLog())
+    clock = datetime(2024, 1, 1)
+    step = timedelta(seconds=60.0 / events_per_minute)
+    per_day = int(24 * 60 * events_per_minute)
+
+    tracemalloc.start()
+    samples = []
+    for day in range(days):
+        for _ in range(per_day):
+            clock += step
+            plate = random_plate(rng) if rng.random() < garbage else rng.choice(regulars)
+            if seen.logged_within(plate, clock, LOG_DEDUP_SECONDS):
+                continue
+            seen.record(plate, clock, "entry")
+            events.append({"plate": plate, "status": "entry", "timestamp": clock.isoformat(),
+                           "snapshot_url": f"http://localhost:8000/snapshots/{plate}.jpg"})
+        current, _ = tracemalloc.get_traced_memory()
+        samples.append((day + 1, current, len(seen), len(events)))
+    tracemalloc.stop()
+    return samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--days", type=int, default=7)
+    parser.add_argument("--events-per-minute", type=float, default=20)
+    parser.add_argument("--garbage", type=float, default=0.3, help="fraction of readings that are random strings")
+    parser.add_argument("--visitors", type=int, default=2000)
+    parser.add_argument("--tolerance", type=float, default=0.1, help="allowed growth after day 1")
+    parser.add_argument("--baseline", action="store_true")
+    args = parser.parse_args()
+
+    samples = soak(args.days, args.events_per_minute, args.garbage, args.visitors, args.baseline)
+    print(f"{'day':>4} {'traced MB':>10} {'plates':>9} {'events':>9}")
+    for day, current, plates, events in samples:
+        print(f"{day:>4} {current / 1e6:>10.2f} {plates:>9} {events:>9}")
+
+    first, last = samples[0][1], samples[-1][1]
+    growth = (last - first) / max(first, 1)
+    print(f"growth after day 1: {100 * growth:.1f}%")
+    if growth > args.tolerance:
+        print(f"FAIL: memory grew more than {100 * args.tolerance:.0f}%")
+        sys.exit(1)
+    print("OK: memory is flat")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""/get-logs query cost on a local SQLite log store: full scan vs cursor pages.
+
+Fills a database with synthetic logs (once; reused on later runs) and times the first page,
+a page deep in the history, filtered pages and the old unpaginated scan.
+
+Usage (from the API directory):
+    python benchmarks/logs_query_benchmark.py [--logs 1000000] [--db logs_benchmark.db]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from log_query import LogQuery, stream_log_page  # noqa: E402
+from storage import SqliteDatabase, SqliteLogRepository  # noqa: E402
+
+STATUSES = ["entry", "exit", "blocked"]
+VISITOR_STATUSES = ["authorized", "visitor", "unauthorized"]
+CAMERAS = ["gate-1", "gate-2", "gate-3", "default"]
+
+
+def fill(logs, count, batch=20000, seed=7):
+    rng = random.Random(seed)
+    start = datetime(2024, 1, 1)
+    plates = [f"KA{rng.randint(1, 99):02d}AB{rng.randint(0, 9999):04d}" for _ in range(5000)]
+    for offset in range(0, count, batch):
+        entries = []
+        for i in range(offset, min(count, offset + batch)):
+            status = rng.choice(STATUSES)
+            entries.append({
+                "plate": rng.choice(plates),
+                "type": "unknown",
+                "status": status,
+                "timestamp": (start + timedelta(seconds=i * 30)).isoformat(),
+                "snapshot_url": f"http://localhost:8000/snapshots/{i}.jpg",
+                "visitorStatus": "unauthorized" if status == "blocked" else rng.choice(VISITOR_STATUSES[:2]),
+                "camera": rng.choice(CAMERAS),
+            })
+        logs.add_many(entries)
+    return plates
+
+
+def timed_page(logs, **kwargs):
+    start = time.perf_counter()
+    entries, next_cursor = logs.query(LogQuery(**kwargs))
+    size = sum(len(chunk) for chunk in stream_log_page(entries, next_cursor))
+    return time.perf_counter() - start, len(entries), size, next_cursor
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--logs", type=int, default=1000000)
+    parser.add_argument("--db", default="logs_benchmark.db")
+    parser.add_argument("--limit", type=int, default=100)
+    parser.add_argument("--deep-pages", type=int, default=200)
+    parser.add_argument("--skip-scan", action="store_true", help="skip the old full-collection scan")
+    args = parser.parse_args()
+
+    database = SqliteDatabase(args.db)
+    logs = SqliteLogRepository(database)
+    existing = database.execute("SELECT COUNT(*) FROM logs")[0][0]
+    if existing < args.logs:
+        start = time.perf_counter()
+        fill(logs, args.logs - existing)
+        print(f"Inserted {args.logs - existing} logs in {time.perf_counter() - start:.1f}s")
+    total = database.execute("SELECT COUNT(*) FROM logs")[0][0]
+    plate = database.execute("SELECT plate FROM logs LIMIT 1")[0][0]
+    print(f"{total} logs in {args.db}")
+
+    visitors = ("authorized", "visitor")
+    print(f"{'query':<34} {'ms':>8} {'logs':>6} {'bytes':>8}")
+    cases = [
+        ("first page", dict(visitor_statuses=visitors)),
+        ("plate", dict(visitor_statuses=visitors, plate=plate)),
+        ("camera + status", dict(visitor_statuses=visitors, camera="gate-2", statuses=("exit",))),
+        ("one day", dict(visitor_statuses=visitors, since="2024-03-01T00:00:00", until="2024-03-02T00:00:00")),
+        ("blocked only", dict(visitor_statuses=("unauthorized",))),
+    ]
+    for name, kwargs in cases:
+        seconds, count, size, _ = timed_page(logs, limit=args.limit, **kwargs)
+        print(f"{name:<34} {seconds * 1e3:>8.2f} {count:>6} {size:>8}")
+
+    cursor, seconds = None, 0.0
+    for _ in range(args.deep_pages):
+        seconds, count, size, cursor = timed_page(logs, limit=args.limit, visitor_statuses=visitors, cursor=cursor)
+        if cursor is None:
+            break
+    print(f"{f'page {args.deep_pages} via cursor':<34} {seconds * 1e3:>8.2f} {count:>6} {size:>8}")
+
+    if not args.skip_scan:
+        start = time.perf_counter()
+        everything = list(logs.iter_all(visitor_statuses=visitors))
+        size = sum(len(chunk) for chunk in stream_log_page(everything, None))
+        print(f"{'old /get-logs full scan':<34} {(time.perf_counter() - start) * 1e3:>8.0f} {len(everything):>6} {size:>8}")
+    database.close()
+
+
+if __name__ == "__main__":
+    main()
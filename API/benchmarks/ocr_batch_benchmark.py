@@ -0,0 +1,60 @@
+"""Per-crop vs batched PaddleOCR recognition throughput on a folder of plate crops.
+
+Usage (from the API directory):
+    python benchmarks/ocr_batch_benchmark.py path/to/crops --count 64
+"""
+import argparse
+import glob
+import os
+import sys
+import time
+
+import cv2
+from paddleocr import PaddleOCR
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from plate_ocr import recognize_plates  # noqa: E402
+
+
+def load_crops(folder, count):
+    paths = sorted(p for ext in ("*.jpg", "*.jpeg", "*.png") for p in glob.glob(os.path.join(folder, ext)))
+    crops = [img for img in (cv2.imread(p) for p in paths) if img is not None]
+    if not crops:
+        raise SystemExit(f"No images found in {folder}")
+    # Repeat the set so both modes see the same number of crops
+    return [crops[i % len(crops)] for i in range(count or len(crops))]
+
+
+def timed(fn, repeat):
+    best, out = None, None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        out = fn()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, out
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("crops")
+    parser.add_argument("--count", type=int, default=0, help="number of crops (0 = folder size)")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    crops = load_crops(args.crops, args.count)
+    ocr = PaddleOCR(use_angle_cls=True, use_gpu=False)
+    recognize_plates(ocr, crops[:1])  # warm-up
+
+    per_crop, per_crop_texts = timed(lambda: [recognize_plates(ocr, [c])[0] for c in crops], args.repeat)
+    batched, batched_texts = timed(lambda: recognize_plates(ocr, crops), args.repeat)
+
+    agree = sum(a == b for a, b in zip(per_crop_texts, batched_texts))
+    print(f"{len(crops)} crops")
+    print(f"per-crop: {len(crops) / per_crop:8.2f} crops/s ({1000 * per_crop / len(crops):.2f} ms/crop)")
+    print(f"batched:  {len(crops) / batched:8.2f} crops/s ({1000 * batched / len(crops):.2f} ms/crop)")
+    print(f"speedup:  {per_crop / batched:.2f}x, identical texts: {agree}/{len(crops)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""OCR calls, accuracy and time with and without plate crop preprocessing on a labeled crop set.
+
+The crop set is a folder of plate images labeled either by a labels.csv (filename,plate) or by
+the file name itself (KA01AB1234.jpg, KA01AB1234_2.jpg, ...). Each image is treated as a frame
+whose detection box is slightly inset, as a YOLO box around a plate usually is.
+
+Usage (from the API directory):
+    python benchmarks/ocr_preprocess_benchmark.py path/to/labeled_crops
+"""
+import argparse
+import csv
+import glob
+import os
+import sys
+import time
+
+import cv2
+from paddleocr import PaddleOCR
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from metrics import CROPS_REJECTED, PLATE_CROPS  # noqa: E402
+from plate_ocr import clean_plate_text, recognize_plates  # noqa: E402
+from plate_preprocess import prepare_plate_crops  # noqa: E402
+
+
+def load_labeled(folder):
+    labels = {}
+    csv_path = os.path.join(folder, "labels.csv")
+    if os.path.exists(csv_path):
+        with open(csv_path, newline="") as f:
+            labels = {row[0]: row[1] for row in csv.reader(f) if len(row) >= 2}
+    samples = []
+    for path in sorted(glob.glob(os.path.join(folder, "*"))):
+        name = os.path.basename(path)
+        image = cv2.imread(path)
+        if image is None:
+            continue
+        label = labels.get(name) or os.path.splitext(name)[0].split("_")[0]
+        samples.append((image, clean_plate_text(label)))
+    if not samples:
+        raise SystemExit(f"No labeled images in {folder}")
+    return samples
+
+
+def inset_box(image, ratio=0.04):
+    h, w = image.shape[:2]
+    return (int(w * ratio), int(h * ratio), int(w * (1 - ratio)), int(h * (1 - ratio)))
+
+
+def run(samples, ocr, preprocess):
+    calls = correct = 0
+    start = time.perf_counter()
+    for image, label in samples:
+        box = inset_box(image)
+        if preprocess:
+            crops = prepare_plate_crops(image, [box])
+        else:
+            x1, y1, x2, y2 = box
+            crops = [image[y1:y2, x1:x2]]
+        if crops[0] is None:
+            continue
+        calls += 1
+        correct += recognize_plates(ocr, crops)[0] == label
+    return calls, correct, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("folder")
+    args = parser.parse_args()
+
+    samples = load_labeled(args.folder)
+    ocr = PaddleOCR(use_angle_cls=True, use_gpu=False)
+    recognize_plates(ocr, [samples[0][0]])  # warm-up
+
+    print(f"{len(samples)} labeled crops")
+    print(f"{'mode':<12} {'OCR calls':>10} {'correct':>8} {'acc/call':>9} {'acc/all':>8} {'ms/crop':>8}")
+    for name, preprocess in (("raw", False), ("preprocessed", True)):
+        calls, correct, seconds = run(samples, ocr, preprocess)
+        print(f"{name:<12} {calls:>10} {correct:>8} {correct / max(calls, 1):>9.1%} "
+              f"{correct / len(samples):>8.1%} {1000 * seconds / len(samples):>8.2f}")
+    print(f"crops: {PLATE_CROPS.value()}, rejected small: {CROPS_REJECTED.value(reason='small')}, "
+          f"rejected blur: {CROPS_REJECTED.value(reason='blur')}")
+
+
+if __name__ == "__main__":
+    main()
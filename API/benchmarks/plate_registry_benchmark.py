@@ -0,0 +1,106 @@
+"""Lookup latency and correction accuracy of the plate registry on synthetic registered plates.
+
+Compares the indexed PlateRegistry against a difflib.get_close_matches scan over the same plates.
+Only look-alike misreads may be corrected: substitution and deletion queries are other plates and
+should all come out as "none" (a substitution that happens to be a look-alike counts as correct).
+
+Usage (from the API directory):
+    python benchmarks/plate_registry_benchmark.py [--plates 100000] [--queries 2000]
+"""
+import argparse
+import os
+import random
+import string
+import sys
+import time
+from difflib import get_close_matches
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from plate_ocr import clean_plate_text  # noqa: E402
+from plate_registry import CONFUSION_GROUPS, PlateGrammar, PlateRegistry  # noqa: E402
+
+STATES = ["KA", "MH", "DL", "TN", "KL", "AP", "TS", "GJ", "RJ", "UP"]
+LOOKALIKES = {char: [c for c in group if c != char] for group in CONFUSION_GROUPS for char in group}
+
+
+def random_plate(rng):
+    return (rng.choice(STATES) + f"{rng.randint(1, 99):02d}"
+            + "".join(rng.choices(string.ascii_uppercase, k=rng.randint(1, 2)))
+            + f"{rng.randint(0, 9999):04d}")
+
+
+def misread(plate, rng, kind):
+    chars = list(plate)
+    if kind == "lookalike":
+        positions = [i for i, c in enumerate(chars) if c in LOOKALIKES]
+        for i in rng.sample(positions, min(2, len(positions))):
+            chars[i] = rng.choice(LOOKALIKES[chars[i]])
+    elif kind == "substitution":
+        i = rng.randrange(len(chars))
+        chars[i] = rng.choice([c for c in string.ascii_uppercase + string.digits if c != chars[i]])
+    elif kind == "deletion":
+        del chars[rng.randrange(len(chars))]
+    return "".join(chars)
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--plates", type=int, default=100000)
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--difflib-queries", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    plates = set()
+    while len(plates) < args.plates:
+        plates.add(random_plate(rng))
+    # Registered plates and OCR output go through the same cleaning (O -> 0 etc.)
+    plates = sorted({clean_plate_text(plate) for plate in plates})
+
+    registry = PlateRegistry()
+    start = time.perf_counter()
+    registry.rebuild(plates)
+    print(f"Indexed {len(registry)} plates in {time.perf_counter() - start:.1f}s")
+
+    grammar = PlateGrammar("IN")
+    print(f"{'misread':<14} {'queries':>7} {'correct':>8} {'wrong':>6} {'none':>6} {'p50 us':>8} {'p99 us':>8}")
+    for kind in ("exact", "lookalike", "substitution", "deletion"):
+        correct = wrong = missed = 0
+        latencies = []
+        for plate in rng.sample(plates, args.queries):
+            query = clean_plate_text(misread(plate, rng, kind))
+            start = time.perf_counter()
+            match = registry.match(query)
+            latencies.append((time.perf_counter() - start) * 1e6)
+            if match is None:
+                missed += 1
+            elif match == plate:
+                correct += 1
+            else:
+                wrong += 1
+        print(f"{kind:<14} {args.queries:>7} {correct:>8} {wrong:>6} {missed:>6} "
+              f"{percentile(latencies, 0.5):>8.1f} {percentile(latencies, 0.99):>8.1f}")
+
+    # Unregistered plates: the grammar alone should undo look-alike swaps
+    fixed = 0
+    for _ in range(args.queries):
+        plate = random_plate(rng)
+        if grammar.correct(clean_plate_text(misread(plate, rng, "lookalike"))) == clean_plate_text(plate):
+            fixed += 1
+    print(f"Grammar-only correction of look-alike misreads: {fixed}/{args.queries}")
+
+    start = time.perf_counter()
+    for plate in rng.sample(plates, args.difflib_queries):
+        get_close_matches(misread(plate, rng, "lookalike"), plates, n=1, cutoff=0.8)
+    per_query = (time.perf_counter() - start) / args.difflib_queries
+    print(f"difflib.get_close_matches scan: {per_query * 1e3:.1f} ms per query")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""YOLO calls and plates found with the fixed every-25th-frame stride vs the motion sampler.
+
+Usage (from the API directory):
+    python benchmarks/sampling_benchmark.py clip1.mp4 [clip2.mp4 ...]
+"""
+import argparse
+import os
+import sys
+import time
+
+import cv2
+from paddleocr import PaddleOCR
+from ultralytics import YOLO
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from detection import detect_batch, iter_sampled_frames  # noqa: E402
+from plate_ocr import crop_plates, recognize_plates  # noqa: E402
+from sampling import FixedSampler, MotionSampler  # noqa: E402
+
+
+def is_plate(text):
+    return bool(text) and 4 <= len(text) <= 10 and any(c.isdigit() for c in text)
+
+
+def run(video, sampler, model, ocr):
+    cap = cv2.VideoCapture(video, cv2.CAP_FFMPEG)
+    calls, plates = 0, set()
+    start = time.perf_counter()
+    try:
+        for _, frame, _ in iter_sampled_frames(cap, sampler=sampler):
+            calls += 1
+            boxes = detect_batch(model, [frame])[0]
+            plates.update(t for t in recognize_plates(ocr, crop_plates(frame, boxes)) if is_plate(t))
+    finally:
+        cap.release()
+    return calls, plates, time.perf_counter() - start, sampler.frames_seen
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("videos", nargs="+")
+    parser.add_argument("--weights", default="weights/license_plate_detector.pt")
+    parser.add_argument("--stride", type=int, default=25)
+    parser.add_argument("--active-stride", type=int, default=5)
+    parser.add_argument("--idle-stride", type=int, default=250)
+    parser.add_argument("--threshold", type=float, default=0.01)
+    args = parser.parse_args()
+
+    model = YOLO(args.weights)
+    ocr = PaddleOCR(use_angle_cls=True, use_gpu=False)
+
+    print(f"{'clip':<30} {'mode':<7} {'frames':>7} {'yolo':>6} {'plates':>7} {'seconds':>8}")
+    for video in args.videos:
+        fixed = run(video, FixedSampler(args.stride), model, ocr)
+        motion = run(video, MotionSampler(args.active_stride, args.idle_stride, args.threshold), model, ocr)
+        name = os.path.basename(video)[:30]
+        for mode, (calls, plates, seconds, frames) in (("fixed", fixed), ("motion", motion)):
+            print(f"{name:<30} {mode:<7} {frames:>7} {calls:>6} {len(plates):>7} {seconds:>8.1f}")
+        saved = fixed[0] - motion[0]
+        print(f"  YOLO calls saved: {saved} ({100 * saved / max(fixed[0], 1):.0f}%), "
+              f"plates only found by motion: {sorted(motion[1] - fixed[1])}, "
+              f"only by fixed: {sorted(fixed[1] - motion[1])}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""Several worker processes sharing one Redis-protocol state: exactly-once logs per plate window and
+exclusive camera leases.
+
+Every worker sees the same plate readings at the same time (as if each ran the same camera) and
+goes through the claim -> plate state -> event log path of handle_plate. The run fails if any plate
+is logged twice inside one dedup window or if two workers ever hold the camera lease at once.
+
+Usage (from the API directory):
+    python benchmarks/shared_state_check.py --url redis://localhost:6379/15
+    python benchmarks/shared_state_check.py --fake     # local stand-in, needs pip install fakeredis
+"""
+import argparse
+import multiprocessing
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from shared_state import RedisSharedState, worker_id  # noqa: E402
+
+
+def run_worker(url, prefix, seconds, plates, window, lease_hold, seed, results):
+    state = RedisSharedState(url=url, prefix=prefix)
+    seen = state.seen_vehicles("cam")
+    plate_state = state.plate_states()
+    events = state.event_log("live")
+    rng = random.Random(seed)
+    claims = logged = 0
+    leases = []
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        plate = f"P{rng.randrange(plates):04d}"
+        now = datetime.utcnow()
+        claims += 1
+        if not seen.claim(plate, now, window):
+            continue
+        plate_state.update(plate, "entry", now.isoformat())
+        events.append({"plate": plate, "timestamp": now.isoformat(), "worker": worker_id()})
+        logged += 1
+
+        if rng.random() < 0.05 and state.acquire_lease("camera:cam", worker_id(), ttl=5):
+            start = time.time()
+            time.sleep(lease_hold)
+            end = time.time()
+            state.release_lease("camera:cam", worker_id())
+            leases.append((start, end))
+    results.put((claims, logged, leases))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--url", default="redis://localhost:6379/15")
+    parser.add_argument("--fake", action="store_true", help="start a fakeredis TCP server as the stand-in")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--plates", type=int, default=50)
+    parser.add_argument("--window", type=float, default=1.0, help="dedup window in seconds")
+    parser.add_argument("--lease-hold", type=float, default=0.01)
+    args = parser.parse_args()
+
+    url = args.url
+    if args.fake:
+        from fakeredis import TcpFakeServer
+
+        server = TcpFakeServer(("127.0.0.1", 0))
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        url = f"redis://127.0.0.1:{server.server_address[1]}/0"
+    prefix = f"check-{uuid.uuid4().hex[:8]}:"
+
+    results = multiprocessing.Queue()
+    workers = [
+        multiprocessing.Process(target=run_worker, args=(url, prefix, args.seconds, args.plates, args.window,
+                                                         args.lease_hold, seed, results))
+        for seed in range(args.workers)
+    ]
+    for worker in workers:
+        worker.start()
+    outcomes = [results.get() for _ in workers]
+    for worker in workers:
+        worker.join()
+
+    state = RedisSharedState(url=url, prefix=prefix)
+    log = state.event_log("live")
+    logged, _, _ = log.read(0, 10 ** 6)
+    claims = sum(c for c, _, _ in outcomes)
+    print(f"workers={args.workers} claims={claims} ({claims / args.seconds:.0f}/s) logs={len(logged)} "
+          f"events seq={log.seq}")
+
+    failures = 0
+    last_logged = {}
+    for event in logged:
+        when = datetime.fromisoformat(event["timestamp"])
+        previous = last_logged.get(event["plate"])
+        # Small slack for the clock difference between claiming on the server and stamping the event
+        if previous is not None and when - previous < timedelta(seconds=args.window * 0.9):
+            failures += 1
+        last_logged[event["plate"]] = when
+    print(f"duplicate logs inside a window: {failures}")
+
+    intervals = sorted(interval for _, _, leases in outcomes for interval in leases)
+    overlaps = sum(1 for a, b in zip(intervals, intervals[1:]) if b[0] < a[1])
+    print(f"lease holds: {len(intervals)}, overlapping holds: {overlaps}")
+
+    states = len(state.plate_states())
+    print(f"plates in shared state: {states}")
+    if failures or overlaps or log.seq != sum(n for _, n, _ in outcomes):
+        print("FAIL")
+        sys.exit(1)
+    print("OK")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""Bytes uploaded and encode time per log event: default full-frame JPEG vs the snapshot encoder with dedup.
+
+Every sampled frame of each clip is treated as a log event for one plate (a parked car seen
+again and again), so the dedup rate shows how many uploads near-identical frames save.
+Blobs are written to a temporary LocalBlobStore.
+
+Usage (from the API directory):
+    python benchmarks/snapshot_benchmark.py clip1.mp4 [clip2.mp4 ...] [--format webp] [--quality 75]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import cv2
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from detection import iter_sampled_frames  # noqa: E402
+from snapshots import SnapshotEncoder, SnapshotStore  # noqa: E402
+from storage import LocalBlobStore  # noqa: E402
+
+
+def load_frames(video, stride, limit):
+    cap = cv2.VideoCapture(video, cv2.CAP_FFMPEG)
+    try:
+        frames = []
+        for _, frame, _ in iter_sampled_frames(cap, stride):
+            frames.append(frame)
+            if len(frames) >= limit:
+                break
+        return frames
+    finally:
+        cap.release()
+
+
+def center_box(frame):
+    # Stand-in plate box in the lower middle of the frame
+    h, w = frame.shape[:2]
+    return (int(w * 0.4), int(h * 0.7), int(w * 0.6), int(h * 0.8))
+
+
+def run_baseline(frames, blobs):
+    # The previous pipeline: full-size JPEG with OpenCV defaults, uploaded for every event
+    encode_seconds, uploaded = 0.0, 0
+    for i, frame in enumerate(frames):
+        start = time.perf_counter()
+        ok, buffer = cv2.imencode(".jpg", frame)
+        data = buffer.tobytes()
+        encode_seconds += time.perf_counter() - start
+        blobs.put(f"baseline_{i}.jpg", data)
+        uploaded += len(data)
+    return encode_seconds, uploaded, 0
+
+
+def run_encoder(frames, blobs, encoder, dedup_distance):
+    store = SnapshotStore(blobs, max_distance=dedup_distance)
+    encode_seconds = 0.0
+    for frame in frames:
+        start = time.perf_counter()
+        snapshot = encoder.encode(frame, center_box(frame))
+        encode_seconds += time.perf_counter() - start
+        store.save("BENCH", snapshot)
+    return encode_seconds, store.bytes_uploaded, store.deduplicated
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("videos", nargs="+")
+    parser.add_argument("--stride", type=int, default=25)
+    parser.add_argument("--limit", type=int, default=200, help="events per clip")
+    parser.add_argument("--format", default="jpeg", choices=["jpeg", "webp"])
+    parser.add_argument("--quality", type=int, default=80)
+    parser.add_argument("--max-width", type=int, default=1280)
+    parser.add_argument("--dedup-distance", type=int, default=6)
+    args = parser.parse_args()
+
+    encoder = SnapshotEncoder(args.format, args.quality, args.max_width)
+    print(f"{'clip':<30} {'mode':<9} {'events':>7} {'KB/event':>9} {'ms/event':>9} {'deduped':>8}")
+    for video in args.videos:
+        frames = load_frames(video, args.stride, args.limit)
+        if not frames:
+            continue
+        name = os.path.basename(video)[:30]
+        with tempfile.TemporaryDirectory() as root:
+            blobs = LocalBlobStore(root)
+            modes = (
+                ("baseline", run_baseline(frames, blobs)),
+                (args.format, run_encoder(frames, blobs, encoder, args.dedup_distance)),
+            )
+        for mode, (encode_seconds, uploaded, deduped) in modes:
+            print(f"{name:<30} {mode:<9} {len(frames):>7} {uploaded / len(frames) / 1024:>9.1f} "
+                  f"{1000 * encode_seconds / len(frames):>9.2f} {deduped:>8}")
+
+
+if __name__ == "__main__":
+    main()
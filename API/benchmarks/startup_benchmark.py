@@ -0,0 +1,113 @@
+"""Startup time and per-worker memory of the API: lazy vs eager model loading, forked vs private models.
+
+Runs main.py in child processes with STORAGE_BACKEND=local so no network is touched.
+PSS (proportional set size, Linux) splits shared pages between the processes that map them,
+so summing it over workers gives the real memory cost of a multi-worker deployment.
+
+Usage (from the API directory):
+    python benchmarks/startup_benchmark.py [--workers 4]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+API_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def memory_mb():
+    # PSS when the kernel exposes it, RSS otherwise
+    try:
+        with open("/proc/self/smaps_rollup") as f:
+            fields = dict(line.split(":", 1) for line in f if ":" in line)
+        return {"pss": int(fields["Pss"].split()[0]) / 1024, "rss": int(fields["Rss"].split()[0]) / 1024}
+    except OSError:
+        import resource
+
+        return {"pss": None, "rss": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024}
+
+
+def use_models(main):
+    # One OCR + detector call, like the first real frame would make
+    import numpy as np
+
+    frame = np.zeros((480, 640, 3), dtype=np.uint8)
+    models = main.inference_models()
+    boxes = main.detect_batch(models.yolo, [frame])[0]
+    main.process_detections(frame, boxes, main.SeenVehicles(), [])
+    main.recognize_plates(models.ocr, [np.zeros((48, 160, 3), dtype=np.uint8)])
+
+
+def child(mode, workers):
+    sys.path.insert(0, API_DIR)
+    start = time.perf_counter()
+    import main
+
+    result = {"import_seconds": time.perf_counter() - start}
+    if mode == "import":
+        result.update(memory_mb())
+    elif mode == "ready":
+        main.resources.load()
+        result["ready_seconds"] = time.perf_counter() - start
+        result.update(memory_mb())
+    elif mode == "fork":
+        # The preloaded master forks workers that each serve a first frame
+        pipes = []
+        for _ in range(workers):
+            read_fd, write_fd = os.pipe()
+            pid = os.fork()
+            if pid == 0:
+                os.close(read_fd)
+                use_models(main)
+                os.write(write_fd, json.dumps(memory_mb()).encode())
+                os._exit(0)
+            os.close(write_fd)
+            pipes.append((pid, read_fd))
+        result["workers"] = []
+        for pid, read_fd in pipes:
+            with os.fdopen(read_fd) as f:
+                result["workers"].append(json.loads(f.read()))
+            os.waitpid(pid, 0)
+    elif mode == "private":
+        use_models(main)
+        result.update(memory_mb())
+    print(json.dumps(result))
+
+
+def run_child(mode, preload, workers=1):
+    env = dict(os.environ, STORAGE_BACKEND="local", PRELOAD_MODELS="1" if preload else "0", LOG_LEVEL="OFF")
+    out = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--child", mode, "--workers", str(workers)],
+        cwd=API_DIR, env=env, capture_output=True, text=True, check=True,
+    ).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--child", choices=["import", "ready", "fork", "private"])
+    args = parser.parse_args()
+    if args.child:
+        child(args.child, args.workers)
+        return
+
+    eager = run_child("import", preload=True)
+    lazy = run_child("import", preload=False)
+    ready = run_child("ready", preload=False)
+    print(f"eager import (models at import, old behaviour): {eager['import_seconds']:.1f}s, RSS {eager['rss']:.0f} MB")
+    print(f"lazy import (server accepts requests):          {lazy['import_seconds']:.1f}s, RSS {lazy['rss']:.0f} MB")
+    print(f"lazy import + background warm-up to /ready:     {ready['ready_seconds']:.1f}s, RSS {ready['rss']:.0f} MB")
+
+    private = [run_child("private", preload=False) for _ in range(args.workers)]
+    forked = run_child("fork", preload=True, workers=args.workers)["workers"]
+    for name, workers in (("private models per worker", private), ("preloaded + forked", forked)):
+        pss = [w["pss"] for w in workers if w["pss"] is not None]
+        total = f"total PSS {sum(pss):.0f} MB" if pss else "PSS unavailable"
+        print(f"{args.workers} workers, {name:<26} RSS/worker {workers[0]['rss']:.0f} MB, {total}")
+
+
+if __name__ == "__main__":
+    main()
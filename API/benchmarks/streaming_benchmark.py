@@ -0,0 +1,137 @@
+"""Time-to-first-detection and peak RSS when a video URL is streamed vs downloaded first.
+
+A local HTTP server (with Range support, so FFmpeg can seek to the mp4 index) stands in for
+the remote storage. Every mode runs in a fresh process so peak RSS is measured per run;
+pass videos of different sizes to check that memory stays flat.
+
+Usage (from the API directory):
+    python benchmarks/streaming_benchmark.py small.mp4 large.mp4 [--weights weights/license_plate_detector.pt]
+"""
+import argparse
+import functools
+import multiprocessing
+import os
+import re
+import resource
+import sys
+import threading
+import time
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class RangeRequestHandler(SimpleHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def send_head(self):
+        match = re.match(r"bytes=(\d+)-(\d*)", self.headers.get("Range", ""))
+        path = self.translate_path(self.path)
+        if not match or not os.path.isfile(path):
+            return super().send_head()
+        size = os.path.getsize(path)
+        start = int(match.group(1))
+        end = min(int(match.group(2)) if match.group(2) else size - 1, size - 1)
+        f = open(path, "rb")
+        f.seek(start)
+        self.send_response(206)
+        self.send_header("Content-Type", "video/mp4")
+        self.send_header("Accept-Ranges", "bytes")
+        self.send_header("Content-Range", f"bytes {start}-{end}/{size}")
+        self.send_header("Content-Length", str(end - start + 1))
+        self.end_headers()
+        self.range_remaining = end - start + 1
+        return f
+
+    def copyfile(self, source, outputfile):
+        remaining = getattr(self, "range_remaining", None)
+        if remaining is None:
+            return super().copyfile(source, outputfile)
+        while remaining > 0:
+            chunk = source.read(min(1 << 16, remaining))
+            if not chunk:
+                break
+            outputfile.write(chunk)
+            remaining -= len(chunk)
+
+
+def serve(directory):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), functools.partial(RangeRequestHandler, directory=directory))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def measure(url, mode, weights, max_frames, results):
+    import cv2
+    import requests
+
+    model = None
+    if weights:
+        from ultralytics import YOLO
+        model = YOLO(weights)
+
+    # The clock starts when the URL is handed over, as in /process-video
+    start = time.perf_counter()
+    path = url
+    if mode == "download":
+        import tempfile
+        tmp = tempfile.NamedTemporaryFile(delete=False, suffix=".mp4")
+        with tmp as f, requests.get(url, stream=True, timeout=30) as response:
+            for chunk in response.iter_content(chunk_size=1 << 20):
+                f.write(chunk)
+        path = tmp.name
+
+    cap = cv2.VideoCapture(path, cv2.CAP_FFMPEG)
+    first_frame = first_detection = None
+    frames = 0
+    while frames < max_frames:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        frames += 1
+        if first_frame is None:
+            first_frame = time.perf_counter() - start
+        if model is not None and first_detection is None and frames % 25 == 0:
+            if len(model(frame, verbose=False)[0].boxes):
+                first_detection = time.perf_counter() - start
+    cap.release()
+    if mode == "download":
+        os.unlink(path)
+    results.put({
+        "first_frame_s": first_frame,
+        "first_detection_s": first_detection,
+        "total_s": time.perf_counter() - start,
+        "frames": frames,
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0,
+    })
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("videos", nargs="+")
+    parser.add_argument("--weights", default=None, help="YOLO weights; enables time-to-first-detection")
+    parser.add_argument("--max-frames", type=int, default=2000)
+    args = parser.parse_args()
+
+    context = multiprocessing.get_context("spawn")
+    print(f"{'video':<25} {'MB':>7} {'mode':<9} {'1st frame':>10} {'1st det':>8} {'total':>7} {'peak RSS':>9}")
+    for video in args.videos:
+        video = os.path.abspath(video)
+        server = serve(os.path.dirname(video))
+        url = f"http://127.0.0.1:{server.server_address[1]}/{os.path.basename(video)}"
+        size_mb = os.path.getsize(video) / (1 << 20)
+        for mode in ("download", "stream"):
+            results = context.Queue()
+            process = context.Process(target=measure, args=(url, mode, args.weights, args.max_frames, results))
+            process.start()
+            r = results.get()
+            process.join()
+            fmt = lambda v: f"{v:.2f}s" if v is not None else "-"  # noqa: E731
+            print(f"{os.path.basename(video)[:25]:<25} {size_mb:>7.1f} {mode:<9} {fmt(r['first_frame_s']):>10} "
+                  f"{fmt(r['first_detection_s']):>8} {fmt(r['total_s']):>7} {r['peak_rss_mb']:>8.0f}M")
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
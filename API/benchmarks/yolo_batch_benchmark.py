@@ -0,0 +1,66 @@
+"""Frames/sec of the plate detector at different YOLO batch sizes on a recorded clip.
+
+Usage (from the API directory):
+    python benchmarks/yolo_batch_benchmark.py path/to/clip.mp4 --batch-sizes 1 4 8 16
+"""
+import argparse
+import os
+import sys
+import time
+
+import cv2
+from ultralytics import YOLO
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from detection import detect_batch, iter_batches, iter_sampled_frames  # noqa: E402
+
+
+def load_sampled_frames(video_path, stride, limit):
+    cap = cv2.VideoCapture(video_path, cv2.CAP_FFMPEG)
+    if not cap.isOpened():
+        raise SystemExit(f"Cannot open video: {video_path}")
+    frames = []
+    try:
+        for item in iter_sampled_frames(cap, stride):
+            frames.append(item)
+            if limit and len(frames) >= limit:
+                break
+    finally:
+        cap.release()
+    return frames
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("video")
+    parser.add_argument("--weights", default="weights/license_plate_detector.pt")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 4, 8, 16])
+    parser.add_argument("--stride", type=int, default=25)
+    parser.add_argument("--limit", type=int, default=0, help="max sampled frames (0 = whole clip)")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    # Decode once up front so only detection time is measured
+    frames = load_sampled_frames(args.video, args.stride, args.limit)
+    if not frames:
+        raise SystemExit("No frames sampled from clip")
+
+    model = YOLO(args.weights)
+    model([frames[0][1]], verbose=False)  # warm-up
+
+    print(f"{len(frames)} sampled frames from {args.video}")
+    print(f"{'batch':>6} {'frames/s':>10} {'ms/frame':>10} {'boxes':>7}")
+    for batch_size in args.batch_sizes:
+        best = None
+        boxes = 0
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            boxes = sum(len(b) for batch in iter_batches(frames, batch_size)
+                        for b in detect_batch(model, [frame for _, frame, _ in batch]))
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        print(f"{batch_size:>6} {len(frames) / best:>10.2f} {1000 * best / len(frames):>10.2f} {boxes:>7}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,189 @@
+import asyncio
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+SUBSCRIBER_QUEUE_SIZE = 100
+
+
+def _as_set(value, upper=False):
+    # Filters accept a single value, a comma separated string or a list; empty means "everything"
+    if value is None or value == "":
+        return None
+    if isinstance(value, str):
+        value = value.split(",")
+    values = {str(v).strip() for v in value if str(v).strip()}
+    if upper:
+        values = {v.upper() for v in values}
+    return values or None
+
+
+class Subscription:
+    __slots__ = ("loop", "queue", "cameras", "statuses", "plates", "dropped", "closed")
+
+    def __init__(self, loop, queue_size, camera=None, status=None, plate=None):
+        self.loop = loop
+        self.queue = asyncio.Queue(maxsize=queue_size)
+        self.dropped = 0
+        self.closed = False
+        self.set_filters(camera, status, plate)
+
+    def set_filters(self, camera=None, status=None, plate=None):
+        self.cameras = _as_set(camera)
+        self.statuses = _as_set(status)
+        self.plates = _as_set(plate, upper=True)
+
+    def matches(self, event):
+        if self.cameras is not None and event.get("camera") not in self.cameras:
+            return False
+        if self.statuses is not None and event.get("status") not in self.statuses:
+            return False
+        if self.plates is not None and event.get("plate") not in self.plates:
+            return False
+        return True
+
+    async def get(self):
+        # Returns None once the subscription was closed (e.g. dropped for being too slow)
+        return await self.queue.get()
+
+
+class EventBroadcaster:
+    """Fans detection events out to async subscribers with bounded per-subscriber queues.
+
+    publish() may be called from any thread; delivery happens on each subscriber's event loop via
+    call_soon_threadsafe, so idle subscribers cost nothing. A subscriber whose queue is full either
+    loses its oldest events ("lag") or is disconnected ("drop").
+    """
+
+    def __init__(self, queue_size=SUBSCRIBER_QUEUE_SIZE, slow_policy="lag"):
+        self.queue_size = queue_size
+        self.slow_policy = slow_policy
+        self._subscriptions = set()
+        self._lock = threading.Lock()
+        self.published = 0
+        self.dropped = 0
+        self.disconnected = 0
+
+    def subscribe(self, camera=None, status=None, plate=None):
+        # Must be called from the subscriber's event loop
+        subscription = Subscription(asyncio.get_running_loop(), self.queue_size, camera, status, plate)
+        with self._lock:
+            self._subscriptions.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        subscription.closed = True
+        with self._lock:
+            self._subscriptions.discard(subscription)
+
+    def publish(self, event):
+        self.published += 1
+        with self._lock:
+            subscriptions = list(self._subscriptions)
+        loops = {}
+        for subscription in subscriptions:
+            if subscription.matches(event):
+                loops.setdefault(subscription.loop, []).append(subscription)
+        for loop, targets in loops.items():
+            try:
+                loop.call_soon_threadsafe(self._deliver, targets, event)
+            except RuntimeError:
+                # The subscriber's loop is gone
+                for subscription in targets:
+                    self.unsubscribe(subscription)
+
+    def _deliver(self, subscriptions, event):
+        for subscription in subscriptions:
+            if subscription.closed:
+                continue
+            queue = subscription.queue
+            if queue.full():
+                subscription.dropped += 1
+                self.dropped += 1
+                if self.slow_policy == "drop":
+                    self.disconnected += 1
+                    self.unsubscribe(subscription)
+                    queue.get_nowait()
+                    queue.put_nowait(None)
+                    continue
+                queue.get_nowait()
+            queue.put_nowait(event)
+
+    def stats(self):
+        with self._lock:
+            subscribers = len(self._subscriptions)
+        return {
+            "subscribers": subscribers,
+            "published": self.published,
+            "dropped": self.dropped,
+            "disconnected": self.disconnected,
+        }
+
+
+class EventRelay:
+    """Publishes what any worker appended to a shared event log to this worker's subscribers.
+
+    With several workers the detections of a camera happen in the one worker that owns it, while
+    /ws/plates clients are spread over all of them; every worker runs one relay. Logs with a
+    `wait(after, timeout)` (Redis pub/sub, see shared_state.RedisEventLog) wake the relay as soon
+    as an event is appended; others are polled every interval seconds.
+    """
+
+    def __init__(self, events, broadcaster, interval=0.25, batch_size=100, wait_timeout=1.0):
+        self.events = events
+        self.broadcaster = broadcaster
+        self.interval = interval
+        self.batch_size = batch_size
+        self.wait_timeout = wait_timeout
+        self.relayed = 0
+        self.missed = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="event-relay", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout=2.0):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        if hasattr(self.events, "close"):
+            self.events.close()
+
+    def _run(self):
+        # Only events appended from now on, subscribers never get a replay of old ones
+        after = None
+        while not self._stop.is_set():
+            try:
+                if after is None:
+                    after = self.events.seq
+                events, after, missed = self.events.read(after, self.batch_size)
+            except Exception as e:
+                logger.warning("Event relay read error: %s", e)
+                self._stop.wait(self.interval)
+                continue
+            self.missed += missed
+            for event in events:
+                self.broadcaster.publish(event)
+            self.relayed += len(events)
+            if len(events) < self.batch_size:
+                self._wait(after)
+
+    def _wait(self, after):
+        wait = getattr(self.events, "wait", None)
+        if wait is None:
+            self._stop.wait(self.interval)
+            return
+        try:
+            wait(after, self.wait_timeout)
+        except Exception as e:
+            logger.warning("Event relay wait error: %s", e)
+            self._stop.wait(self.interval)
+
+    def stats(self):
+        return {"relayed": self.relayed, "missed": self.missed, "interval": self.interval,
+                "push": hasattr(self.events, "wait")}
@@ -0,0 +1,303 @@
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+
+from frame_buffer import FRAME_BUFFER_SIZE, FrameRingBuffer, LatencyStats
+from metrics import DECODE_SECONDS, FRAMES_DROPPED, FRAMES_READ, FRAMES_SAMPLED
+from mjpeg import MjpegBroadcaster
+from sampling import SAMPLING_MODE, create_sampler
+from shared_state import CAMERA_LEASE_TTL, MemorySharedState, worker_id
+from tracking import TRACKING_ENABLED, PlateTracker
+
+logger = logging.getLogger(__name__)
+
+SAMPLE_EVERY = 25
+INFERENCE_WORKERS = max(1, (os.cpu_count() or 2) // 2)
+
+
+def parse_source(source):
+    # "0", "1", ... are device indices, anything else is an RTSP/HTTP URL or a file path
+    if isinstance(source, int):
+        return source
+    source = str(source).strip()
+    return int(source) if source.isdigit() else source
+
+
+def open_capture(source):
+    if isinstance(source, int):
+        # DirectShow opens Windows webcams much faster than the default backend
+        backend = cv2.CAP_DSHOW if os.name == "nt" else cv2.CAP_ANY
+        return cv2.VideoCapture(source, backend)
+    return cv2.VideoCapture(source, cv2.CAP_FFMPEG)
+
+
+class Camera:
+    """One video source with its own capture thread and a ring buffer of its latest frames."""
+
+    def __init__(self, camera_id, source, manager, sample_every=SAMPLE_EVERY, buffer_size=FRAME_BUFFER_SIZE,
+                 sampling=SAMPLING_MODE):
+        self.camera_id = camera_id
+        self.source = parse_source(source)
+        self.manager = manager
+        self.sample_every = max(1, int(sample_every))
+        self.sampler = create_sampler(sampling, self.sample_every)
+        # Only touched from the single in-flight inference of this camera
+        self.tracker = PlateTracker() if TRACKING_ENABLED else None
+        # (time, boxes, texts) of the latest analyzed frame, drawn on the live preview
+        self.last_detections = None
+        self.mjpeg = MjpegBroadcaster(self)
+        self.is_file = isinstance(self.source, str) and os.path.isfile(self.source)
+        # Dedup windows live in the shared state, so they survive the camera moving to another worker
+        self.seen_vehicles = manager.state.seen_vehicles(camera_id)
+        self.lease_name = f"camera:{camera_id}"
+        self.detecting = False
+        self.viewers = 0
+        self.error = None
+        self.frames_read = 0
+        self.frames_sampled = 0
+        self.frames_skipped = 0
+        self.fps = 0.0
+        self.buffer = FrameRingBuffer(buffer_size)
+        # capture -> analysis finished, and capture -> log written for frames that produced a log
+        self.frame_latency = LatencyStats()
+        self.detection_latency = LatencyStats()
+        self._inference_pending = False
+        self._stop = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    @property
+    def capturing(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def owner(self):
+        return self.manager.state.lease_owner(self.lease_name)
+
+    def start_capture(self):
+        with self._lock:
+            if self.capturing:
+                return True
+            # Only one worker (or host) may open a device, the others would fight over it
+            if not self.manager.state.acquire_lease(self.lease_name, worker_id(), self.manager.lease_ttl):
+                self.error = f"Camera {self.camera_id} is captured by {self.owner()}"
+                logger.warning("Camera %s: %s", self.camera_id, self.error)
+                return False
+            self._stop.clear()
+            self.error = None
+            self.buffer.open()
+            self._thread = threading.Thread(target=self._capture_loop, name=f"camera-{self.camera_id}", daemon=True)
+            self._thread.start()
+        return True
+
+    def stop_capture(self, timeout=5.0):
+        with self._lock:
+            thread = self._thread
+            self._stop.set()
+        if thread is not None and thread is not threading.current_thread():
+            thread.join(timeout)
+        self.buffer.close()
+
+    def start(self):
+        self.detecting = True
+        if not self.start_capture():
+            self.detecting = False
+            return False
+        return True
+
+    def stop(self):
+        self.detecting = False
+        if self.viewers == 0:
+            self.stop_capture()
+
+    def _capture_loop(self):
+        cap = open_capture(self.source)
+        if not cap.isOpened():
+            self.error = f"Cannot open source {self.source}"
+            logger.error("Camera %s: %s", self.camera_id, self.error)
+            self.detecting = False
+            self.manager.state.release_lease(self.lease_name, worker_id())
+            return
+
+        # Files are played back at their native rate so they behave like a live source
+        frame_interval = 0.0
+        if self.is_file:
+            file_fps = cap.get(cv2.CAP_PROP_FPS) or 25.0
+            frame_interval = 1.0 / file_fps
+        logger.info("Camera %s: capture started (%s)", self.camera_id, self.source)
+
+        last_time = time.monotonic()
+        last_push = 0.0
+        last_renewal = last_time
+        try:
+            while not self._stop.is_set():
+                if time.monotonic() - last_renewal >= self.manager.lease_ttl / 3:
+                    if not self.manager.state.acquire_lease(self.lease_name, worker_id(), self.manager.lease_ttl):
+                        logger.warning("Camera %s: lease taken over by %s, stopping", self.camera_id, self.owner())
+                        break
+                    last_renewal = time.monotonic()
+                read_start = time.perf_counter()
+                if not cap.grab():
+                    logger.warning("Camera %s: failed to read frame", self.camera_id)
+                    break
+                now = time.monotonic()
+                instant_fps = 1.0 / max(now - last_time, 1e-6)
+                self.fps = 0.9 * self.fps + 0.1 * instant_fps if self.fps else instant_fps
+                last_time = now
+                self.frames_read += 1
+                FRAMES_READ.inc(source=self.camera_id)
+
+                # Only convert the frames someone looks at: the sampler's picks and the preview at its frame rate
+                wants_sample = self.detecting and self.sampler.frames_until_decode() == 0
+                preview_interval = 1.0 / self.mjpeg.max_fps if self.mjpeg.max_fps > 0 else 0.0
+                wants_preview = self.viewers > 0 and now - last_push >= preview_interval
+                if self.detecting and not wants_sample:
+                    self.sampler.skip()
+                if not (wants_sample or wants_preview):
+                    if frame_interval:
+                        time.sleep(max(0.0, frame_interval - (time.monotonic() - now)))
+                    continue
+
+                ret, frame = cap.retrieve()
+                if not ret:
+                    logger.warning("Camera %s: failed to decode frame", self.camera_id)
+                    break
+                # Live sources block in grab() until the next frame, so this includes waiting on the camera
+                DECODE_SECONDS.observe(time.perf_counter() - read_start, source=self.camera_id)
+                self.buffer.push(frame)
+                last_push = now
+
+                if wants_sample and self.sampler.should_sample(frame):
+                    # Never queue a second request while the previous one is still being analyzed;
+                    # the worker picks whatever frame is newest when it starts, so frames never go stale
+                    if self._inference_pending:
+                        self.frames_skipped += 1
+                        FRAMES_DROPPED.inc(source=self.camera_id)
+                    else:
+                        self._inference_pending = True
+                        self.frames_sampled += 1
+                        FRAMES_SAMPLED.inc(source=self.camera_id)
+                        self.manager.submit(self)
+
+                if frame_interval:
+                    time.sleep(max(0.0, frame_interval - (time.monotonic() - now)))
+        except Exception as e:
+            self.error = str(e)
+            logger.exception("Camera %s: capture error %s", self.camera_id, e)
+        finally:
+            cap.release()
+            self.detecting = False
+            self.buffer.close()
+            try:
+                self.manager.state.release_lease(self.lease_name, worker_id())
+            except Exception as e:
+                logger.warning("Camera %s: failed to release lease: %s", self.camera_id, e)
+            logger.info("Camera %s: capture stopped", self.camera_id)
+
+    def _inference_done(self):
+        self._inference_pending = False
+
+    def wait_frame(self, after_seq, timeout=1.0):
+        # Newest packet captured after after_seq, or None if nothing new arrived in time
+        return self.buffer.wait_newer(after_seq, timeout)
+
+    def info(self):
+        return {
+            "camera_id": self.camera_id,
+            "source": self.source,
+            "capturing": self.capturing,
+            "detecting": self.detecting,
+            "viewers": self.viewers,
+            "sample_every": self.sample_every,
+            "sampler": self.sampler.stats(),
+            "tracker": self.tracker.stats() if self.tracker is not None else None,
+            "seen_vehicles": self.seen_vehicles.stats(),
+            "owner": self.owner(),
+            "frames_read": self.frames_read,
+            "frames_sampled": self.frames_sampled,
+            "frames_skipped": self.frames_skipped,
+            "fps": round(self.fps, 2),
+            "frame_latency": self.frame_latency.summary(),
+            "detection_latency": self.detection_latency.summary(),
+            "mjpeg": self.mjpeg.info(),
+            "error": self.error,
+        }
+
+
+class CameraManager:
+    """Runs any number of cameras; sampled frames from all of them share one inference pool.
+
+    `process(camera, packet)` analyzes one FramePacket and returns the log entries it produced.
+    `state` (see shared_state.py) holds the per-camera dedup windows and the capture leases.
+    """
+
+    def __init__(self, process, workers=INFERENCE_WORKERS, state=None, lease_ttl=CAMERA_LEASE_TTL):
+        self.process = process
+        self.workers = workers
+        self.state = state if state is not None else MemorySharedState()
+        self.lease_ttl = lease_ttl
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="inference")
+        self._cameras = {}
+        self._lock = threading.Lock()
+
+    def submit(self, camera):
+        future = self._pool.submit(self._infer, camera)
+        future.add_done_callback(lambda _: camera._inference_done())
+        return future
+
+    def _infer(self, camera):
+        packet = camera.buffer.latest()
+        if packet is None:
+            return
+        try:
+            new_logs = self.process(camera, packet) or []
+        except Exception as e:
+            logger.exception("Camera %s: inference error %s", camera.camera_id, e)
+            return
+        done = time.time()
+        camera.frame_latency.add(done - packet.captured_at)
+        for _ in new_logs:
+            camera.detection_latency.add(done - packet.captured_at)
+
+    def add(self, camera_id, source, sample_every=SAMPLE_EVERY, sampling=SAMPLING_MODE):
+        with self._lock:
+            if camera_id in self._cameras:
+                raise KeyError(f"Camera {camera_id} already exists")
+            camera = Camera(camera_id, source, self, sample_every, sampling=sampling)
+            self._cameras[camera_id] = camera
+        return camera
+
+    def get(self, camera_id):
+        with self._lock:
+            return self._cameras.get(camera_id)
+
+    def get_or_add(self, camera_id, source):
+        with self._lock:
+            camera = self._cameras.get(camera_id)
+            if camera is None:
+                camera = self._cameras[camera_id] = Camera(camera_id, source, self)
+        return camera
+
+    def remove(self, camera_id):
+        with self._lock:
+            camera = self._cameras.pop(camera_id, None)
+        if camera is not None:
+            camera.detecting = False
+            camera.stop_capture()
+        return camera
+
+    def list(self):
+        with self._lock:
+            cameras = list(self._cameras.values())
+        return [camera.info() for camera in cameras]
+
+    def shutdown(self):
+        with self._lock:
+            cameras = list(self._cameras.values())
+        for camera in cameras:
+            camera.detecting = False
+            camera.stop_capture()
+        self._pool.shutdown(wait=False)
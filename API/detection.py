@@ -0,0 +1,141 @@
+import logging
+import os
+import threading
+import time
+
+import cv2
+
+from metrics import DECODE_SECONDS, DETECTIONS, FRAMES_READ, FRAMES_SAMPLED, YOLO_SECONDS
+
+logger = logging.getLogger(__name__)
+
+# Number of sampled frames sent to YOLO in one call
+YOLO_BATCH_SIZE = int(os.getenv("YOLO_BATCH_SIZE", "8"))
+# Offline files consider seeking instead of grabbing when the next needed frame is at least this far
+# away (0 = never); whether they do depends on the measured seek and grab times, see iter_sampled_frames
+SEEK_MIN_GAP = int(os.getenv("SEEK_MIN_GAP", "8"))
+# FFmpeg "lowres" decoding: 1 = half, 2 = quarter resolution (MJPEG / MPEG-4 part 2 streams, ignored by H.264)
+DECODE_LOWRES = int(os.getenv("DECODE_LOWRES", "0"))
+
+_capture_options_lock = threading.Lock()
+
+
+def boxes_to_xyxy(result):
+    # Convert an ultralytics result into plain integer (x1, y1, x2, y2) tuples
+    return [tuple(int(v) for v in box) for box in result.boxes.xyxy.tolist()]
+
+
+def detect_batch(model, frames):
+    """Run the plate detector once on a list of frames and return the boxes for each frame."""
+    if not frames:
+        return []
+    start = time.perf_counter()
+    # Detector backends return plain boxes, a bare ultralytics model returns Results
+    if hasattr(model, "detect"):
+        boxes = model.detect(frames)
+    else:
+        boxes = [boxes_to_xyxy(result) for result in model(list(frames), verbose=False)]
+    YOLO_SECONDS.observe(time.perf_counter() - start)
+    DETECTIONS.inc(sum(len(frame_boxes) for frame_boxes in boxes))
+    return boxes
+
+
+def iter_batches(items, batch_size):
+    # Group any iterable into lists of at most batch_size items
+    batch_size = max(1, int(batch_size))
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def open_video(path, lowres=DECODE_LOWRES):
+    """Open a file or URL with FFmpeg, optionally decoding at reduced resolution."""
+    if not lowres:
+        return cv2.VideoCapture(path, cv2.CAP_FFMPEG)
+    # OpenCV only reads FFmpeg options from the environment, so set them just for this open
+    with _capture_options_lock:
+        previous = os.environ.get("OPENCV_FFMPEG_CAPTURE_OPTIONS")
+        options = f"lowres;{int(lowres)}"
+        os.environ["OPENCV_FFMPEG_CAPTURE_OPTIONS"] = f"{previous}|{options}" if previous else options
+        try:
+            return cv2.VideoCapture(path, cv2.CAP_FFMPEG)
+        finally:
+            if previous is None:
+                del os.environ["OPENCV_FFMPEG_CAPTURE_OPTIONS"]
+            else:
+                os.environ["OPENCV_FFMPEG_CAPTURE_OPTIONS"] = previous
+
+
+def frame_pts(cap, frame_number):
+    # Presentation time of the frame just grabbed, in seconds; None if the stream has no timestamps
+    pts = cap.get(cv2.CAP_PROP_POS_MSEC)
+    if pts <= 0 and frame_number > 1:
+        return None
+    return pts / 1000.0
+
+
+def iter_sampled_frames(cap, stride=25, sampler=None, start_frame=0, end_frame=None, seek_gap=SEEK_MIN_GAP):
+    """Yield (frame_number, frame, pts_seconds) for the frames the sampler picks (every stride-th by default).
+
+    Frames nobody needs are only grab()bed: FFmpeg still decodes them, but the BGR conversion and
+    copy of retrieve() are skipped. A seek makes FFmpeg jump to the preceding keyframe and decode
+    forward, so it costs about half a keyframe interval of decoding whatever the gap: it only pays
+    off for gaps longer than that. The crossover is measured instead of configured: for a gap of
+    seek_gap or more frames the first seek is a probe, later ones happen only while the average
+    seek time is below gap x the average grab time. With the default stride of 25 that means
+    seeking on short-GOP files (intra-only or keyframes every few frames) and grabbing on typical
+    H.264 with a keyframe every 2-10 s.
+    """
+    frame_count = start_frame
+    grab_seconds = None
+    seek_seconds = None
+    while end_frame is None or frame_count < end_frame:
+        if sampler is not None:
+            gap = sampler.frames_until_decode()
+        else:
+            gap = (stride - (frame_count + 1) % stride) % stride
+        if end_frame is not None and frame_count + gap >= end_frame:
+            # The next needed frame is past the end of this range
+            break
+
+        if (seek_gap and gap >= seek_gap and grab_seconds is not None
+                and (seek_seconds is None or seek_seconds < gap * grab_seconds)):
+            seek_start = time.perf_counter()
+            cap.set(cv2.CAP_PROP_POS_FRAMES, frame_count + gap)
+            elapsed = time.perf_counter() - seek_start
+            if seek_seconds is None:
+                logger.debug("Seeking %s frames took %.4fs, grabbing one %.4fs", gap, elapsed, grab_seconds)
+            seek_seconds = elapsed if seek_seconds is None else 0.8 * seek_seconds + 0.2 * elapsed
+            FRAMES_READ.inc(gap, source="video")
+            frame_count += gap
+            if sampler is not None:
+                sampler.skip(gap)
+            continue
+
+        read_start = time.perf_counter()
+        if not cap.grab():
+            logger.debug("End of video or read error at frame %s", frame_count)
+            break
+        frame_count += 1
+        FRAMES_READ.inc(source="video")
+        if gap:
+            elapsed = time.perf_counter() - read_start
+            grab_seconds = elapsed if grab_seconds is None else 0.9 * grab_seconds + 0.1 * elapsed
+            if sampler is not None:
+                sampler.skip()
+            continue
+
+        ret, frame = cap.retrieve()
+        DECODE_SECONDS.observe(time.perf_counter() - read_start, source="video")
+        if not ret:
+            logger.debug("Failed to decode frame %s", frame_count)
+            break
+        if sampler is not None and not sampler.should_sample(frame):
+            continue
+        FRAMES_SAMPLED.inc(source="video")
+        yield frame_count, frame, frame_pts(cap, frame_count)
@@ -0,0 +1,180 @@
+import logging
+import os
+import threading
+
+import cv2
+import numpy as np
+
+from detection import boxes_to_xyxy
+
+logger = logging.getLogger(__name__)
+
+# "ultralytics" (PyTorch checkpoint), "onnx" (ONNX Runtime) or "openvino"
+DETECTOR_BACKEND = os.getenv("DETECTOR_BACKEND", "ultralytics")
+DETECTOR_THREADS = int(os.getenv("DETECTOR_THREADS", "0"))  # 0 = runtime default
+DETECTOR_IMGSZ = 640
+DETECTOR_CONF = 0.25
+DETECTOR_IOU = 0.7
+
+_export_lock = threading.Lock()
+
+
+def export_onnx(weights, imgsz=DETECTOR_IMGSZ):
+    """Export the .pt checkpoint to ONNX once and reuse the file next to the weights afterwards."""
+    onnx_path = os.path.splitext(weights)[0] + ".onnx"
+    with _export_lock:
+        if os.path.exists(onnx_path) and os.path.getmtime(onnx_path) >= os.path.getmtime(weights):
+            return onnx_path
+        from ultralytics import YOLO
+
+        logger.info("Exporting %s to ONNX", weights)
+        exported = YOLO(weights).export(format="onnx", imgsz=imgsz, dynamic=True)
+        if os.path.abspath(exported) != os.path.abspath(onnx_path):
+            os.replace(exported, onnx_path)
+    return onnx_path
+
+
+def letterbox(img, size=DETECTOR_IMGSZ):
+    # Same resize + grey padding as ultralytics, returns the scale and padding to undo it
+    h, w = img.shape[:2]
+    ratio = min(size / h, size / w)
+    new_w, new_h = int(round(w * ratio)), int(round(h * ratio))
+    if (new_w, new_h) != (w, h):
+        img = cv2.resize(img, (new_w, new_h), interpolation=cv2.INTER_LINEAR)
+    dw, dh = (size - new_w) / 2, (size - new_h) / 2
+    top, bottom = int(round(dh - 0.1)), int(round(dh + 0.1))
+    left, right = int(round(dw - 0.1)), int(round(dw + 0.1))
+    img = cv2.copyMakeBorder(img, top, bottom, left, right, cv2.BORDER_CONSTANT, value=(114, 114, 114))
+    return img, ratio, (left, top)
+
+
+class UltralyticsDetector:
+    name = "ultralytics"
+
+    def __init__(self, weights):
+        from ultralytics import YOLO
+
+        self.model = YOLO(weights)
+
+    def detect(self, frames):
+        return [boxes_to_xyxy(result) for result in self.model(list(frames), verbose=False)]
+
+    def warmup(self, runs=2, imgsz=DETECTOR_IMGSZ):
+        frame = np.zeros((imgsz, imgsz, 3), dtype=np.uint8)
+        for _ in range(runs):
+            self.model(frame, verbose=False)
+
+
+class ExportedDetector:
+    """Shared pre/post-processing for runtimes that execute the exported YOLOv8 graph."""
+
+    name = "exported"
+
+    def __init__(self, imgsz=DETECTOR_IMGSZ, conf=DETECTOR_CONF, iou=DETECTOR_IOU):
+        self.imgsz = imgsz
+        self.conf = conf
+        self.iou = iou
+
+    def run(self, batch):
+        raise NotImplementedError
+
+    def detect(self, frames):
+        frames = list(frames)
+        if not frames:
+            return []
+        letterboxed = [letterbox(frame, self.imgsz) for frame in frames]
+        # BGR HWC uint8 -> RGB CHW float32 in [0, 1], stacked into one batch
+        batch = np.stack([img[:, :, ::-1].transpose(2, 0, 1) for img, _, _ in letterboxed])
+        batch = np.ascontiguousarray(batch, dtype=np.float32) / 255.0
+        output = self.run(batch)
+        return [
+            self.postprocess(prediction, ratio, pad, frame.shape)
+            for prediction, (_, ratio, pad), frame in zip(output, letterboxed, frames)
+        ]
+
+    def postprocess(self, prediction, ratio, pad, shape):
+        # prediction is (4 + classes, anchors): cx, cy, w, h followed by class scores
+        prediction = prediction.T
+        scores = prediction[:, 4:].max(axis=1)
+        keep = scores > self.conf
+        if not keep.any():
+            return []
+        prediction, scores = prediction[keep], scores[keep]
+        cx, cy, w, h = prediction[:, 0], prediction[:, 1], prediction[:, 2], prediction[:, 3]
+        rects = np.stack([cx - w / 2, cy - h / 2, w, h], axis=1)
+        indices = cv2.dnn.NMSBoxes(rects.tolist(), scores.tolist(), self.conf, self.iou)
+        height, width = shape[:2]
+        boxes = []
+        for i in np.array(indices).reshape(-1):
+            x, y, bw, bh = rects[i]
+            x1 = min(max((x - pad[0]) / ratio, 0), width)
+            y1 = min(max((y - pad[1]) / ratio, 0), height)
+            x2 = min(max((x + bw - pad[0]) / ratio, 0), width)
+            y2 = min(max((y + bh - pad[1]) / ratio, 0), height)
+            boxes.append((int(x1), int(y1), int(x2), int(y2)))
+        return boxes
+
+    def warmup(self, runs=2):
+        frame = np.zeros((self.imgsz, self.imgsz, 3), dtype=np.uint8)
+        for _ in range(runs):
+            self.detect([frame])
+
+
+class OnnxDetector(ExportedDetector):
+    name = "onnx"
+
+    def __init__(self, onnx_path, threads=DETECTOR_THREADS, **kwargs):
+        import onnxruntime as ort
+
+        super().__init__(**kwargs)
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads:
+            options.intra_op_num_threads = threads
+        self.session = ort.InferenceSession(onnx_path, options, providers=["CPUExecutionProvider"])
+        self.input_name = self.session.get_inputs()[0].name
+
+    def run(self, batch):
+        return self.session.run(None, {self.input_name: batch})[0]
+
+
+class OpenVinoDetector(ExportedDetector):
+    name = "openvino"
+
+    def __init__(self, onnx_path, threads=DETECTOR_THREADS, **kwargs):
+        try:
+            from openvino import Core
+        except ImportError:
+            from openvino.runtime import Core
+
+        super().__init__(**kwargs)
+        config = {"INFERENCE_NUM_THREADS": threads} if threads else {}
+        core = Core()
+        self.model = core.compile_model(core.read_model(onnx_path), "CPU", config)
+        self.output = self.model.output(0)
+
+    def run(self, batch):
+        return self.model(batch)[self.output]
+
+
+# pip package each exported-graph runtime needs, see requirements-optional.txt
+BACKEND_PACKAGES = {"onnx": "onnxruntime", "openvino": "openvino"}
+
+
+def create_detector(backend, weights, threads=DETECTOR_THREADS):
+    """Build the requested detector; a runtime that is not installed is an error, not a silent fallback."""
+    backend = (backend or "ultralytics").lower()
+    if backend == "ultralytics":
+        return UltralyticsDetector(weights)
+    if backend not in BACKEND_PACKAGES:
+        raise ValueError(f"Unknown DETECTOR_BACKEND {backend!r}, use ultralytics, onnx or openvino")
+    detector_class = OpenVinoDetector if backend == "openvino" else OnnxDetector
+    onnx_path = export_onnx(weights)
+    try:
+        return detector_class(onnx_path, threads)
+    except ImportError as e:
+        package = BACKEND_PACKAGES[backend]
+        raise RuntimeError(
+            f"DETECTOR_BACKEND={backend} needs the {package} package ({e}); "
+            f"pip install {package} or pip install -r requirements-optional.txt"
+        ) from e
@@ -0,0 +1,89 @@
+import threading
+import time
+from collections import deque
+
+FRAME_BUFFER_SIZE = 4
+
+
+class FramePacket:
+    __slots__ = ("seq", "frame", "captured_at")
+
+    def __init__(self, seq, frame, captured_at):
+        self.seq = seq
+        self.frame = frame
+        # Wall-clock capture time, comparable with log timestamps
+        self.captured_at = captured_at
+
+
+class FrameRingBuffer:
+    """Fixed-size buffer of the most recent frames; writers never block on readers."""
+
+    def __init__(self, capacity=FRAME_BUFFER_SIZE):
+        self._frames = deque(maxlen=max(1, capacity))
+        self._seq = 0
+        self._closed = False
+        self._cond = threading.Condition()
+
+    @property
+    def seq(self):
+        return self._seq
+
+    def push(self, frame, captured_at=None):
+        with self._cond:
+            self._seq += 1
+            packet = FramePacket(self._seq, frame, captured_at or time.time())
+            self._frames.append(packet)
+            self._cond.notify_all()
+        return packet
+
+    def latest(self):
+        with self._cond:
+            return self._frames[-1] if self._frames else None
+
+    def wait_newer(self, after_seq, timeout=1.0):
+        # Return the newest packet with seq > after_seq, or None on timeout / close
+        with self._cond:
+            self._cond.wait_for(lambda: self._seq > after_seq or self._closed, timeout)
+            if self._frames and self._frames[-1].seq > after_seq:
+                return self._frames[-1]
+            return None
+
+    def open(self):
+        with self._cond:
+            self._closed = False
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+
+class LatencyStats:
+    """Rolling window of latency samples in seconds."""
+
+    def __init__(self, window=512):
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+        self.count = 0
+
+    def add(self, seconds):
+        with self._lock:
+            self._samples.append(seconds)
+            self.count += 1
+
+    def summary(self):
+        with self._lock:
+            samples = sorted(self._samples)
+        if not samples:
+            return {"count": self.count}
+
+        def pct(p):
+            return round(1000 * samples[min(len(samples) - 1, int(p * len(samples)))], 2)
+
+        return {
+            "count": self.count,
+            "p50_ms": pct(0.50),
+            "p95_ms": pct(0.95),
+            "max_ms": round(1000 * samples[-1], 2),
+            "mean_ms": round(1000 * sum(samples) / len(samples), 2),
+        }
@@ -0,0 +1,17 @@
+# Multi-worker deployment with models shared between workers (Linux):
+#     gunicorn -c gunicorn.conf.py main:app
+# The master imports main once with PRELOAD_MODELS=1, so PaddleOCR and the detector weights are
+# loaded before the fork and the workers share those pages copy-on-write; the first inference
+# thread of each worker uses that pair, further threads load their own on first use. Network
+# clients, SQLite connections, listeners and the detector warm-up start inside each worker, after the fork.
+# Live cameras need SHARED_STATE=redis (pip install redis) once there is more than one worker,
+# so dedup windows, plate state and /ws/plates events are shared and each camera has one owner.
+import os
+
+os.environ.setdefault("PRELOAD_MODELS", "1")
+
+bind = os.getenv("BIND", "0.0.0.0:8000")
+workers = int(os.getenv("WEB_CONCURRENCY", "2"))
+worker_class = "uvicorn.workers.UvicornWorker"
+preload_app = True
+timeout = 120
@@ -0,0 +1,192 @@
+import asyncio
+import logging
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+MAX_CONCURRENT_JOBS = 2
+MAX_QUEUED_JOBS = 20
+MAX_FINISHED_JOBS = 100
+
+QUEUED, RUNNING, COMPLETED, FAILED, CANCELLED = "queued", "running", "completed", "failed", "cancelled"
+FINISHED = (COMPLETED, FAILED, CANCELLED)
+
+
+class JobCancelled(Exception):
+    pass
+
+
+class JobQueueFull(Exception):
+    pass
+
+
+class Job:
+    """One background video analysis; progress is pushed to async listeners as it changes."""
+
+    def __init__(self, kind, params=None):
+        self.job_id = uuid.uuid4().hex
+        self.kind = kind
+        self.params = params or {}
+        self.status = QUEUED
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.progress = {"frames_decoded": 0, "frames_analyzed": 0, "plates_found": 0, "fps": 0.0}
+        self.result = None
+        self.error = None
+        self.future = None
+        self.on_finish = None
+        self.cancel_event = threading.Event()
+        self._listeners = set()
+        self._lock = threading.Lock()
+
+    def check_cancelled(self):
+        # Called by the job function between batches
+        if self.cancel_event.is_set():
+            raise JobCancelled()
+
+    def update(self, **progress):
+        with self._lock:
+            self.progress.update(progress)
+            if self.started_at:
+                elapsed = time.time() - self.started_at
+                self.progress["fps"] = round(self.progress["frames_decoded"] / elapsed, 2) if elapsed > 0 else 0.0
+        self._publish()
+
+    def _set_status(self, status, **fields):
+        with self._lock:
+            self.status = status
+            for key, value in fields.items():
+                setattr(self, key, value)
+        self._publish()
+
+    def info(self, include_result=False):
+        with self._lock:
+            info = {
+                "job_id": self.job_id,
+                "kind": self.kind,
+                "status": self.status,
+                "created_at": self.created_at,
+                "started_at": self.started_at,
+                "finished_at": self.finished_at,
+                "progress": dict(self.progress),
+                "error": self.error,
+            }
+            if include_result and self.status == COMPLETED:
+                info["result"] = self.result
+        return info
+
+    def subscribe(self, maxsize=100):
+        # Must be called from the event loop; returns a queue receiving info() snapshots
+        queue = asyncio.Queue(maxsize=maxsize)
+        listener = (asyncio.get_running_loop(), queue)
+        with self._lock:
+            self._listeners.add(listener)
+        queue.put_nowait(self.info())
+        return queue, listener
+
+    def unsubscribe(self, listener):
+        with self._lock:
+            self._listeners.discard(listener)
+
+    def _publish(self):
+        info = self.info()
+        with self._lock:
+            listeners = list(self._listeners)
+        for loop, queue in listeners:
+            loop.call_soon_threadsafe(_offer, queue, info)
+
+
+def _offer(queue, item):
+    # Progress events are snapshots, so a lagging listener only needs the newest one
+    if queue.full():
+        try:
+            queue.get_nowait()
+        except asyncio.QueueEmpty:
+            pass
+    queue.put_nowait(item)
+
+
+class JobManager:
+    """Runs jobs on a bounded thread pool with a cap on queued jobs and cancellation."""
+
+    def __init__(self, max_concurrent=MAX_CONCURRENT_JOBS, max_queued=MAX_QUEUED_JOBS, max_finished=MAX_FINISHED_JOBS):
+        self.max_queued = max_queued
+        self.max_finished = max_finished
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrent, thread_name_prefix="job")
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+
+    def submit(self, kind, fn, params=None, on_finish=None):
+        """Queue fn(job) and return the Job right away; fn returns the job result."""
+        with self._lock:
+            queued = sum(1 for job in self._jobs.values() if job.status == QUEUED)
+            if queued >= self.max_queued:
+                raise JobQueueFull(f"{queued} jobs already queued")
+            job = Job(kind, params)
+            job.on_finish = on_finish
+            self._jobs[job.job_id] = job
+            self._prune()
+        job.future = self._executor.submit(self._run, job, fn)
+        return job
+
+    def _run(self, job, fn):
+        try:
+            if job.cancel_event.is_set():
+                raise JobCancelled()
+            job._set_status(RUNNING, started_at=time.time())
+            result = fn(job)
+            job._set_status(COMPLETED, result=result, finished_at=time.time())
+            return result
+        except JobCancelled:
+            job._set_status(CANCELLED, finished_at=time.time())
+        except Exception as e:
+            logger.exception("Job %s failed: %s", job.job_id, e)
+            job._set_status(FAILED, error=str(e), finished_at=time.time())
+            raise
+        finally:
+            self._finish(job)
+
+    def _finish(self, job):
+        on_finish, job.on_finish = job.on_finish, None
+        if on_finish is not None:
+            try:
+                on_finish(job)
+            except Exception as e:
+                logger.error("Job %s cleanup error: %s", job.job_id, e)
+
+    def _prune(self):
+        finished = [job_id for job_id, job in self._jobs.items() if job.status in FINISHED]
+        for job_id in finished[:max(0, len(finished) - self.max_finished)]:
+            del self._jobs[job_id]
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def list(self):
+        with self._lock:
+            jobs = list(self._jobs.values())
+        return [job.info() for job in jobs]
+
+    def cancel(self, job_id):
+        job = self.get(job_id)
+        if job is None or job.status in FINISHED:
+            return job
+        job.cancel_event.set()
+        # A job that has not started is removed from the executor queue right away
+        if job.future is not None and job.future.cancel():
+            job._set_status(CANCELLED, finished_at=time.time())
+            self._finish(job)
+        return job
+
+    def shutdown(self):
+        with self._lock:
+            jobs = list(self._jobs.values())
+        for job in jobs:
+            job.cancel_event.set()
+        self._executor.shutdown(wait=False, cancel_futures=True)
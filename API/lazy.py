@@ -0,0 +1,105 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+PENDING, LOADING, READY, FAILED = "pending", "loading", "ready", "failed"
+
+
+def resolve_client(client):
+    # Clients may be passed as zero-argument factories so they are only created on first use
+    return client() if callable(client) else client
+
+
+class LazyResource:
+    """A heavy dependency (model, SDK client) built on first use, exactly once, from any thread.
+
+    A failed build is retried by the next get().
+    """
+
+    def __init__(self, name, factory, required=True):
+        self.name = name
+        self.factory = factory
+        self.required = required
+        self.state = PENDING
+        self.error = None
+        self.load_seconds = None
+        self._value = None
+        self._lock = threading.Lock()
+
+    def __call__(self):
+        return self.get()
+
+    def get(self):
+        if self.state == READY:
+            return self._value
+        with self._lock:
+            if self.state == READY:
+                return self._value
+            self.state = LOADING
+            start = time.perf_counter()
+            try:
+                value = self.factory()
+            except Exception as e:
+                self.state = FAILED
+                self.error = str(e)
+                logger.error("Failed to load %s: %s", self.name, e)
+                raise
+            self._value = value
+            self.load_seconds = time.perf_counter() - start
+            self.error = None
+            self.state = READY
+            logger.info("Loaded %s in %.2fs", self.name, self.load_seconds)
+            return value
+
+    @property
+    def ready(self):
+        return self.state == READY
+
+    def info(self):
+        return {
+            "state": self.state,
+            "required": self.required,
+            "load_seconds": round(self.load_seconds, 3) if self.load_seconds is not None else None,
+            "error": self.error,
+        }
+
+
+class ResourceRegistry:
+    """Named lazy resources with a background warm-up and a readiness summary."""
+
+    def __init__(self):
+        self._resources = OrderedDict()
+        self._warmup_thread = None
+
+    def add(self, name, factory, required=True):
+        resource = self._resources[name] = LazyResource(name, factory, required)
+        return resource
+
+    def __getitem__(self, name):
+        return self._resources[name]
+
+    def __contains__(self, name):
+        return name in self._resources
+
+    def load(self, names=None):
+        # Build resources in registration order, a failure does not stop the others
+        for name in names or list(self._resources):
+            try:
+                self._resources[name].get()
+            except Exception:
+                pass
+
+    def warm_up(self, names=None):
+        if self._warmup_thread is None or not self._warmup_thread.is_alive():
+            self._warmup_thread = threading.Thread(target=self.load, args=(names,), name="warm-up", daemon=True)
+            self._warmup_thread.start()
+        return self._warmup_thread
+
+    def ready(self):
+        return all(resource.ready for resource in self._resources.values() if resource.required)
+
+    def info(self):
+        return {name: resource.info() for name, resource in self._resources.items()}
@@ -0,0 +1,145 @@
+import os
+import threading
+from collections import OrderedDict, deque
+from datetime import datetime
+
+# Readings of a plate logged less than this long ago are not logged again
+LOG_DEDUP_SECONDS = 30.0
+# Plates not logged for this long are forgotten; must be at least LOG_DEDUP_SECONDS
+SEEN_VEHICLES_TTL = float(os.getenv("SEEN_VEHICLES_TTL", "120"))
+SEEN_VEHICLES_MAX_SIZE = int(os.getenv("SEEN_VEHICLES_MAX_SIZE", "10000"))
+LIVE_EVENTS_CAPACITY = int(os.getenv("LIVE_EVENTS_CAPACITY", "1000"))
+
+EPOCH = datetime(1970, 1, 1)
+
+
+def to_seconds(when):
+    # Log times are naive UTC datetimes
+    return (when - EPOCH).total_seconds()
+
+
+def page_events(events, latest, after, limit):
+    """Page of (seq, event) pairs from a ring whose newest event is latest, see EventLog.read."""
+    if after < 0 or after > latest:
+        # A position from before a restart: start over from the oldest retained event
+        after = 0
+    first = events[0][0] if events else latest + 1
+    missed = max(0, first - after - 1) if after < latest else 0
+    start = max(0, after - first + 1)
+    page = [dict(event, seq=seq) for seq, event in events[start:start + limit]]
+    return page, page[-1]["seq"] if page else after, missed
+
+
+class SeenVehicle:
+    __slots__ = ("last_logged", "last_status")
+
+    def __init__(self, last_logged, last_status):
+        self.last_logged = last_logged
+        self.last_status = last_status
+
+
+class SeenVehicles:
+    """Last log time and status per plate, only for plates logged within the last ttl seconds.
+
+    Time is the log time passed in rather than read here, so expiry follows the readings themselves.
+    Plates are kept in last-logged order: expired ones are dropped from the front on every claim()
+    and record(), and max_size bounds a burst of distinct (e.g. misread) plates inside one ttl.
+    """
+
+    def __init__(self, ttl=SEEN_VEHICLES_TTL, max_size=SEEN_VEHICLES_MAX_SIZE):
+        self.ttl = max(ttl, LOG_DEDUP_SECONDS)
+        self.max_size = max_size
+        self._vehicles = OrderedDict()
+        self._latest = None
+        self._lock = threading.Lock()
+        self.evicted = 0
+
+    def __len__(self):
+        return len(self._vehicles)
+
+    def __contains__(self, plate):
+        return plate in self._vehicles
+
+    def get(self, plate):
+        return self._vehicles.get(plate)
+
+    def logged_within(self, plate, when, seconds=LOG_DEDUP_SECONDS):
+        vehicle = self._vehicles.get(plate)
+        return vehicle is not None and to_seconds(when) - vehicle.last_logged < seconds
+
+    def claim(self, plate, when, seconds=LOG_DEDUP_SECONDS):
+        """Atomically check the dedup window and start a new one; False if the plate was logged within it."""
+        with self._lock:
+            if self.logged_within(plate, when, seconds):
+                return False
+            self._record(plate, to_seconds(when), None)
+            return True
+
+    def release(self, plate):
+        # Give back a claim that did not lead to a log
+        with self._lock:
+            self._vehicles.pop(plate, None)
+
+    def record(self, plate, when, status):
+        with self._lock:
+            self._record(plate, to_seconds(when), status)
+
+    def _record(self, plate, now, status):
+        vehicle = self._vehicles.pop(plate, None)
+        if vehicle is None:
+            vehicle = SeenVehicle(now, status)
+        else:
+            vehicle.last_logged, vehicle.last_status = now, status
+        self._vehicles[plate] = vehicle
+        if self._latest is None or now > self._latest:
+            self._latest = now
+        self._evict()
+
+    def _evict(self):
+        cutoff = self._latest - self.ttl
+        vehicles = self._vehicles
+        while vehicles:
+            plate, vehicle = next(iter(vehicles.items()))
+            if vehicle.last_logged >= cutoff and len(vehicles) <= self.max_size:
+                break
+            del vehicles[plate]
+            self.evicted += 1
+
+    def stats(self):
+        return {"size": len(self._vehicles), "ttl": self.ttl, "max_size": self.max_size, "evicted": self.evicted}
+
+
+class EventLog:
+    """Fixed-capacity ring of the most recent events, numbered so readers can resume where they left off."""
+
+    def __init__(self, capacity=LIVE_EVENTS_CAPACITY):
+        self._events = deque(maxlen=max(1, capacity))
+        self._seq = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._events)
+
+    @property
+    def seq(self):
+        return self._seq
+
+    def append(self, event):
+        with self._lock:
+            self._seq += 1
+            self._events.append((self._seq, event))
+            return self._seq
+
+    def read(self, after=0, limit=100):
+        """Events with a sequence number above after, oldest first.
+
+        Returns (events, next_after, missed); missed counts events that were already
+        overwritten when the reader fell more than the capacity behind.
+        """
+        with self._lock:
+            events = list(self._events)
+            latest = self._seq
+        return page_events(events, latest, after, limit)
+
+    def stats(self):
+        return {"size": len(self._events), "capacity": self._events.maxlen, "seq": self._seq}
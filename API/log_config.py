@@ -0,0 +1,41 @@
+import json
+import logging
+import os
+
+# DEBUG brings back the per-frame "YOLO results" / "Plate text" lines, OFF silences everything
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+# "text" for humans, "json" for one structured object per line
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text")
+
+_record_fields = set(vars(logging.makeLogRecord({}))) | {"message", "asctime"}
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        # Anything passed through extra={...} becomes a field of its own
+        for key, value in vars(record).items():
+            if key not in _record_fields:
+                entry[key] = value
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+def configure_logging(level=LOG_LEVEL, fmt=LOG_FORMAT):
+    root = logging.getLogger()
+    if str(level).upper() == "OFF":
+        logging.disable(logging.CRITICAL)
+        return
+    handler = logging.StreamHandler()
+    if fmt == "json":
+        handler.setFormatter(JsonFormatter())
+    else:
+        handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+    root.handlers[:] = [handler]
+    root.setLevel(str(level).upper())
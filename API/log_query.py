@@ -0,0 +1,139 @@
+import base64
+import json
+import threading
+import time
+from collections import OrderedDict
+
+from plate_state import parse_log_timestamp
+
+LOGS_PAGE_SIZE = 100
+LOGS_MAX_PAGE_SIZE = 500
+LOGS_CACHE_TTL = 5.0
+LOGS_CACHE_MAX_ENTRIES = 256
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(timestamp, key):
+    # Opaque to clients: the (timestamp, id) of the last log on the page
+    raw = json.dumps([timestamp, key], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        timestamp, key = json.loads(raw)
+    except Exception as e:
+        raise InvalidCursor(f"Invalid cursor: {cursor}") from e
+    # Timestamps are ISO strings (None for a log without one), ids are Firestore strings or SQLite integers;
+    # anything else would reach the query, and the page cache key, as an unhashable or wrong type
+    valid_key = isinstance(key, (str, int)) and not isinstance(key, bool)
+    if not valid_key or not (timestamp is None or isinstance(timestamp, str)):
+        raise InvalidCursor(f"Invalid cursor: {cursor}")
+    return timestamp, key
+
+
+def normalize_timestamp(value):
+    # Logs store datetime.utcnow().isoformat(), so naive UTC ISO strings compare in time order
+    if not value:
+        return None
+    return parse_log_timestamp(value).isoformat()
+
+
+def split_values(value):
+    if not value:
+        return ()
+    return tuple(sorted({v.strip() for v in value.split(",") if v.strip()}))
+
+
+class LogQuery:
+    """Filters and page position for a newest-first page of logs."""
+
+    __slots__ = ("plate", "statuses", "visitor_statuses", "camera", "since", "until", "limit", "cursor")
+
+    def __init__(self, plate=None, statuses=(), visitor_statuses=(), camera=None, since=None, until=None,
+                 limit=LOGS_PAGE_SIZE, cursor=None):
+        self.plate = plate or None
+        self.statuses = tuple(statuses)
+        self.visitor_statuses = tuple(visitor_statuses)
+        self.camera = camera or None
+        self.since = normalize_timestamp(since)
+        self.until = normalize_timestamp(until)
+        self.limit = max(1, min(int(limit), LOGS_MAX_PAGE_SIZE))
+        self.cursor = decode_cursor(cursor) if cursor else None
+
+    def key(self):
+        return tuple(getattr(self, name) for name in self.__slots__)
+
+
+def stream_log_page(entries, next_cursor):
+    """Yield the {"logs": [...], "next_cursor": ...} body one log at a time."""
+    yield b'{"logs":['
+    for i, entry in enumerate(entries):
+        yield (b"," if i else b"") + json.dumps(entry, default=str).encode()
+    yield b'],"next_cursor":' + json.dumps(next_cursor).encode() + b"}"
+
+
+class LogQueryCache:
+    """Short-TTL cache of rendered log pages, cleared whenever new logs are written.
+
+    A page rendered from a query that started before the latest invalidation is not stored,
+    so a slow query can never put pre-write results back into the cache.
+    """
+
+    def __init__(self, ttl=LOGS_CACHE_TTL, max_entries=LOGS_CACHE_MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._generation = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    @property
+    def generation(self):
+        return self._generation
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and time.monotonic() - entry[0] < self.ttl:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def put(self, key, body, generation):
+        if self.ttl <= 0:
+            return
+        with self._lock:
+            if generation != self._generation:
+                return
+            self._entries[key] = (time.monotonic(), body)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, *_):
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+            self.invalidations += 1
+
+    def stats(self):
+        with self._lock:
+            size = len(self._entries)
+        return {
+            "size": size,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "invalidations": self.invalidations,
+        }
@@ -1,31 +1,50 @@
 import cv2
 import tempfile
 import requests
-import uuid
 import os
 import threading
 import time
+import json
+import logging
+from concurrent.futures import CancelledError, as_completed
 from datetime import datetime, timedelta
-from difflib import get_close_matches
 from fastapi import FastAPI, HTTPException, Body, WebSocket, WebSocketDisconnect, UploadFile, File
 from typing import Optional
 from fastapi.middleware.cors import CORSMiddleware
 import asyncio
 from pydantic import BaseModel
 from dotenv import load_dotenv
-from supabase import create_client
-from fastapi.responses import StreamingResponse
-from ultralytics import YOLO
+from fastapi.responses import FileResponse, JSONResponse, Response, StreamingResponse
 import re
-import numpy as np
-from paddleocr import PaddleOCR
-import firebase_admin
-from firebase_admin import credentials, firestore
-from threading import Lock
+from detection import SEEK_MIN_GAP, YOLO_BATCH_SIZE, detect_batch, iter_batches, iter_sampled_frames, open_video
+from detector_backends import DETECTOR_BACKEND, create_detector
+from video_chunks import CHUNK_OVERLAP_FRAMES, VIDEO_WORKERS, create_video_pool, merge_detections, submit_chunks
+from auth_cache import AUTH_CACHE_MAX_SIZE, AUTH_CACHE_TTL, AuthorizationCache
+from plate_state import create_plate_state_backend
+from write_behind import WRITER_BATCH_SIZE, WRITER_QUEUE_SIZE, WRITER_WORKERS, WriteBehindWriter
+from cameras import INFERENCE_WORKERS, SAMPLE_EVERY, CameraManager
+from sampling import SAMPLING_MODE, create_sampler
+from tracking import TRACKING_ENABLED, PlateTracker, read_tracked_plates
+from jobs import CANCELLED, FINISHED, MAX_CONCURRENT_JOBS, MAX_QUEUED_JOBS, JobManager, JobQueueFull
+from broadcaster import SUBSCRIBER_QUEUE_SIZE, EventBroadcaster, EventRelay
+from plate_ocr import clean_plate_text, crop_plates, recognize_plates, recognize_plates_per_frame
+from plate_registry import PLATE_REGION, PlateGrammar, PlateRegistry, PlateResolver
+from lazy import FAILED, ResourceRegistry
+from log_config import LOG_FORMAT, LOG_LEVEL, configure_logging
+from log_query import LOGS_CACHE_TTL, LOGS_PAGE_SIZE, InvalidCursor, LogQuery, LogQueryCache, split_values, stream_log_page
+from storage import STORAGE_BACKEND, STORAGE_BLOB_DIR, STORAGE_SQLITE_PATH, create_storage
+from snapshots import SnapshotEncoder, SnapshotStore, content_type_for
+from live_state import LIVE_EVENTS_CAPACITY, LOG_DEDUP_SECONDS, SeenVehicles
+from shared_state import create_shared_state, worker_id
+from metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, LOGS_DROPPED, LOGS_WRITTEN, REGISTRY as metrics_registry
 
 # Load environment variables
 load_dotenv()
 
+# LOG_LEVEL=DEBUG for per-frame detail, OFF to silence; LOG_FORMAT=json for structured output
+configure_logging(os.getenv("LOG_LEVEL", LOG_LEVEL), os.getenv("LOG_FORMAT", LOG_FORMAT))
+logger = logging.getLogger("main")
+
 SUPABASE_URL = os.getenv("SUPABASE_URL")
 SUPABASE_KEY = os.getenv("SUPABASE_KEY")
 BUCKET = os.getenv("SUPABASE_BUCKET")
@@ -40,62 +59,238 @@ app.add_middleware(
     allow_headers=["*"],  # Allow all headers
 )
 
-supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
+# "firestore" keeps visitors/logs in Firestore and snapshots in Supabase, "local" uses SQLite and the filesystem
+STORAGE = os.getenv("STORAGE_BACKEND", STORAGE_BACKEND).lower()
+STORAGE_PATH = os.getenv("STORAGE_SQLITE_PATH", STORAGE_SQLITE_PATH)
+
+# SDK clients and models are built on first use (or by the background warm-up), see /ready
+resources = ResourceRegistry()
+
+def create_firestore_client():
+    import firebase_admin
+    from firebase_admin import credentials, firestore
+
+    # Initialize Firebase Admin SDK
+    cred = credentials.Certificate("firebase_key.json")
+    firebase_admin.initialize_app(cred)
+    return firestore.client()
+
+def create_supabase_client():
+    from supabase import create_client
+
+    return create_client(SUPABASE_URL, SUPABASE_KEY)
+
+if STORAGE == "local":
+    supabase = None
+    db = None
+else:
+    supabase = resources.add("supabase", create_supabase_client)
+    db = resources.add("firestore", create_firestore_client)
+
+storage = create_storage(
+    STORAGE,
+    db=db,
+    supabase=supabase,
+    bucket=BUCKET,
+    supabase_url=SUPABASE_URL,
+    sqlite_path=STORAGE_PATH,
+    blob_dir=os.getenv("STORAGE_BLOB_DIR", STORAGE_BLOB_DIR),
+    blob_base_url=os.getenv("STORAGE_BLOB_URL", "http://localhost:8000/snapshots"),
+)
+
+def create_ocr():
+    from paddleocr import PaddleOCR
 
-# Initialize Firebase Admin SDK
-cred = credentials.Certificate("firebase_key.json")
-firebase_admin.initialize_app(cred)
+    return PaddleOCR(use_angle_cls=True, use_gpu=False)
 
-# Create Firestore client
-db = firestore.client()
+# Call ocr() / yolo_model() to get the shared model; inference threads use inference_models() instead
+ocr = resources.add("ocr", create_ocr)
 
+# The YOLOv8 plate detector (PyTorch, ONNX Runtime or OpenVINO, see DETECTOR_BACKEND)
+YOLO_WEIGHTS = "weights/license_plate_detector.pt"
+yolo_model = resources.add("detector", lambda: create_detector(DETECTOR_BACKEND, YOLO_WEIGHTS))
 
-ocr = PaddleOCR(use_angle_cls=True, use_gpu=False)
+# Plate -> visitor document cache, kept fresh by a listener on the visitors collection
+authorization_cache = AuthorizationCache(
+    storage.visitors,
+    ttl=float(os.getenv("AUTH_CACHE_TTL", AUTH_CACHE_TTL)),
+    max_size=int(os.getenv("AUTH_CACHE_MAX_SIZE", AUTH_CACHE_MAX_SIZE)),
+)
 
-# Load the YOLOv8 model
-yolo_model = YOLO("weights/license_plate_detector.pt")
+# Registered plates indexed for fuzzy matching of OCR misreads, plus the regional plate format
+plate_registry = PlateRegistry()
+plate_resolver = PlateResolver(plate_registry, PlateGrammar(PLATE_REGION))
 
+# Dedup windows, plate state, live events and camera leases; SHARED_STATE=redis lets several
+# uvicorn workers or hosts serve the same cameras without duplicate logs (see shared_state.py)
+shared_state = create_shared_state()
 
-live_feed_active = False
-live_feed_logs = []
-live_feed_thread = None
+# Latest status/timestamp per plate, persisted to "memory", "firestore" (plate_state collection) or "sqlite"
+plate_state = shared_state.plate_states(create_plate_state_backend(
+    os.getenv("PLATE_STATE_BACKEND", "sqlite" if STORAGE == "local" else "firestore"),
+    db=db,
+    sqlite_path=os.getenv("PLATE_STATE_SQLITE_PATH", STORAGE_PATH if STORAGE == "local" else "plate_state.db"),
+))
+
+# Most recent live events, numbered so /live-feed/events readers can resume
+live_feed_logs = shared_state.event_log("live", int(os.getenv("LIVE_EVENTS_CAPACITY", LIVE_EVENTS_CAPACITY)))
+
+# Live detections are pushed to /ws/plates subscribers as they happen
+event_broadcaster = EventBroadcaster(
+    queue_size=int(os.getenv("WS_QUEUE_SIZE", SUBSCRIBER_QUEUE_SIZE)),
+    slow_policy=os.getenv("WS_SLOW_POLICY", "lag"),
+)
+# With shared state the worker owning a camera is not the one holding most subscribers,
+# so every worker relays the shared event log to its own subscribers, woken by Redis pub/sub on
+# every append (WS_RELAY_INTERVAL is the back-off after a Redis error)
+event_relay = EventRelay(live_feed_logs, event_broadcaster, interval=float(os.getenv("WS_RELAY_INTERVAL", "0.25")))
+
+@app.on_event("startup")
+def start_event_relay():
+    if shared_state.distributed:
+        event_relay.start()
+
+@app.on_event("shutdown")
+def stop_event_relay():
+    event_relay.stop()
+
+DEFAULT_CAMERA_ID = "default"
+DEFAULT_CAMERA_SOURCE = os.getenv("LIVE_CAMERA_SOURCE", "0")
+
+_inference_models = threading.local()
+_shared_models_taken = False
+_shared_models_lock = threading.Lock()
+
+def inference_models():
+    # Ultralytics and Paddle predictors are not thread-safe, so each inference thread has its own pair.
+    # The first thread of a process takes the shared pair (preloaded before fork with PRELOAD_MODELS=1);
+    # the others load their own on their first frame, so only threads that ever run (one per camera
+    # analyzed at the same time, or video job) pay for a private pair
+    global _shared_models_taken
+    if not hasattr(_inference_models, "yolo"):
+        with _shared_models_lock:
+            owner, _shared_models_taken = not _shared_models_taken, True
+        if owner:
+            _inference_models.yolo, _inference_models.ocr = yolo_model(), ocr()
+        else:
+            _inference_models.yolo = create_detector(DETECTOR_BACKEND, YOLO_WEIGHTS)
+            _inference_models.ocr = create_ocr()
+            logger.info("Loaded private models on %s", threading.current_thread().name)
+    return _inference_models
+
+def warm_up_detector():
+    # Pay for lazy runtime initialization before the first real frame arrives
+    detector = yolo_model()
+    detector.warmup()
+    logger.info("Plate detector ready (%s)", detector.name)
+    return True
+
+def start_visitor_listeners():
+    try:
+        authorization_cache.start_listener()
+    except Exception as e:
+        logger.warning("Failed to start visitors listener, relying on cache TTL: %s", e)
+    try:
+        plate_registry.start_listener(storage.visitors)
+    except Exception as e:
+        logger.warning("Failed to start plate registry listener, plates will not be fuzzy matched: %s", e)
+    return True
+
+def load_plate_state():
+    count = 0 if os.getenv("PLATE_STATE_REBUILD") == "1" else plate_state.load()
+    if count == 0:
+        count = plate_state.rebuild_from_logs(storage.logs)
+        logger.info("Rebuilt plate state for %s plates from logs", count)
+    else:
+        logger.info("Loaded plate state for %s plates", count)
+    return count
+
+plate_state_loaded = resources.add("plate_state", load_plate_state)
+resources.add("detector_warmup", warm_up_detector, required=False)
+resources.add("visitor_listeners", start_visitor_listeners, required=False)
+
+def wait_for_plate_state():
+    # Detections arriving during warm-up wait for the state load instead of treating every plate as new
+    if plate_state_loaded.state != FAILED:
+        try:
+            plate_state_loaded()
+        except Exception:
+            pass
+
+# Cheap network clients and the plate state first, so gate decisions are correct as early as possible
+WARM_UP_ORDER = ["firestore", "supabase", "plate_state", "visitor_listeners", "ocr", "detector", "detector_warmup"]
+
+@app.on_event("startup")
+def start_warm_up():
+    # The server accepts requests immediately, /ready turns 200 once the required resources are loaded
+    resources.warm_up([name for name in WARM_UP_ORDER if name in resources])
+
+@app.get("/ready")
+def ready():
+    components = resources.info()
+    if resources.ready():
+        return {"ready": True, "components": components}
+    return JSONResponse({"ready": False, "components": components}, status_code=503)
+
+@app.on_event("shutdown")
+def stop_authorization_listener():
+    authorization_cache.stop_listener()
+    plate_registry.stop_listener()
+
+# Rendered /get-logs pages, dropped whenever the writer commits new logs
+logs_cache = LogQueryCache(ttl=float(os.getenv("LOGS_CACHE_TTL", LOGS_CACHE_TTL)))
+
+# Snapshots are encoded in memory; pictures already stored for a plate are not uploaded again
+snapshot_encoder = SnapshotEncoder()
+snapshot_store = SnapshotStore(storage.blobs)
+
+# Snapshot uploads and log writes run behind the detection loop
+def on_logs_written(entries):
+    logs_cache.invalidate(entries)
+    # Plate states follow the logs that changed them, off the detection path
+    plate_state.persist()
+
+log_writer = WriteBehindWriter(
+    lambda snapshot, name: snapshot_store.upload(name, snapshot),
+    storage.logs,
+    on_written=on_logs_written,
+    workers=int(os.getenv("WRITER_WORKERS", WRITER_WORKERS)),
+    queue_size=int(os.getenv("WRITER_QUEUE_SIZE", WRITER_QUEUE_SIZE)),
+    batch_size=int(os.getenv("WRITER_BATCH_SIZE", WRITER_BATCH_SIZE)),
+)
+
+@app.on_event("shutdown")
+def flush_log_writer():
+    log_writer.close()
+    plate_state.persist()
+    storage.close()
 
 class VideoRequest(BaseModel):
     video_url: str = None
     video_path: str = None
+    chunked: bool = False
 
 class LiveFeedRequest(BaseModel):
     duration: int = 15
 
-global_cap = None
-cap_lock = Lock()
-
-def get_webcam():
-    global global_cap
-    with cap_lock:
-        if global_cap is None or not global_cap.isOpened():
-            global_cap = cv2.VideoCapture(0, cv2.CAP_DSHOW)
-            if not global_cap.isOpened():
-                print("Failed to open webcam")
-                return None
-        return global_cap
+class CameraRequest(BaseModel):
+    camera_id: str
+    source: str
+    sample_every: int = SAMPLE_EVERY
+    sampling: str = SAMPLING_MODE
 
-def release_webcam():
-    global global_cap
-    with cap_lock:
-        if global_cap is not None and global_cap.isOpened():
-            global_cap.release()
-            global_cap = None
-            cv2.destroyAllWindows()
-            print("Webcam released")
+# Uploads and downloads are copied in 1 MiB chunks, never held in memory as a whole
+STREAM_CHUNK_SIZE = 1 << 20
+# "stream": FFmpeg reads video URLs directly while they download, "download": fetch to a temp file first
+VIDEO_URL_MODE = os.getenv("VIDEO_URL_MODE", "stream")
 
 def download_video(video_url):
-    response = requests.get(video_url, stream=True)
+    response = requests.get(video_url, stream=True, timeout=30)
     if response.status_code != 200:
         raise Exception("Failed to download video")
     tmp_file = tempfile.NamedTemporaryFile(delete=False, suffix=".mp4")
-    with open(tmp_file.name, 'wb') as f:
-        for chunk in response.iter_content(chunk_size=8192):
+    with tmp_file as f:
+        for chunk in response.iter_content(chunk_size=STREAM_CHUNK_SIZE):
             f.write(chunk)
     return tmp_file.name
 
@@ -103,359 +298,210 @@ def sanitize_filename(name):
     # Replace non-ASCII characters
     return re.sub(r'[^\x00-\x7F]+', '_', name)
 
-def upload_snapshot_to_supabase(local_path: str, snapshot_name: str) -> str:
-    sanitized_name = sanitize_filename(snapshot_name)
-    with open(local_path, "rb") as f:
-        supabase.storage.from_(BUCKET).upload(
-            f"snapshots/{sanitized_name}", f,
-            file_options={"content-type": "image/jpeg", "x-upsert": "true"}
-        )
-    return f"{SUPABASE_URL}/storage/v1/object/public/{BUCKET}/snapshots/{sanitized_name}"
-
-def clean_plate_text(text):
-    pattern = re.compile(r'\W')
-    text = pattern.sub('', text)
-    text = text.replace("???", "")
-    text = text.replace("O", "0")
-    text = text.replace("粤", "")
-    return text.upper()
-
-def paddle_ocr_on_plate(plate_img):
-    result = ocr.ocr(plate_img, det=False, rec=True, cls=False)
-    for r in result:
-        text, score = r[0]
-        if np.isnan(score):
-            score = 0
-        else:
-            score = int(score * 100)
-        if score > 60:
-            return clean_plate_text(text)
-    return None
-
-def process_frame(frame, seen_vehicles, logs):
+def process_frame_batch(frames, seen_vehicles, logs, tracker=None):
+    # One YOLO call and one OCR call for the whole batch, then per-frame plate handling in order.
+    # Video jobs run on several JobManager threads at once, so each uses its own thread's models
+    models = inference_models()
+    boxes_per_frame = detect_batch(models.yolo, frames)
+    if tracker is not None:
+        # Only new tracks / sharper crops are OCR'd, each track releases one voted plate
+        texts_per_frame = read_tracked_plates(tracker, models.ocr, frames, boxes_per_frame)
+    else:
+        texts_per_frame = recognize_plates_per_frame(models.ocr, frames, boxes_per_frame)
+    for frame, boxes, plate_texts in zip(frames, boxes_per_frame, texts_per_frame):
+        process_detections(frame, boxes, seen_vehicles, logs, plate_texts)
+    if tracker is not None:
+        process_ended_tracks(tracker.pop_ended(), seen_vehicles, logs)
+
+def process_ended_tracks(ended, seen_vehicles, logs, camera_id=None):
+    # Plates of tracks that left before a second reading, logged with the frame they were last read in
+    new_logs = []
+    for plate_text, frame, box, _ in ended:
+        new_logs.extend(process_detections(frame, [box], seen_vehicles, logs, [plate_text], camera_id=camera_id))
+    return new_logs
+
+def process_detections(frame, boxes, seen_vehicles, logs, plate_texts=None, camera_id=None):
+    new_logs = []
     try:
         current_time = datetime.utcnow()
-        results = yolo_model(frame)[0]
-        print(f"YOLO results: {len(results.boxes)} detections")  # Debug log
+        logger.debug("YOLO results: %s detections", len(boxes))
 
-        for box in results.boxes:
-            x1, y1, x2, y2 = map(int, box.xyxy[0])
-            cropped = frame[y1:y2, x1:x2]
+        # Run PaddleOCR on all cropped plates of the frame at once
+        if plate_texts is None:
+            plate_texts = recognize_plates(inference_models().ocr, crop_plates(frame, boxes))
+
+        for box, plate_text in zip(boxes, plate_texts):
+            logger.debug("Plate text: %s", plate_text)
+
+            raw_plate = plate_text
+            plate_text = plate_resolver.resolve(plate_text)
+            if plate_text:
+                log_entry = handle_plate(plate_text, frame, seen_vehicles, logs, current_time, camera_id, plate_box=box,
+                                         raw_plate=raw_plate)
+                if log_entry is not None:
+                    new_logs.append(log_entry)
 
-            # Run PaddleOCR on cropped plate
-            try:
-                plate_text = paddle_ocr_on_plate(cropped)
-                print(f"Plate text: {plate_text}")  # Debug log
-            except Exception as e:
-                print(f"PaddleOCR error: {e}")
-                continue
-
-            if plate_text and 4 <= len(plate_text) <= 10 and any(char.isdigit() for char in plate_text):
-                
-                # Helper function to get visitor status with time-based validation
-                def get_visitor_status(plate):
-                    visitor_status = "unauthorized"
-                    try:
-                        visitor_ref = db.collection("visitors").where("plate", "==", plate).limit(1).stream()
-                        visitor_docs = list(visitor_ref)
-                        if visitor_docs:
-                            visitor = visitor_docs[0].to_dict()
-                            visitor_type = visitor.get("visitorType", "").lower()
-                            is_approved = visitor.get("isApproved", True)
-                            
-                            if visitor_type == "authorized":
-                                # Authorized vehicles are always allowed (no time restrictions)
-                                visitor_status = "authorized"
-                                print(f"Vehicle {plate}: AUTHORIZED (permanent access)")
-                                
-                            elif visitor_type == "visitor" and is_approved:
-                                # Visitor vehicles need time-based validation
-                                current_time = datetime.utcnow()
-                                
-                                # Get the authorization period from authorizationTill object
-                                authorization_till = visitor.get("authorizationTill", {})
-                                auth_from = authorization_till.get("from")
-                                auth_to = authorization_till.get("to")
-                                
-                                print(f"Vehicle {plate}: Checking visitor time restrictions...")
-                                print(f"  Current time (UTC): {current_time}")
-                                print(f"  Authorization from: {auth_from}")
-                                print(f"  Authorization to: {auth_to}")
-                                
-                                # Check if we're within the allowed time period
-                                within_time_period = True
-                                
-                                if auth_from or auth_to:
-                                    try:
-                                        if auth_from:
-                                            # Handle different types of timestamp objects from Firestore
-                                            if hasattr(auth_from, 'timestamp'):
-                                                # Firestore Timestamp object
-                                                from_datetime = datetime.fromtimestamp(auth_from.timestamp())
-                                            elif isinstance(auth_from, dict) and '_seconds' in auth_from:
-                                                # Firestore Timestamp as dict
-                                                from_datetime = datetime.fromtimestamp(auth_from['_seconds'])
-                                            elif isinstance(auth_from, str):
-                                                # String timestamp
-                                                from_datetime = datetime.fromisoformat(auth_from.replace('Z', '+00:00'))
-                                            else:
-                                                # Try direct conversion
-                                                from_datetime = datetime.fromisoformat(str(auth_from).replace('Z', '+00:00'))
-                                            
-                                            # Convert to UTC for comparison
-                                            if from_datetime.tzinfo is None:
-                                                from_datetime = from_datetime.replace(tzinfo=None)
-                                                current_time_compare = current_time.replace(tzinfo=None)
-                                            else:
-                                                from_datetime = from_datetime.astimezone(None).replace(tzinfo=None)
-                                                current_time_compare = current_time.replace(tzinfo=None)
-                                            
-                                            if current_time_compare < from_datetime:
-                                                within_time_period = False
-                                                print(f"  ❌ Current time {current_time_compare} is before authorized time {from_datetime}")
-                                        
-                                        if auth_to and within_time_period:
-                                            # Handle different types of timestamp objects from Firestore
-                                            if hasattr(auth_to, 'timestamp'):
-                                                # Firestore Timestamp object
-                                                to_datetime = datetime.fromtimestamp(auth_to.timestamp())
-                                            elif isinstance(auth_to, dict) and '_seconds' in auth_to:
-                                                # Firestore Timestamp as dict
-                                                to_datetime = datetime.fromtimestamp(auth_to['_seconds'])
-                                            elif isinstance(auth_to, str):
-                                                # String timestamp
-                                                to_datetime = datetime.fromisoformat(auth_to.replace('Z', '+00:00'))
-                                            else:
-                                                # Try direct conversion
-                                                to_datetime = datetime.fromisoformat(str(auth_to).replace('Z', '+00:00'))
-                                            
-                                            # Convert to UTC for comparison
-                                            if to_datetime.tzinfo is None:
-                                                to_datetime = to_datetime.replace(tzinfo=None)
-                                                current_time_compare = current_time.replace(tzinfo=None)
-                                            else:
-                                                to_datetime = to_datetime.astimezone(None).replace(tzinfo=None)
-                                                current_time_compare = current_time.replace(tzinfo=None)
-                                            
-                                            if current_time_compare > to_datetime:
-                                                within_time_period = False
-                                                print(f"  ❌ Current time {current_time_compare} is after authorized time {to_datetime}")
-                                        
-                                        if within_time_period:
-                                            print(f"  ✅ Within authorized time period")
-                                            
-                                    except Exception as time_error:
-                                        print(f"  ❌ Error parsing authorization times: {time_error}")
-                                        within_time_period = False
-                                else:
-                                    # No time restrictions specified - treat as unauthorized for safety
-                                    within_time_period = False
-                                    print(f"  ❌ No authorization time period specified")
-                                
-                                # Final decision for visitor
-                                if within_time_period:
-                                    visitor_status = "visitor"
-                                    print(f"Vehicle {plate}: VISITOR (authorized within time period)")
-                                else:
-                                    visitor_status = "unauthorized"
-                                    print(f"Vehicle {plate}: UNAUTHORIZED (visitor outside allowed time period)")
-                            else:
-                                visitor_status = "unauthorized"
-                                print(f"Vehicle {plate}: UNAUTHORIZED (visitor not approved or wrong visitor type)")
-                        else:
-                            print(f"Vehicle {plate}: UNAUTHORIZED (not found in visitor database)")
-                            
-                    except Exception as e:
-                        print(f"Firestore visitor query error for plate {plate}: {e}")
-                        visitor_status = "unauthorized"
-                        
-                    return visitor_status
-
-                # Get the last log entry for this specific plate from database
-                def get_last_log_entry(plate):
-                    try:
-                        # Option 1: Query without ordering (simpler, no index required)
-                        # Get all logs for this plate and find the latest one manually
-                        logs_ref = db.collection("logs").where("plate", "==", plate).stream()
-                        logs_list = list(logs_ref)
-                        
-                        if logs_list:
-                            # Sort by timestamp manually to find the latest
-                            logs_data = []
-                            for log_doc in logs_list:
-                                log_data = log_doc.to_dict()
-                                log_data['doc_id'] = log_doc.id
-                                logs_data.append(log_data)
-                            
-                            # Sort by timestamp (newest first)
-                            try:
-                                logs_data.sort(key=lambda x: datetime.fromisoformat(x.get('timestamp', '').replace('Z', '+00:00')), reverse=True)
-                                last_log = logs_data[0]
-                                print(f"Last log for plate {plate}: Status={last_log.get('status')}, Time={last_log.get('timestamp')}")
-                                return last_log
-                            except Exception as sort_error:
-                                print(f"Error sorting logs for plate {plate}: {sort_error}")
-                                # If sorting fails, just return the first log
-                                return logs_data[0] if logs_data else None
-                        else:
-                            print(f"No previous logs found for plate {plate} - this is a NEW vehicle")
-                            return None
-                            
-                    except Exception as e:
-                        print(f"Error getting last log entry for plate {plate}: {e}")
-                        return None
-
-                # Alternative approach using Firestore ordering (requires composite index)
-                def get_last_log_entry_with_index(plate):
-                    try:
-                        # This query requires a composite index: (plate, timestamp)
-                        # You need to create this index in Firebase Console
-                        logs_ref = db.collection("logs").where("plate", "==", plate).order_by("timestamp", direction=firestore.Query.DESCENDING).limit(1).stream()
-                        logs_list = list(logs_ref)
-                        if logs_list:
-                            last_log = logs_list[0].to_dict()
-                            print(f"Last log for plate {plate}: Status={last_log.get('status')}, Time={last_log.get('timestamp')}")
-                            return last_log
-                        else:
-                            print(f"No previous logs found for plate {plate} - this is a NEW vehicle")
-                            return None
-                    except Exception as e:
-                        print(f"Error getting last log entry for plate {plate}: {e}")
-                        # Fallback to the simpler method
-                        return get_last_log_entry(plate)
-
-                # Check if we should skip logging for this specific plate (avoid duplicate logs within short time)
-                def should_skip_logging(plate, current_time_iso):
-                    if plate in seen_vehicles:
-                        last_logged_time_str = seen_vehicles[plate].get("last_logged_time")
-                        if last_logged_time_str:
-                            try:
-                                last_logged_time = datetime.fromisoformat(last_logged_time_str.replace('Z', '+00:00'))
-                                time_diff = current_time - last_logged_time
-                                # Skip if less than 30 seconds since last log for THIS PLATE to avoid spam
-                                if time_diff < timedelta(seconds=30):
-                                    print(f"Skipping log for plate {plate} - too recent ({time_diff.total_seconds()} seconds)")
-                                    return True
-                            except Exception as e:
-                                print(f"Error parsing last logged time for plate {plate}: {e}")
-                    return False
-
-                # Skip if too recent for THIS SPECIFIC PLATE
-                if should_skip_logging(plate_text, current_time.isoformat()):
-                    continue
-
-                # Get last log entry from database for THIS SPECIFIC PLATE
-                # Use the simpler method first (no index required)
-                last_log = get_last_log_entry(plate_text)
-                
-                # Determine what status to log based on THIS VEHICLE'S database history ONLY
-                if last_log is None:
-                    # NEW VEHICLE (no previous logs for this plate) - LOG ENTRY OR BLOCKED
-                    visitor_status = get_visitor_status(plate_text)
-                    
-                    if visitor_status == "unauthorized":
-                        log_status = "blocked"
-                        action_type = f"NEW_VEHICLE_BLOCKED ({plate_text})"
-                    else:
-                        log_status = "entry"
-                        action_type = f"NEW_VEHICLE_ENTRY ({plate_text})"
-                        
-                else:
-                    # THIS VEHICLE HAS PREVIOUS LOGS - CHECK ITS LAST STATUS
-                    last_status = last_log.get("status", "")
-                    last_timestamp_str = last_log.get("timestamp", "")
-                    
-                    try:
-                        # Parse last timestamp for THIS VEHICLE
-                        last_timestamp = datetime.fromisoformat(last_timestamp_str.replace('Z', '+00:00'))
-                        time_since_last_log = current_time - last_timestamp
-                        print(f"Vehicle {plate_text}: Time since its last log = {time_since_last_log}")  # Debug log
-                        
-                        # Only proceed if enough time has passed since THIS VEHICLE's last log (2 minutes)
-                        if time_since_last_log < timedelta(minutes=2):
-                            print(f"Skipping vehicle {plate_text} - not enough time passed since its last log ({time_since_last_log})")
-                            continue
-                            
-                    except Exception as e:
-                        print(f"Error parsing timestamp for vehicle {plate_text}: {e}")
-                        # If timestamp parsing fails, treat as first detection
-                        last_status = ""
-                    
-                    visitor_status = get_visitor_status(plate_text)
-                    
-                    if last_status == "entry":
-                        # THIS VEHICLE'S LAST STATUS WAS ENTRY → LOG EXIT
-                        log_status = "exit"
-                        action_type = f"EXIT_AFTER_ENTRY ({plate_text})"
-                        
-                    elif last_status == "exit":
-                        # THIS VEHICLE'S LAST STATUS WAS EXIT → LOG ENTRY OR BLOCKED (based on current authorization)
-                        if visitor_status == "unauthorized":
-                            log_status = "blocked"
-                            action_type = f"BLOCKED_AFTER_EXIT ({plate_text})"
-                        else:
-                            log_status = "entry"
-                            action_type = f"REENTRY_AFTER_EXIT ({plate_text})"
-                            
-                    elif last_status == "blocked":
-                        # THIS VEHICLE'S LAST STATUS WAS BLOCKED → CHECK CURRENT AUTHORIZATION
-                        if visitor_status == "unauthorized":
-                            log_status = "blocked"
-                            action_type = f"STILL_BLOCKED ({plate_text})"
-                        else:
-                            # Now authorized → allow entry
-                            log_status = "entry"
-                            action_type = f"ENTRY_AFTER_AUTHORIZATION ({plate_text})"
-                            
-                    else:
-                        # UNKNOWN LAST STATUS FOR THIS VEHICLE → TREAT AS FIRST DETECTION
-                        if visitor_status == "unauthorized":
-                            log_status = "blocked"
-                            action_type = f"UNKNOWN_STATUS_BLOCKED ({plate_text})"
-                        else:
-                            log_status = "entry"
-                            action_type = f"UNKNOWN_STATUS_ENTRY ({plate_text})"
-
-                # Create snapshot
-                snapshot_name = f"{plate_text}_{uuid.uuid4().hex[:6]}_{log_status}.jpg"
-                temp_dir = tempfile.gettempdir()
-                snapshot_path = os.path.join(temp_dir, snapshot_name)
-                
-                try:
-                    cv2.imwrite(snapshot_path, frame)
-                    snapshot_url = upload_snapshot_to_supabase(snapshot_path, snapshot_name)
-                except Exception as e:
-                    print(f"Snapshot error: {e}")
-                    snapshot_url = "upload_failed"
-
-                # Create log entry
-                log_entry = {
-                    "plate": plate_text,
-                    "type": "unknown",
-                    "status": log_status,
-                    "timestamp": current_time.isoformat(),
-                    "snapshot_url": snapshot_url,
-                    "visitorStatus": visitor_status
-                }
-
-                # Add log to Firestore
-                try:
-                    db.collection("logs").add(log_entry)
-                    print(f"Successfully added to Firestore: {action_type} - {log_entry}")
-                except Exception as e:
-                    print(f"Firestore log write error: {e}")
-
-                # Update seen_vehicles to track last logged time for THIS SPECIFIC PLATE (prevent spam)
-                seen_vehicles[plate_text] = {
-                    "last_logged_time": current_time.isoformat(),
-                    "last_status": log_status
-                }
-                
-                logs.append(log_entry)
-                print(f"✅ Vehicle {plate_text} - {action_type}: {log_entry}")  # Debug log
-                        
     except Exception as e:
-        print(f"Error in process_frame: {e}")
+        logger.exception("Error in process_detections: %s", e)
+    return new_logs
+
+def handle_plate(plate_text, frame, seen_vehicles, logs, current_time, camera_id=None, snapshot=None, plate_box=None,
+                 raw_plate=None):
+    """Run the entry/exit/blocked state machine for one plate reading and return the log it wrote, if any.
+
+    raw_plate is the OCR text before registry/grammar correction; it is kept on the log when it differs.
+    """
+    wait_for_plate_state()
+    # Visitor status with time-based validation, served from the authorization cache
+    def get_visitor_status(plate):
+        return authorization_cache.get_status(plate)
+
+    # Get the last log entry for this specific plate from the per-plate state table
+    def get_last_log_entry(plate):
+        last_log = plate_state.get(plate)
+        if last_log:
+            logger.debug("Last log for plate %s: Status=%s, Time=%s", plate, last_log.get('status'), last_log.get('timestamp'))
+        else:
+            logger.debug("No previous logs found for plate %s - this is a NEW vehicle", plate)
+        return last_log
+
+    # Check if we should skip logging for this specific plate (avoid duplicate logs within short time)
+    def should_skip_logging(plate):
+        # Skip if less than 30 seconds since last log for THIS PLATE to avoid spam; claiming the
+        # window is atomic, so with shared state only one worker goes on for each window
+        if not seen_vehicles.claim(plate, current_time, LOG_DEDUP_SECONDS):
+            logger.debug("Skipping log for plate %s - too recent", plate)
+            return True
+        return False
+
+    # Skip if too recent for THIS SPECIFIC PLATE
+    if should_skip_logging(plate_text):
+        return None
+
+    # Get last log entry for THIS SPECIFIC PLATE
+    last_log = get_last_log_entry(plate_text)
+
+    # Determine what status to log based on THIS VEHICLE'S database history ONLY
+    if last_log is None:
+        # NEW VEHICLE (no previous logs for this plate) - LOG ENTRY OR BLOCKED
+        visitor_status = get_visitor_status(plate_text)
+
+        if visitor_status == "unauthorized":
+            log_status = "blocked"
+            action_type = f"NEW_VEHICLE_BLOCKED ({plate_text})"
+        else:
+            log_status = "entry"
+            action_type = f"NEW_VEHICLE_ENTRY ({plate_text})"
+
+    else:
+        # THIS VEHICLE HAS PREVIOUS LOGS - CHECK ITS LAST STATUS
+        last_status = last_log.get("status", "")
+        last_timestamp_str = last_log.get("timestamp", "")
+
+        try:
+            # Parse last timestamp for THIS VEHICLE
+            last_timestamp = datetime.fromisoformat(last_timestamp_str.replace('Z', '+00:00'))
+            time_since_last_log = current_time - last_timestamp
+            logger.debug("Vehicle %s: Time since its last log = %s", plate_text, time_since_last_log)
+
+            # Only proceed if enough time has passed since THIS VEHICLE's last log (2 minutes)
+            if time_since_last_log < timedelta(minutes=2):
+                logger.debug("Skipping vehicle %s - not enough time passed since its last log (%s)", plate_text, time_since_last_log)
+                seen_vehicles.release(plate_text)
+                return None
+
+        except Exception as e:
+            logger.warning("Error parsing timestamp for vehicle %s: %s", plate_text, e)
+            # If timestamp parsing fails, treat as first detection
+            last_status = ""
+
+        visitor_status = get_visitor_status(plate_text)
+
+        if last_status == "entry":
+            # THIS VEHICLE'S LAST STATUS WAS ENTRY → LOG EXIT
+            log_status = "exit"
+            action_type = f"EXIT_AFTER_ENTRY ({plate_text})"
+
+        elif last_status == "exit":
+            # THIS VEHICLE'S LAST STATUS WAS EXIT → LOG ENTRY OR BLOCKED (based on current authorization)
+            if visitor_status == "unauthorized":
+                log_status = "blocked"
+                action_type = f"BLOCKED_AFTER_EXIT ({plate_text})"
+            else:
+                log_status = "entry"
+                action_type = f"REENTRY_AFTER_EXIT ({plate_text})"
+
+        elif last_status == "blocked":
+            # THIS VEHICLE'S LAST STATUS WAS BLOCKED → CHECK CURRENT AUTHORIZATION
+            if visitor_status == "unauthorized":
+                log_status = "blocked"
+                action_type = f"STILL_BLOCKED ({plate_text})"
+            else:
+                # Now authorized → allow entry
+                log_status = "entry"
+                action_type = f"ENTRY_AFTER_AUTHORIZATION ({plate_text})"
+
+        else:
+            # UNKNOWN LAST STATUS FOR THIS VEHICLE → TREAT AS FIRST DETECTION
+            if visitor_status == "unauthorized":
+                log_status = "blocked"
+                action_type = f"UNKNOWN_STATUS_BLOCKED ({plate_text})"
+            else:
+                log_status = "entry"
+                action_type = f"UNKNOWN_STATUS_ENTRY ({plate_text})"
+
+    # Create snapshot in memory, the upload happens in the background writer
+    snapshot_name = sanitize_filename(plate_text)
+    if snapshot is None and frame is not None:
+        snapshot = snapshot_encoder.encode(frame, plate_box)
+    snapshot_fields, upload = {"snapshot_url": "upload_failed"}, None
+    if snapshot is not None:
+        # Reuse of an earlier picture is decided here, so the log is published with its final URLs
+        # (frame, crop and thumbnail); only a new picture is left for the writer to upload
+        snapshot_fields, needs_upload = snapshot_store.resolve(snapshot_name, snapshot)
+        upload = snapshot if needs_upload else None
+    else:
+        logger.error("Snapshot error: failed to encode frame for %s", plate_text)
+
+    # Create log entry
+    log_entry = {
+        "plate": plate_text,
+        "type": "unknown",
+        "status": log_status,
+        "timestamp": current_time.isoformat(),
+        "snapshot_url": snapshot_fields["snapshot_url"],
+        "visitorStatus": visitor_status
+    }
+    log_entry.update(snapshot_fields)
+    if camera_id is not None:
+        log_entry["camera"] = camera_id
+    # A corrected read must stay auditable, above all when the correction is what made it authorized
+    if raw_plate and raw_plate != plate_text:
+        log_entry["rawPlate"] = raw_plate
+
+    # Queue snapshot upload and Firestore log write
+    if not log_writer.submit(upload, snapshot_name, log_entry):
+        # Nothing will be stored, so the gate state must not move either: the next reading
+        # of this plate decides again from the last log that was actually written
+        if upload is not None:
+            snapshot_store.forget(snapshot_name, upload.phash)
+        seen_vehicles.release(plate_text)
+        LOGS_DROPPED.inc(type=log_status)
+        logger.warning("Dropped log for plate %s (%s), the log writer is full or stopped", plate_text, log_status)
+        return None
+    logger.debug("Queued for Firestore: %s - %s", action_type, log_entry)
+
+    plate_state.update(plate_text, log_status, log_entry["timestamp"], visitor_status)
+
+    # Update seen_vehicles to track last logged time for THIS SPECIFIC PLATE (prevent spam)
+    seen_vehicles.record(plate_text, current_time, log_status)
+
+    logs.append(log_entry)
+    LOGS_WRITTEN.inc(type=log_status)
+    logger.info("Vehicle %s - %s", plate_text, action_type,
+                extra={"plate": plate_text, "rawPlate": raw_plate, "status": log_status,
+                       "visitorStatus": visitor_status, "camera": camera_id})
+    return log_entry
 
 def safe_unlink(file_path: str, max_attempts: int = 3, delay: float = 0.5) -> None:
     """Attempt to delete a file with retries to handle file locking issues."""
@@ -466,7 +512,7 @@ def safe_unlink(file_path: str, max_attempts: int = 3, delay: float = 0.5) -> No
             return
         except PermissionError as e:
             if attempt == max_attempts - 1:
-                print(f"Warning: Failed to delete {file_path} after {max_attempts} attempts: {e}")
+                logger.warning("Failed to delete %s after %s attempts: %s", file_path, max_attempts, e)
                 return
             time.sleep(delay)  # Wait before retrying
 
@@ -476,269 +522,477 @@ async def cleanup_later(file_path: str, max_attempts: int = 5, delay: float = 1.
         try:
             if os.path.exists(file_path):
                 os.unlink(file_path)
-                print(f"Successfully deleted {file_path}")
+                logger.debug("Successfully deleted %s", file_path)
             return
         except PermissionError as e:
             if attempt == max_attempts - 1:
-                print(f"Warning: Failed to delete {file_path} after {max_attempts} attempts: {e}")
+                logger.warning("Failed to delete %s after %s attempts: %s", file_path, max_attempts, e)
                 return
             await asyncio.sleep(delay)
 
-async def cleanup_later(file_path: str, max_attempts: int = 5, delay: float = 1.0):
-    """Deferred cleanup to handle file locking issues."""
-    for attempt in range(max_attempts):
-        try:
-            if os.path.exists(file_path):
-                os.unlink(file_path)
-                print(f"Successfully deleted {file_path}")
-            return
-        except PermissionError as e:
-            if attempt == max_attempts - 1:
-                print(f"Warning: Failed to delete {file_path} after {max_attempts} attempts: {e}")
-                return
-            await asyncio.sleep(delay)
-
-def get_webcam():
-    global global_cap
-    with cap_lock:
-        if global_cap is None or not global_cap.isOpened():
-            print("Attempting to open webcam")
-            global_cap = cv2.VideoCapture(0, cv2.CAP_DSHOW)
-            if not global_cap.isOpened():
-                print("Failed to open webcam")
-                return None
-            print("Webcam opened successfully")
-        return global_cap
-
-def release_webcam():
-    global global_cap
-    with cap_lock:
-        if global_cap is not None and global_cap.isOpened():
-            global_cap.release()
-            global_cap = None
-            cv2.destroyAllWindows()
-            print("Webcam released successfully")
-        else:
-            print("No webcam to release or already released")
+# Long videos run as background jobs, at most MAX_CONCURRENT_JOBS at a time
+job_manager = JobManager(
+    max_concurrent=int(os.getenv("MAX_CONCURRENT_JOBS", MAX_CONCURRENT_JOBS)),
+    max_queued=int(os.getenv("MAX_QUEUED_JOBS", MAX_QUEUED_JOBS)),
+)
 
-@app.post("/process-video")
-async def process_video(file: UploadFile = File(None), req: Optional[VideoRequest] = Body(None)):
-    video_path = None
-    cap = None
+@app.on_event("shutdown")
+def stop_jobs():
+    job_manager.shutdown()
+
+video_pool = None
+
+def get_video_pool():
+    # Worker processes load their own models, so the pool is only started on first use
+    global video_pool
+    if video_pool is None:
+        video_pool = create_video_pool(YOLO_WEIGHTS, VIDEO_WORKERS)
+    return video_pool
+
+@app.on_event("shutdown")
+def stop_video_pool():
+    if video_pool is not None:
+        video_pool.shutdown(wait=False, cancel_futures=True)
+
+def analyze_video_chunked(video_path, total_frames, seen_vehicles, logs, job=None):
+    # Frame ranges are decoded and analyzed in parallel, entry/exit logic then runs once in frame order
+    futures = submit_chunks(
+        get_video_pool(), video_path, total_frames, VIDEO_WORKERS,
+        stride=SAMPLE_EVERY, sampling=SAMPLING_MODE, tracking=TRACKING_ENABLED, overlap=CHUNK_OVERLAP_FRAMES,
+    )
+    chunk_frames = total_frames / max(1, len(futures))
     try:
-        if file:
-            # Save uploaded file temporarily
-            tmp_file = tempfile.NamedTemporaryFile(delete=False, suffix=".mp4")
-            with open(tmp_file.name, "wb") as f:
-                content = await file.read()
-                f.write(content)
-            video_path = tmp_file.name
-        elif req and req.video_path:
-            video_path = req.video_path
-        elif req and req.video_url:
-            video_path = download_video(req.video_url)
-        else:
-            raise HTTPException(status_code=400, detail="No video provided (file, video_path, or video_url required)")
-
-        print(f"Starting video processing for: {video_path}")  # Debug log
-
-        # Process video
+        for done, future in enumerate(as_completed(futures), 1):
+            future.result()
+            if job is not None:
+                job.check_cancelled()
+                job.update(frames_decoded=int(done * chunk_frames), frames_analyzed=int(done * chunk_frames))
+    finally:
+        for future in futures:
+            future.cancel()
+
+    detections = merge_detections([future.result() for future in futures], CHUNK_OVERLAP_FRAMES)
+    logger.info("Chunked processing: %s chunks, %s plate readings", len(futures), len(detections))
+    for frame_number, _, raw_plate, snapshot in detections:
+        plate_text = plate_resolver.resolve(raw_plate)
+        if not plate_text:
+            continue
         try:
-            cap = cv2.VideoCapture(video_path, cv2.CAP_FFMPEG)
+            handle_plate(plate_text, None, seen_vehicles, logs, datetime.utcnow(), snapshot=snapshot,
+                         raw_plate=raw_plate)
         except Exception as e:
-            raise HTTPException(status_code=400, detail=f"Cannot open video: {str(e)}")
+            logger.exception("Error handling plate %s at frame %s: %s", plate_text, frame_number, e)
+    if job is not None:
+        job.update(plates_found=len(logs))
 
+def analyze_video(video_path, chunked=False, job=None):
+    """Run plate detection over a whole video file or stream and return the logs it produced."""
+    cap = None
+    try:
+        logger.info("Starting video processing for: %s", video_path)
+        cap = open_video(video_path)
         if not cap.isOpened():
-            raise HTTPException(status_code=400, detail="Cannot open video: VideoCapture failed")
+            raise ValueError("Cannot open video: VideoCapture failed")
 
-        seen_vehicles, logs = {}, []
-        frame_count = 0
-        while True:
-            ret, frame = cap.read()
-            if not ret:
-                print(f"End of video or read error at frame {frame_count}")  # Debug log
-                break
-            frame_count += 1
-            if frame_count % 25 != 0:
-                continue
-            print(f"Processing frame {frame_count}")  # Debug log
-            try:
-                process_frame(frame, seen_vehicles, logs)
-            except Exception as e:
-                print(f"Error processing frame {frame_count}: {e}")  # Debug log
-                continue
+        seen_vehicles, logs = SeenVehicles(), []
+        total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT) or 0)
+        if job is not None:
+            job.update(total_frames=total_frames)
 
-        print(f"Processed {frame_count} frames, generated {len(logs)} logs")  # Debug log
+        # Chunks seek independently, which only makes sense for local files
+        if chunked and total_frames > 0 and os.path.isfile(video_path):
+            cap.release()
+            analyze_video_chunked(video_path, total_frames, seen_vehicles, logs, job)
+            logger.info("Processed %s frames, generated %s logs", total_frames, len(logs))
+        else:
+            # Sampled frames are detected and recognized in mini-batches, then handled one by one in order
+            sampler = None if SAMPLING_MODE == "fixed" else create_sampler(SAMPLING_MODE, SAMPLE_EVERY)
+            tracker = PlateTracker() if TRACKING_ENABLED else None
+            frames_analyzed = 0
+            # Streams being downloaded cannot seek, local files can
+            seek_gap = SEEK_MIN_GAP if os.path.isfile(video_path) else 0
+            sampled = iter_sampled_frames(cap, SAMPLE_EVERY, sampler, seek_gap=seek_gap)
+            for batch in iter_batches(sampled, YOLO_BATCH_SIZE):
+                if job is not None:
+                    job.check_cancelled()
+                logger.debug("Processing frames %s-%s", batch[0][0], batch[-1][0])
+                try:
+                    process_frame_batch([frame for _, frame, _ in batch], seen_vehicles, logs, tracker)
+                except Exception as e:
+                    logger.exception("Error processing frames %s-%s: %s", batch[0][0], batch[-1][0], e)
+                frames_analyzed += len(batch)
+                if job is not None:
+                    job.update(frames_decoded=batch[-1][0], frames_analyzed=frames_analyzed, plates_found=len(logs))
+
+            logger.info("Processed %s frames, generated %s logs", int(cap.get(cv2.CAP_PROP_POS_FRAMES)), len(logs))
+            if sampler is not None:
+                logger.debug("Sampler stats: %s", sampler.stats())
+            if tracker is not None:
+                process_ended_tracks(tracker.flush(), seen_vehicles, logs)
+                logger.debug("Tracker stats: %s", tracker.stats())
+
+        # Make sure the returned logs are stored before answering
+        log_writer.flush()
         return logs
-    except Exception as e:
-        print(f"Error in process_video: {str(e)}")  # Debug log
-        raise HTTPException(status_code=500, detail=f"Failed to process video: {str(e)}")
     finally:
-        # Release VideoCapture
         if cap is not None:
             try:
                 cap.release()
-                cv2.destroyAllWindows()
-                print("VideoCapture released")  # Debug log
+                logger.debug("VideoCapture released")
             except Exception as e:
-                print(f"Error releasing VideoCapture: {e}")
-        # Defer temporary file cleanup
-        if file and video_path:
-            asyncio.create_task(cleanup_later(video_path))
-
-def live_feed_worker():
-    global live_feed_active, live_feed_logs
-    cap = get_webcam()
-    if not cap:
-        live_feed_active = False
-        return
+                logger.warning("Error releasing VideoCapture: %s", e)
 
+async def save_upload(file: UploadFile) -> str:
+    # Spool the upload to a temp file chunk by chunk so memory stays flat for multi-GB videos
+    suffix = os.path.splitext(file.filename or "")[1] or ".mp4"
+    tmp_file = tempfile.NamedTemporaryFile(delete=False, suffix=suffix)
     try:
-        seen_vehicles = {}
-        frame_count = 0
-        while live_feed_active:
-            with cap_lock:
-                if not cap.isOpened():
-                    print("Webcam not accessible in live_feed_worker")
+        with tmp_file as f:
+            while True:
+                chunk = await file.read(STREAM_CHUNK_SIZE)
+                if not chunk:
                     break
-                ret, frame = cap.read()
-            if not ret:
-                print("Failed to read frame")
-                break
-            frame_count += 1
-            if frame_count % 25 != 0:
-                continue
-            process_frame(frame, seen_vehicles, live_feed_logs)
-            time.sleep(0.1)
-    except Exception as e:
-        print(f"Error in live_feed_worker: {e}")
-        live_feed_active = False
-    finally:
-        release_webcam()
+                f.write(chunk)
+    except Exception:
+        safe_unlink(tmp_file.name)
+        raise
+    return tmp_file.name
 
-@app.get("/live-video")
-async def video_feed():
-    def gen_frames():
-        cap = get_webcam()  # Use centralized webcam access from previous response
-        if not cap:
-            print("Error: Webcam not accessible in live-video")
-            return
+async def submit_video_job(file, req, chunked):
+    # Uploads are saved before queuing; URLs are downloaded inside the job so the request returns at once
+    temp_path, video_path, video_url = None, None, None
+    if file:
+        temp_path = video_path = await save_upload(file)
+    elif req and req.video_path:
+        video_path = req.video_path
+    elif req and req.video_url:
+        video_url = req.video_url
+    else:
+        raise HTTPException(status_code=400, detail="No video provided (file, video_path, or video_url required)")
+    chunked = chunked or bool(req and req.chunked)
+
+    def run(job):
+        nonlocal temp_path
+        path = video_path
+        if video_url and VIDEO_URL_MODE == "download":
+            temp_path = path = download_video(video_url)
+            job.check_cancelled()
+        elif video_url:
+            # FFmpeg decodes the network stream as it arrives, detection starts with the first frames
+            path = video_url
+        return analyze_video(path, chunked, job)
+
+    def cleanup(job):
+        if temp_path:
+            safe_unlink(temp_path)
+
+    params = {"source": file.filename if file else (video_path or video_url), "chunked": chunked}
+    try:
+        return job_manager.submit("process-video", run, params, on_finish=cleanup)
+    except JobQueueFull as e:
+        cleanup(None)
+        raise HTTPException(status_code=429, detail=f"Too many queued jobs: {e}")
 
+@app.post("/process-video")
+async def process_video(file: UploadFile = File(None), req: Optional[VideoRequest] = Body(None), chunked: bool = False):
+    job = await submit_video_job(file, req, chunked)
+    try:
+        # Runs on the job executor, the event loop stays free for other clients
+        logs = await asyncio.wrap_future(job.future)
+    except (asyncio.CancelledError, CancelledError):
+        # A job cancelled while still queued cancels its future; anything else (client gone) propagates
+        if not job.future.cancelled():
+            raise
+        logs = None
+    except Exception as e:
+        logger.exception("Error in process_video: %s", e)
+        raise HTTPException(status_code=500, detail=f"Failed to process video: {str(e)}")
+    if job.status == CANCELLED or logs is None:
+        raise HTTPException(status_code=409, detail="Video processing was cancelled")
+    return logs
+
+@app.post("/jobs", status_code=202)
+async def create_job(file: UploadFile = File(None), req: Optional[VideoRequest] = Body(None), chunked: bool = False):
+    job = await submit_video_job(file, req, chunked)
+    return job.info()
+
+@app.get("/jobs")
+def list_jobs():
+    return {"jobs": job_manager.list()}
+
+@app.get("/jobs/{job_id}")
+def get_job(job_id: str):
+    job = job_manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+    return job.info(include_result=True)
+
+@app.delete("/jobs/{job_id}")
+def cancel_job(job_id: str):
+    job = job_manager.cancel(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+    return job.info()
+
+@app.get("/jobs/{job_id}/events")
+async def job_events(job_id: str):
+    job = job_manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+
+    async def stream():
+        # Server-sent events: one progress snapshot per change until the job finishes
+        queue, listener = job.subscribe()
         try:
             while True:
-                with cap_lock:
-                    if not cap.isOpened():
-                        print("Error: Webcam not accessible in live-video")
-                        break
-                    success, frame = cap.read()
-                if not success:
-                    print("Error: Failed to read frame in live-video")
+                info = await queue.get()
+                yield f"data: {json.dumps(info)}\n\n"
+                if info["status"] in FINISHED:
                     break
-                ret, buffer = cv2.imencode('.jpg', frame)
-                if not ret:
-                    print("Error: Failed to encode frame in live-video")
-                    continue
-                frame = buffer.tobytes()
-                yield (
-                    b"--frame\r\n"
-                    b"Content-Type: image/jpeg\r\n\r\n" + frame + b"\r\n"
-                )
-        except Exception as e:
-            print(f"Error in gen_frames: {e}")
         finally:
-            release_webcam()  # Ensure webcam is released
+            job.unsubscribe(listener)
+
+    return StreamingResponse(stream(), media_type="text/event-stream")
+
+def process_camera_frame(camera, packet):
+    models = inference_models()
+    frame = packet.frame
+    boxes = detect_batch(models.yolo, [frame])[0]
+    if camera.tracker is not None:
+        plate_texts = read_tracked_plates(camera.tracker, models.ocr, [frame], [boxes])[0]
+    else:
+        plate_texts = recognize_plates(models.ocr, crop_plates(frame, boxes))
+    camera.last_detections = (time.time(), boxes, plate_texts)
+    new_logs = process_detections(frame, boxes, camera.seen_vehicles, live_feed_logs, plate_texts, camera_id=camera.camera_id)
+    if camera.tracker is not None:
+        new_logs += process_ended_tracks(camera.tracker.pop_ended(), camera.seen_vehicles, live_feed_logs,
+                                         camera_id=camera.camera_id)
+    if not shared_state.distributed:
+        for log in new_logs:
+            event_broadcaster.publish(log)
+    return new_logs
+
+# Every camera captures on its own thread, sampled frames share one inference pool
+camera_manager = CameraManager(
+    process_camera_frame,
+    workers=int(os.getenv("INFERENCE_WORKERS", INFERENCE_WORKERS)),
+    state=shared_state,
+)
+
+@app.on_event("shutdown")
+def stop_cameras():
+    camera_manager.shutdown()
+
+def get_camera(camera_id):
+    camera = camera_manager.get(camera_id)
+    if camera is None:
+        if camera_id != DEFAULT_CAMERA_ID:
+            raise HTTPException(status_code=404, detail=f"Camera {camera_id} not found")
+        camera = camera_manager.get_or_add(DEFAULT_CAMERA_ID, DEFAULT_CAMERA_SOURCE)
+    return camera
+
+@app.get("/cameras")
+def list_cameras():
+    return {"cameras": camera_manager.list()}
+
+@app.post("/cameras")
+def add_camera(req: CameraRequest):
+    try:
+        camera = camera_manager.add(req.camera_id, req.source, req.sample_every, req.sampling)
+    except KeyError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return camera.info()
+
+@app.delete("/cameras/{camera_id}")
+def remove_camera(camera_id: str):
+    if camera_manager.remove(camera_id) is None:
+        raise HTTPException(status_code=404, detail=f"Camera {camera_id} not found")
+    return {"message": f"Removed camera {camera_id}"}
+
+@app.post("/cameras/{camera_id}/start")
+def start_camera(camera_id: str):
+    camera = get_camera(camera_id)
+    if camera.detecting:
+        return {"message": "Already running", "camera": camera.info()}
+    if not camera.start():
+        raise HTTPException(status_code=409, detail=camera.error)
+    return {"message": f"Started camera {camera_id}", "camera": camera.info()}
+
+@app.post("/cameras/{camera_id}/stop")
+def stop_camera(camera_id: str):
+    camera = get_camera(camera_id)
+    camera.stop()
+    return {"message": f"Stopped camera {camera_id}", "camera": camera.info()}
 
+@app.get("/live-video")
+async def video_feed(camera_id: str = DEFAULT_CAMERA_ID):
+    # All viewers of a camera share one capture and one JPEG encode per frame
+    camera = get_camera(camera_id)
+    owner = camera.owner()
+    if owner is not None and owner != worker_id():
+        # Frames only exist in the worker holding the camera
+        raise HTTPException(status_code=409, detail=f"Camera {camera_id} is captured by {owner}")
     return StreamingResponse(
-        gen_frames(),
+        camera.mjpeg.stream(),
         media_type="multipart/x-mixed-replace; boundary=frame"
     )
 
 @app.websocket("/ws/plates")
-async def websocket_endpoint(websocket: WebSocket):
+async def websocket_endpoint(websocket: WebSocket, camera: Optional[str] = None, status: Optional[str] = None, plate: Optional[str] = None):
+    # Filters come from the query string and can be changed later with {"camera": ..., "status": ..., "plate": ...}
     await websocket.accept()
-    try:
-        previous_log_len = 0
+    subscription = event_broadcaster.subscribe(camera, status, plate)
+
+    async def send_events():
+        while True:
+            log = await subscription.get()
+            if log is None:
+                logger.info("WebSocket client too slow, disconnecting")
+                await websocket.close(code=1013)
+                return
+            await websocket.send_json(log)
+
+    async def receive_filters():
         while True:
-            await asyncio.sleep(0.5)  # Reduced throttle for faster updates
-            new_logs = live_feed_logs[previous_log_len:]
-            for log in new_logs:
-                # Send all logs for debugging (remove filter temporarily)
-                await websocket.send_json(log)
-                print(f"Sent log via WebSocket: {log}")  # Debug log
-            previous_log_len = len(live_feed_logs)
+            message = await websocket.receive_json()
+            subscription.set_filters(message.get("camera"), message.get("status"), message.get("plate"))
+
+    tasks = [asyncio.create_task(send_events()), asyncio.create_task(receive_filters())]
+    try:
+        done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            task.result()
     except WebSocketDisconnect:
-        print("WebSocket disconnected")
+        logger.debug("WebSocket disconnected")
     except Exception as e:
-        print(f"WebSocket error: {e}")
+        logger.warning("WebSocket error: %s", e)
+    finally:
+        for task in tasks:
+            task.cancel()
+        event_broadcaster.unsubscribe(subscription)
 
 @app.post("/start-feed")
-def start_feed():
-    global live_feed_active, live_feed_thread, live_feed_logs
-    if live_feed_active:
-        return {"message": "Already running"}
-    live_feed_logs = []
-    live_feed_active = True
-    release_webcam()  # Ensure any existing webcam instance is released
-    live_feed_thread = threading.Thread(target=live_feed_worker)
-    live_feed_thread.start()
-    return {"message": "Started live feed"}
+def start_feed(camera_id: str = DEFAULT_CAMERA_ID):
+    return start_camera(camera_id)
 
 @app.post("/stop-feed")
-def stop_feed():
-    global live_feed_active
-    live_feed_active = False
-    if live_feed_thread:
-        live_feed_thread.join()  # Wait for the thread to finish
-    release_webcam()
-    return {"message": "Stopped live feed"}
+def stop_feed(camera_id: str = DEFAULT_CAMERA_ID):
+    return stop_camera(camera_id)
+
+@app.get("/auth-cache/stats")
+def auth_cache_stats():
+    return authorization_cache.stats()
+
+@app.get("/plate-registry/stats")
+def plate_registry_stats():
+    return plate_resolver.stats()
+
+@app.get("/ws/stats")
+def websocket_stats():
+    return {**event_broadcaster.stats(), "relay": event_relay.stats() if shared_state.distributed else None}
+
+@app.get("/shared-state")
+def shared_state_info():
+    return shared_state.info()
+
+@app.get("/live-feed/events")
+def live_feed_events(after: int = 0, limit: int = 100):
+    # Pass the returned next_after back as after to resume; missed > 0 means the reader fell behind the ring
+    events, next_after, missed = live_feed_logs.read(after, max(1, min(limit, 1000)))
+    return {"events": events, "next_after": next_after, "missed": missed}
+
+@app.get("/writer/stats")
+def writer_stats():
+    return {**log_writer.stats(), "snapshots": snapshot_store.stats()}
+
+def collect_pipeline_gauges():
+    # Queue depths and camera rates are read from their owners at scrape time
+    cameras = camera_manager.list()
+    writer = log_writer.stats()
+    jobs = job_manager.list()
+    return [
+        ("plate_camera_fps", "Capture frames per second", ["camera"],
+         [((c["camera_id"],), c["fps"]) for c in cameras]),
+        ("plate_camera_viewers", "Open /live-video streams", ["camera"],
+         [((c["camera_id"],), c["viewers"]) for c in cameras]),
+        ("plate_writer_queue_depth", "Snapshot/log events waiting for the write-behind writer", [],
+         [((), writer["queue_depth"])]),
+        ("plate_writer_dropped", "Events dropped because the write queue was full", [],
+         [((), writer["dropped"])]),
+        ("plate_jobs", "Video jobs by status", ["status"],
+         [((status,), sum(1 for job in jobs if job["status"] == status)) for status in ("queued", "running")]),
+        ("plate_ws_subscribers", "Connected /ws/plates clients", [],
+         [((), event_broadcaster.stats()["subscribers"])]),
+    ]
+
+metrics_registry.add_collector(collect_pipeline_gauges)
+
+@app.get("/metrics")
+def metrics():
+    return Response(metrics_registry.render(), media_type=METRICS_CONTENT_TYPE)
 
 @app.get("/get-logs")
-def get_logs():
-    logs_ref = db.collection("logs").where("visitorStatus", "in", ["authorized", "visitor"]).stream()
-    logs = [log.to_dict() for log in logs_ref]
-    return {"logs": logs}
-
-def gen_frames():
-    cap = cv2.VideoCapture(0, cv2.CAP_DSHOW)
-    while True:
-        success, frame = cap.read()
-        if not success:
-            break
-        ret, buffer = cv2.imencode('.jpg', frame)
-        frame = buffer.tobytes()
-        yield (
-            b"--frame\r\n"
-            b"Content-Type: image/jpeg\r\n\r\n" + frame + b"\r\n"
+def get_logs(
+    plate: Optional[str] = None,
+    status: Optional[str] = None,
+    visitor_status: str = "authorized,visitor",
+    camera: Optional[str] = None,
+    since: Optional[str] = None,
+    until: Optional[str] = None,
+    limit: int = LOGS_PAGE_SIZE,
+    cursor: Optional[str] = None,
+):
+    """Newest-first page of logs; pass next_cursor back as cursor for the next page.
+
+    status and visitor_status take comma-separated values ("all" for no visitor filter),
+    since/until are ISO timestamps (since inclusive, until exclusive).
+    """
+    try:
+        query = LogQuery(
+            plate=clean_plate_text(plate) if plate else None,
+            statuses=split_values(status),
+            visitor_statuses=() if visitor_status == "all" else split_values(visitor_status),
+            camera=camera,
+            since=since,
+            until=until,
+            limit=limit,
+            cursor=cursor,
         )
-    cap.release()
-
-@app.get("/live-video")
-async def video_feed():
-    def gen_frames():
-        try:
-            cap = cv2.VideoCapture(0, cv2.CAP_DSHOW)
-            if not cap.isOpened():
-                print("Webcam not accessible in live-video")
-                return
-            
-            while True:
-                success, frame = cap.read()
-                if not success:
-                    print("Failed to read frame in live-video")
-                    break
-                ret, buffer = cv2.imencode('.jpg', frame)
-                if not ret:
-                    print("Failed to encode frame")
-                    continue
-                frame = buffer.tobytes()
-                yield (
-                    b"--frame\r\n"
-                    b"Content-Type: image/jpeg\r\n\r\n" + frame + b"\r\n"
-                )
-        except Exception as e:
-            print(f"Error in gen_frames: {e}")
-        finally:
-            cap.release()
-            cv2.destroyAllWindows()
-    
-    return StreamingResponse(gen_frames(), media_type="multipart/x-mixed-replace; boundary=frame")
\ No newline at end of file
+    except (InvalidCursor, ValueError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    key = query.key()
+    cached = logs_cache.get(key)
+    if cached is not None:
+        return Response(cached, media_type="application/json")
+
+    generation = logs_cache.generation
+    entries, next_cursor = storage.logs.query(query)
+
+    def body():
+        chunks = []
+        for chunk in stream_log_page(entries, next_cursor):
+            chunks.append(chunk)
+            yield chunk
+        logs_cache.put(key, b"".join(chunks), generation)
+
+    return StreamingResponse(body(), media_type="application/json")
+
+@app.get("/get-logs/stats")
+def get_logs_stats():
+    return logs_cache.stats()
+
+@app.get("/snapshots/{name}")
+def get_snapshot(name: str):
+    # Only the local blob store serves files itself, Supabase URLs point at the bucket
+    if storage.kind != "local":
+        raise HTTPException(status_code=404, detail="Snapshots are served by the storage bucket")
+    path = storage.blobs.path(name)
+    if not os.path.isfile(path):
+        raise HTTPException(status_code=404, detail="Snapshot not found")
+    return FileResponse(path, media_type=content_type_for(path))
+
+# Under gunicorn --preload (see gunicorn.conf.py) the master builds the models once and the
+# forked workers share the weights copy-on-write instead of each loading a private copy
+if os.getenv("PRELOAD_MODELS") == "1":
+    resources.load(["ocr", "detector"])
@@ -0,0 +1,190 @@
+import bisect
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+METRICS_ENABLED = os.getenv("METRICS", "1") != "0"
+
+# Seconds; covers sub-millisecond cache hits up to multi-second uploads
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"') for _, v in pairs)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+
+def format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    kind = "untyped"
+
+    def __init__(self, registry, name, help_text, labelnames=()):
+        self.registry = registry
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def samples(self):
+        with self._lock:
+            return [(self.name, key, value) for key, value in self._values.items()]
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        if not self.registry.enabled:
+            return
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+
+class Gauge(Metric):
+    kind = "gauge"
+
+    def set(self, value, **labels):
+        if not self.registry.enabled:
+            return
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, registry, name, help_text, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(registry, name, help_text, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        if not self.registry.enabled:
+            return
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                # Per-bucket (non-cumulative) counts, then sum and count
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def samples(self):
+        samples = []
+        with self._lock:
+            items = [(key, list(state[0]), state[1], state[2]) for key, state in self._values.items()]
+        for key, counts, total, count in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                samples.append((self.name + "_bucket", key, cumulative, (("le", format_value(bound)),)))
+            samples.append((self.name + "_sum", key, total))
+            samples.append((self.name + "_count", key, count))
+        return samples
+
+
+class MetricsRegistry:
+    """Minimal thread-safe Prometheus text-format registry.
+
+    Counters and histograms are updated in place from the pipeline; gauges that mirror state
+    owned elsewhere (queue depths, camera FPS) come from collectors called at scrape time.
+    A collector returns (name, help, labelnames, [(label_values, value), ...]) tuples.
+    """
+
+    def __init__(self, enabled=METRICS_ENABLED):
+        self.enabled = enabled
+        self._metrics = []
+        self._collectors = []
+
+    def _register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name, help_text, labelnames=()):
+        return self._register(Counter(self, name, help_text, labelnames))
+
+    def gauge(self, name, help_text, labelnames=()):
+        return self._register(Gauge(self, name, help_text, labelnames))
+
+    def histogram(self, name, help_text, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._register(Histogram(self, name, help_text, labelnames, buckets))
+
+    def add_collector(self, collect):
+        self._collectors.append(collect)
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for sample in metric.samples():
+                name, key, value = sample[:3]
+                extra = sample[3] if len(sample) > 3 else ()
+                lines.append(f"{name}{format_labels(metric.labelnames, key, extra)} {format_value(value)}")
+        for collect in self._collectors:
+            try:
+                families = collect()
+            except Exception:
+                continue
+            for name, help_text, labelnames, values in families:
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} gauge")
+                for key, value in values:
+                    lines.append(f"{name}{format_labels(labelnames, key)} {format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+# Per-stage latency
+DECODE_SECONDS = REGISTRY.histogram("plate_decode_seconds", "Time to read and decode one frame", ["source"])
+YOLO_SECONDS = REGISTRY.histogram("plate_yolo_seconds", "Plate detector time per batch of frames")
+OCR_SECONDS = REGISTRY.histogram("plate_ocr_seconds", "PaddleOCR recognition time per batch of crops")
+AUTH_LOOKUP_SECONDS = REGISTRY.histogram("plate_auth_lookup_seconds", "Visitor authorization lookup time", ["result"])
+SNAPSHOT_ENCODE_SECONDS = REGISTRY.histogram("plate_snapshot_encode_seconds", "Snapshot encode time (frame, crop and thumbnail)")
+SNAPSHOT_UPLOAD_SECONDS = REGISTRY.histogram("plate_snapshot_upload_seconds", "Snapshot upload time including retries")
+LOG_WRITE_SECONDS = REGISTRY.histogram("plate_log_write_seconds", "Batched log write time including retries")
+
+# Pipeline counters
+FRAMES_READ = REGISTRY.counter("plate_frames_read_total", "Frames read from a camera or video", ["source"])
+FRAMES_SAMPLED = REGISTRY.counter("plate_frames_sampled_total", "Frames sent to the detector", ["source"])
+FRAMES_DROPPED = REGISTRY.counter("plate_frames_dropped_total", "Sampled frames skipped because inference was busy", ["source"])
+DETECTIONS = REGISTRY.counter("plate_detections_total", "Plate boxes found by the detector")
+PLATE_CROPS = REGISTRY.counter("plate_crops_total", "Plate boxes cropped for OCR")
+CROPS_REJECTED = REGISTRY.counter("plate_crops_rejected_total", "Plate crops not worth an OCR call", ["reason"])
+OCR_REJECTS = REGISTRY.counter("plate_ocr_rejects_total", "Plate reads discarded", ["reason"])
+LOGS_WRITTEN = REGISTRY.counter("plate_logs_total", "Entry/exit/blocked logs produced", ["type"])
+LOGS_DROPPED = REGISTRY.counter("plate_logs_dropped_total", "Logs dropped because the log writer was full or stopped", ["type"])
+SNAPSHOT_BYTES = REGISTRY.counter("plate_snapshot_bytes_total", "Snapshot bytes uploaded", ["image"])
+SNAPSHOT_DEDUPED = REGISTRY.counter("plate_snapshot_deduped_total", "Snapshots not uploaded because a near-identical one was stored")
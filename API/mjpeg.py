@@ -0,0 +1,185 @@
+import asyncio
+import logging
+import os
+import threading
+import time
+
+import cv2
+
+logger = logging.getLogger(__name__)
+
+MJPEG_QUALITY = int(os.getenv("MJPEG_QUALITY", "80"))
+MJPEG_MAX_WIDTH = int(os.getenv("MJPEG_MAX_WIDTH", "960"))
+MJPEG_MAX_FPS = float(os.getenv("MJPEG_MAX_FPS", "15"))
+MJPEG_OVERLAY = os.getenv("MJPEG_OVERLAY", "1") == "1"
+# Detections older than this are not drawn any more
+OVERLAY_MAX_AGE = 2.0
+
+
+def multipart_chunk(jpeg):
+    return b"--frame\r\nContent-Type: image/jpeg\r\n\r\n" + jpeg + b"\r\n"
+
+
+class MjpegBroadcaster:
+    """Encodes a camera's frames once and hands the same JPEG bytes to every /live-video viewer.
+
+    The encoder thread only runs while somebody is watching. Boxes are drawn from the camera's
+    latest detections (camera.last_detections), never recomputed for the preview.
+    """
+
+    def __init__(self, camera, quality=MJPEG_QUALITY, max_width=MJPEG_MAX_WIDTH, max_fps=MJPEG_MAX_FPS,
+                 overlay=MJPEG_OVERLAY):
+        self.camera = camera
+        self.quality = quality
+        self.max_width = max_width
+        self.max_fps = max_fps
+        self.overlay = overlay
+        self.viewers = 0
+        self.frames_encoded = 0
+        self._jpeg = None
+        self._seq = 0
+        self._frame_lock = threading.Lock()
+        # (event loop, asyncio.Event) of every viewer waiting for the next frame
+        self._waiters = set()
+        self._lock = threading.Lock()
+        # Stop event of the current encoder thread; None when it was told to stop
+        self._stop = None
+        self._thread = None
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def _acquire(self):
+        with self._lock:
+            self.viewers += 1
+            self.camera.viewers += 1
+            self.camera.start_capture()
+            # A thread still winding down after the last viewer left keeps its own (set) stop event,
+            # a fresh thread is started next to it
+            if self._stop is None or not self.running:
+                self._stop = threading.Event()
+                self._thread = threading.Thread(target=self._run, args=(self._stop,),
+                                                name=f"mjpeg-{self.camera.camera_id}", daemon=True)
+                self._thread.start()
+
+    def _release(self):
+        with self._lock:
+            self.viewers -= 1
+            self.camera.viewers -= 1
+            if self.viewers > 0:
+                return
+            if self._stop is not None:
+                self._stop.set()
+                self._stop = None
+            if not self.camera.detecting:
+                self.camera.stop_capture()
+
+    def encode(self, frame):
+        h, w = frame.shape[:2]
+        scale = 1.0
+        if self.max_width and w > self.max_width:
+            scale = self.max_width / float(w)
+            frame = cv2.resize(frame, (self.max_width, int(h * scale)), interpolation=cv2.INTER_AREA)
+        elif self.overlay:
+            frame = frame.copy()
+        if self.overlay:
+            self.draw_detections(frame, scale)
+        ok, buffer = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, self.quality])
+        return buffer.tobytes() if ok else None
+
+    def draw_detections(self, frame, scale):
+        detections = getattr(self.camera, "last_detections", None)
+        if not detections:
+            return
+        detected_at, boxes, texts = detections
+        if time.time() - detected_at > OVERLAY_MAX_AGE:
+            return
+        for (x1, y1, x2, y2), text in zip(boxes, texts):
+            p1 = (int(x1 * scale), int(y1 * scale))
+            p2 = (int(x2 * scale), int(y2 * scale))
+            cv2.rectangle(frame, p1, p2, (0, 255, 0), 2)
+            if text:
+                cv2.putText(frame, text, (p1[0], max(0, p1[1] - 6)), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 255, 0), 2)
+
+    def _wake_viewers(self):
+        with self._frame_lock:
+            waiters = list(self._waiters)
+        for loop, event in waiters:
+            try:
+                loop.call_soon_threadsafe(event.set)
+            except RuntimeError:
+                # The viewer's event loop is already closed
+                pass
+
+    def _run(self, stop):
+        last_seq = 0
+        interval = 1.0 / self.max_fps if self.max_fps else 0.0
+        try:
+            while not stop.is_set():
+                packet = self.camera.wait_frame(last_seq)
+                if packet is None:
+                    if not self.camera.capturing:
+                        logger.warning("Camera %s not accessible in live-video", self.camera.camera_id)
+                        break
+                    continue
+                started = time.monotonic()
+                last_seq = packet.seq
+                jpeg = self.encode(packet.frame)
+                if jpeg is None:
+                    logger.warning("Failed to encode frame in live-video (%s)", self.camera.camera_id)
+                    continue
+                with self._frame_lock:
+                    self._jpeg = jpeg
+                    self._seq += 1
+                    self.frames_encoded += 1
+                self._wake_viewers()
+                if interval:
+                    stop.wait(max(0.0, interval - (time.monotonic() - started)))
+        finally:
+            self._wake_viewers()
+
+    async def stream(self):
+        """Async generator of multipart MJPEG chunks for one viewer.
+
+        Viewers wait for the shared frame on the event loop instead of each holding a threadpool
+        thread; only starting and stopping the capture (lease call, thread join) use the executor.
+        """
+        loop = asyncio.get_running_loop()
+        waiter = (loop, asyncio.Event())
+        with self._frame_lock:
+            self._waiters.add(waiter)
+        # Submitted right away, and the release is chained to it, so a viewer leaving before the
+        # capture started still gives back its place
+        acquired = loop.run_in_executor(None, self._acquire)
+        try:
+            await asyncio.shield(acquired)
+            seq = 0
+            while True:
+                try:
+                    await asyncio.wait_for(waiter[1].wait(), 1.0)
+                except asyncio.TimeoutError:
+                    pass
+                waiter[1].clear()
+                with self._frame_lock:
+                    current, jpeg = self._seq, self._jpeg
+                if current == seq:
+                    if not self.running:
+                        break
+                    continue
+                seq = current
+                yield multipart_chunk(jpeg)
+        finally:
+            with self._frame_lock:
+                self._waiters.discard(waiter)
+            acquired.add_done_callback(lambda _: loop.run_in_executor(None, self._release))
+
+    def info(self):
+        return {
+            "viewers": self.viewers,
+            "frames_encoded": self.frames_encoded,
+            "quality": self.quality,
+            "max_width": self.max_width,
+            "max_fps": self.max_fps,
+            "overlay": self.overlay,
+        }
@@ -0,0 +1,103 @@
+import logging
+import re
+import time
+
+import cv2
+import numpy as np
+
+from metrics import OCR_REJECTS, OCR_SECONDS
+from plate_preprocess import OCR_INPUT_HEIGHT, prepare_plate_crops
+
+logger = logging.getLogger(__name__)
+
+OCR_MIN_SCORE = 60
+
+_non_word = re.compile(r'\W')
+
+
+def clean_plate_text(text):
+    text = _non_word.sub('', text)
+    text = text.replace("???", "")
+    text = text.replace("O", "0")
+    text = text.replace("粤", "")
+    return text.upper()
+
+
+def is_valid_plate_text(text):
+    # Plates are 4-10 characters and contain at least one digit
+    return bool(text) and 4 <= len(text) <= 10 and any(char.isdigit() for char in text)
+
+
+def ocr_score(score):
+    # PaddleOCR scores are 0..1 floats and can be NaN for empty crops
+    if np.isnan(score):
+        return 0
+    return int(score * 100)
+
+
+def resize_to_height(img, height=OCR_INPUT_HEIGHT):
+    h, w = img.shape[:2]
+    if h == height:
+        return img
+    width = max(1, int(round(w * height / float(h))))
+    interpolation = cv2.INTER_AREA if h > height else cv2.INTER_LINEAR
+    return cv2.resize(img, (width, height), interpolation=interpolation)
+
+
+def crop_plates(frame, boxes):
+    # Clamped, padded and height-normalized crops; None for boxes too small or blurred to read
+    return prepare_plate_crops(frame, boxes)
+
+
+def recognize_plates_with_scores(ocr, crops, min_score=OCR_MIN_SCORE, height=OCR_INPUT_HEIGHT):
+    """Run one PaddleOCR recognition call over all crops and return (text, score) or None for each."""
+    readings = [None] * len(crops)
+    valid = [i for i, crop in enumerate(crops) if crop is not None and crop.size and crop.shape[0] > 0 and crop.shape[1] > 0]
+    if len(valid) < len(crops):
+        OCR_REJECTS.inc(len(crops) - len(valid), reason="unreadable_crop")
+    if not valid:
+        return readings
+
+    images = [resize_to_height(crops[i], height) for i in valid]
+    start = time.perf_counter()
+    try:
+        result = ocr.ocr(images, det=False, rec=True, cls=False)
+    except Exception as e:
+        logger.error("PaddleOCR error: %s", e)
+        return readings
+    finally:
+        OCR_SECONDS.observe(time.perf_counter() - start)
+
+    # With det=False and a list input PaddleOCR returns [[(text, score), ...]] in input order
+    recognized = result[0] if result else []
+    for i, rec in zip(valid, recognized or []):
+        if not rec:
+            continue
+        text, score = rec
+        score = ocr_score(score)
+        if score > min_score:
+            readings[i] = (clean_plate_text(text), score)
+        else:
+            OCR_REJECTS.inc(reason="low_score")
+    return readings
+
+
+def recognize_plates(ocr, crops, min_score=OCR_MIN_SCORE, height=OCR_INPUT_HEIGHT):
+    # Cleaned text (or None) for each crop
+    return [r[0] if r else None for r in recognize_plates_with_scores(ocr, crops, min_score, height)]
+
+
+def recognize_plates_per_frame(ocr, frames, boxes_per_frame, min_score=OCR_MIN_SCORE):
+    # Gather crops from every frame of a batch, recognize them together and split them back per frame
+    crops, counts = [], []
+    for frame, boxes in zip(frames, boxes_per_frame):
+        frame_crops = crop_plates(frame, boxes)
+        crops.extend(frame_crops)
+        counts.append(len(frame_crops))
+
+    texts = recognize_plates(ocr, crops, min_score)
+    texts_per_frame, start = [], 0
+    for count in counts:
+        texts_per_frame.append(texts[start:start + count])
+        start += count
+    return texts_per_frame
@@ -0,0 +1,94 @@
+import os
+
+import cv2
+import numpy as np
+
+from metrics import CROPS_REJECTED, PLATE_CROPS
+
+# PaddleOCR's recognizer input height
+OCR_INPUT_HEIGHT = 48
+OCR_PREPROCESS = os.getenv("OCR_PREPROCESS", "1") == "1"
+OCR_DESKEW = os.getenv("OCR_DESKEW", "0") == "1"
+# Boxes are grown by this fraction of their size so characters at the edge are not cut off
+BOX_PAD_RATIO = 0.06
+MIN_CROP_WIDTH = 24
+MIN_CROP_HEIGHT = 10
+# Laplacian variance of the normalized crop below which OCR is not worth running
+MIN_SHARPNESS = float(os.getenv("OCR_MIN_SHARPNESS", "30"))
+
+
+def clamp_boxes(boxes, shape, pad_ratio=BOX_PAD_RATIO):
+    """Pad all boxes at once and clip them to the frame; returns an (N, 4) int array."""
+    if len(boxes) == 0:
+        return np.zeros((0, 4), dtype=np.int32)
+    boxes = np.asarray(boxes, dtype=np.float32).reshape(-1, 4)
+    height, width = shape[:2]
+    pad = np.stack([boxes[:, 2] - boxes[:, 0], boxes[:, 3] - boxes[:, 1]], axis=1) * pad_ratio
+    padded = boxes + np.concatenate([-pad, pad], axis=1)
+    padded[:, [0, 2]] = padded[:, [0, 2]].clip(0, width)
+    padded[:, [1, 3]] = padded[:, [1, 3]].clip(0, height)
+    return padded.round().astype(np.int32)
+
+
+def target_widths(boxes, height=OCR_INPUT_HEIGHT):
+    # Width of every crop once scaled to the recognizer height, keeping the aspect ratio
+    box_w = (boxes[:, 2] - boxes[:, 0]).astype(np.float32)
+    box_h = np.maximum(boxes[:, 3] - boxes[:, 1], 1).astype(np.float32)
+    return np.maximum(1, np.round(box_w * height / box_h)).astype(np.int32)
+
+
+def deskew(crop):
+    # Rotate a plate so its dominant text line is horizontal (small angles only)
+    gray = cv2.cvtColor(crop, cv2.COLOR_BGR2GRAY) if crop.ndim == 3 else crop
+    _, mask = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY_INV | cv2.THRESH_OTSU)
+    points = cv2.findNonZero(mask)
+    if points is None or len(points) < 20:
+        return crop
+    angle = cv2.minAreaRect(points)[-1]
+    if angle > 45:
+        angle -= 90
+    if abs(angle) < 2 or abs(angle) > 20:
+        return crop
+    h, w = crop.shape[:2]
+    matrix = cv2.getRotationMatrix2D((w / 2, h / 2), angle, 1.0)
+    return cv2.warpAffine(crop, matrix, (w, h), flags=cv2.INTER_LINEAR, borderMode=cv2.BORDER_REPLICATE)
+
+
+def normalize_contrast(crop):
+    # Min-max stretch of the luminance; cheap and enough for washed-out night / glare plates
+    return cv2.normalize(crop, None, 0, 255, cv2.NORM_MINMAX)
+
+
+def sharpness(crop):
+    gray = cv2.cvtColor(crop, cv2.COLOR_BGR2GRAY) if crop.ndim == 3 else crop
+    return float(cv2.Laplacian(gray, cv2.CV_64F).var())
+
+
+def prepare_plate_crops(frame, boxes, height=OCR_INPUT_HEIGHT, min_sharpness=MIN_SHARPNESS, deskew_crops=OCR_DESKEW):
+    """Clamp, pad and size-normalize every box of a frame; returns a crop per box, or None if it is
+    too small or too blurred to be worth an OCR call."""
+    if not OCR_PREPROCESS:
+        return [frame[y1:y2, x1:x2] for x1, y1, x2, y2 in boxes]
+
+    clamped = clamp_boxes(boxes, frame.shape)
+    widths = target_widths(clamped, height)
+    sizes_ok = ((clamped[:, 2] - clamped[:, 0]) >= MIN_CROP_WIDTH) & ((clamped[:, 3] - clamped[:, 1]) >= MIN_CROP_HEIGHT)
+
+    crops = []
+    for (x1, y1, x2, y2), width, size_ok in zip(clamped, widths, sizes_ok):
+        PLATE_CROPS.inc()
+        if not size_ok:
+            CROPS_REJECTED.inc(reason="small")
+            crops.append(None)
+            continue
+        crop = frame[y1:y2, x1:x2]
+        if deskew_crops:
+            crop = deskew(crop)
+        interpolation = cv2.INTER_AREA if crop.shape[0] > height else cv2.INTER_CUBIC
+        crop = normalize_contrast(cv2.resize(crop, (int(width), height), interpolation=interpolation))
+        if min_sharpness and sharpness(crop) < min_sharpness:
+            CROPS_REJECTED.inc(reason="blur")
+            crops.append(None)
+            continue
+        crops.append(crop)
+    return crops
@@ -0,0 +1,228 @@
+import itertools
+import logging
+import os
+import re
+import threading
+
+from metrics import OCR_REJECTS
+from plate_ocr import clean_plate_text
+
+logger = logging.getLogger(__name__)
+
+PLATE_REGION = os.getenv("PLATE_REGION", "GENERIC")
+
+# Plate grammars per region, compiled once
+PLATE_GRAMMARS = {
+    # Anything 4-10 characters long with at least one digit (the original acceptance rule)
+    "GENERIC": re.compile(r"^(?=.*\d)[A-Z0-9]{4,10}$"),
+    # Indian registration plates: KA01AB1234, DL3CAF0001, MH12A1234, 22BH1234AA
+    "IN": re.compile(r"^(?:[A-Z]{2}\d{1,2}[A-Z]{0,3}\d{4}|\d{2}BH\d{4}[A-Z]{1,2})$"),
+    # Mainland China after the province character is dropped: A12345, AD12345
+    "CN": re.compile(r"^[A-Z][A-HJ-NP-Z0-9]{5,6}$"),
+    # EU-style alphanumerics with at least one letter and one digit
+    "EU": re.compile(r"^(?=.*\d)(?=.*[A-Z])[A-Z0-9]{5,8}$"),
+}
+# Grammars that fix which positions hold letters and which hold digits. Only these are corrected:
+# GENERIC and EU just require "some digit", and swapping a look-alike letter to supply it would
+# turn letter-only OCR junk ("TAXI" -> "7AXI") into a plate
+POSITIONAL_GRAMMARS = {"IN", "CN"}
+
+# Characters OCR commonly mistakes for each other, grouped by the shape they share
+CONFUSION_GROUPS = ["0ODQU", "1IL", "2Z", "5S", "8B", "6G", "4A", "7T"]
+_canonical = {}
+for group in CONFUSION_GROUPS:
+    for char in group:
+        _canonical[char] = group[0]
+CANONICAL_TABLE = str.maketrans(_canonical)
+_alternatives = {char: [c for c in group if c != char] for group in CONFUSION_GROUPS for char in group}
+
+# Only look-alike swaps are corrected, each costs CONFUSION_COST; any other difference is a different plate
+CONFUSION_COST = 1
+MAX_MATCH_COST = int(os.getenv("PLATE_MAX_CONFUSIONS", "2")) * CONFUSION_COST
+
+
+def canonical_plate(text):
+    return text.translate(CANONICAL_TABLE)
+
+
+def confusion_cost(a, b):
+    """Cost of turning a into b through look-alike substitutions only, or None if that is not possible.
+
+    Insertions, deletions and substitutions outside CONFUSION_GROUPS are never corrected: a plate one
+    real character away from a registered one belongs to a different vehicle.
+    """
+    if len(a) != len(b) or canonical_plate(a) != canonical_plate(b):
+        return None
+    return sum(CONFUSION_COST for ca, cb in zip(a, b) if ca != cb)
+
+
+class PlateGrammar:
+    """Region plate format with OCR-confusion-aware correction."""
+
+    def __init__(self, region=PLATE_REGION, max_substitutions=2):
+        self.region = region.upper()
+        self.pattern = PLATE_GRAMMARS.get(self.region, PLATE_GRAMMARS["GENERIC"])
+        self.max_substitutions = max_substitutions if self.region in POSITIONAL_GRAMMARS else 0
+
+    def is_valid(self, text):
+        return bool(text) and self.pattern.match(text) is not None
+
+    def correct(self, text):
+        # The text itself if it is valid, else the variant with the fewest look-alike swaps that is
+        if not text:
+            return None
+        if self.is_valid(text):
+            return text
+        positions = [i for i, char in enumerate(text) if char in _alternatives]
+        for count in range(1, self.max_substitutions + 1):
+            for chosen in itertools.combinations(positions, count):
+                for replacement in itertools.product(*(_alternatives[text[i]] for i in chosen)):
+                    chars = list(text)
+                    for i, char in zip(chosen, replacement):
+                        chars[i] = char
+                    candidate = "".join(chars)
+                    if self.is_valid(candidate):
+                        return candidate
+        return None
+
+
+class PlateRegistry:
+    """In-memory index of registered plates for fast lookup of OCR misreads.
+
+    Plates are indexed by their confusion-canonical form (B/8, S/5, O/0 ... collapsed), so any
+    number of look-alike swaps is a single dict lookup. Only those swaps are matched, up to
+    max_cost; candidates are ranked by the number of swaps and ties are treated as ambiguous.
+    """
+
+    def __init__(self, max_cost=MAX_MATCH_COST):
+        self.max_cost = max_cost
+        self._plates = set()
+        self._by_canonical = {}
+        self._plate_by_doc = {}
+        self._lock = threading.Lock()
+        self._watch = None
+
+    def __len__(self):
+        return len(self._plates)
+
+    def __contains__(self, plate):
+        return plate in self._plates
+
+    def add(self, plate):
+        plate = clean_plate_text(plate or "")
+        if not plate:
+            return
+        with self._lock:
+            if plate in self._plates:
+                return
+            self._plates.add(plate)
+            self._by_canonical.setdefault(canonical_plate(plate), set()).add(plate)
+
+    def remove(self, plate):
+        plate = clean_plate_text(plate or "")
+        with self._lock:
+            if plate not in self._plates:
+                return
+            self._plates.discard(plate)
+            key = canonical_plate(plate)
+            plates = self._by_canonical.get(key)
+            if plates is not None:
+                plates.discard(plate)
+                if not plates:
+                    del self._by_canonical[key]
+
+    def candidates(self, text):
+        return set(self._by_canonical.get(canonical_plate(text), ()))
+
+    def match(self, text):
+        """The registered plate text is a look-alike misread of, or None (no match or ambiguous)."""
+        if not text:
+            return None
+        if text in self._plates:
+            return text
+        with self._lock:
+            candidates = self.candidates(text)
+        best, best_cost, tied = None, self.max_cost + 1, False
+        for plate in candidates:
+            cost = confusion_cost(text, plate)
+            if cost is None:
+                continue
+            if cost < best_cost:
+                best, best_cost, tied = plate, cost, False
+            elif cost == best_cost:
+                tied = True
+        if best is None or tied or best_cost > self.max_cost:
+            return None
+        return best
+
+    def rebuild(self, plates):
+        with self._lock:
+            self._plates, self._by_canonical = set(), {}
+        for plate in plates:
+            self.add(plate)
+        return len(self._plates)
+
+    def _on_changes(self, changes):
+        # The first call lists every visitor, which builds the index
+        for doc_id, visitor, removed in changes:
+            old_plate = self._plate_by_doc.pop(doc_id, None)
+            if old_plate:
+                self.remove(old_plate)
+            if not removed:
+                plate = (visitor or {}).get("plate")
+                if plate:
+                    self.add(plate)
+                    self._plate_by_doc[doc_id] = clean_plate_text(plate)
+
+    def start_listener(self, visitors):
+        if self._watch is None:
+            self._watch = visitors.watch(self._on_changes)
+        return self._watch
+
+    def stop_listener(self):
+        if self._watch is not None:
+            self._watch.unsubscribe()
+            self._watch = None
+
+
+class PlateResolver:
+    """Turns a voted OCR string into the plate to log: a registered plate if the text is a look-alike
+    misread of one, otherwise the grammar-corrected text, otherwise None."""
+
+    def __init__(self, registry, grammar):
+        self.registry = registry
+        self.grammar = grammar
+        self.registry_hits = 0
+        self.registry_corrections = 0
+        self.grammar_corrections = 0
+        self.rejected = 0
+
+    def resolve(self, text):
+        if not text:
+            return None
+        registered = self.registry.match(text)
+        if registered is not None:
+            self.registry_hits += 1
+            if registered != text:
+                # The raw read is also stored on the log (rawPlate), see main.handle_plate
+                self.registry_corrections += 1
+                logger.warning("Plate read %s corrected to registered plate %s", text, registered)
+            return registered
+        corrected = self.grammar.correct(text)
+        if corrected is None:
+            self.rejected += 1
+            OCR_REJECTS.inc(reason="plate_format")
+            return None
+        if corrected != text:
+            self.grammar_corrections += 1
+        return corrected
+
+    def stats(self):
+        return {
+            "region": self.grammar.region,
+            "registered_plates": len(self.registry),
+            "registry_hits": self.registry_hits,
+            "registry_corrections": self.registry_corrections,
+            "grammar_corrections": self.grammar_corrections,
+            "rejected": self.rejected,
+        }
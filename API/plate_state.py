@@ -0,0 +1,232 @@
+import logging
+import os
+import sqlite3
+import threading
+from datetime import datetime, timezone
+
+from lazy import resolve_client
+
+logger = logging.getLogger(__name__)
+
+
+def parse_log_timestamp(value):
+    # Log timestamps are ISO strings written from datetime.utcnow(); compare them as naive UTC
+    parsed = datetime.fromisoformat(str(value).replace('Z', '+00:00'))
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+
+def is_newer(timestamp, current):
+    if current is None:
+        return True
+    try:
+        return parse_log_timestamp(timestamp) >= parse_log_timestamp(current["timestamp"])
+    except Exception:
+        return True
+
+
+def latest_states_from_logs(logs):
+    states = {}
+    for log in logs.iter_all():
+        plate, timestamp = log.get("plate"), log.get("timestamp")
+        if not plate or not timestamp:
+            continue
+        if is_newer(timestamp, states.get(plate)):
+            states[plate] = {
+                "status": log.get("status", ""),
+                "timestamp": timestamp,
+                "visitorStatus": log.get("visitorStatus"),
+            }
+    return states
+
+
+class FirestorePlateStateBackend:
+    """Persists one document per plate in the plate_state collection."""
+
+    def __init__(self, db, collection="plate_state"):
+        # The Firestore client or a zero-argument function returning it
+        self._db = db
+        self.collection = collection
+
+    @property
+    def db(self):
+        return resolve_client(self._db)
+
+    def load_all(self):
+        return {doc.id: doc.to_dict() for doc in self.db.collection(self.collection).stream()}
+
+    def save(self, plate, state):
+        self.db.collection(self.collection).document(plate).set(state)
+
+    def save_many(self, states):
+        db = self.db
+        batch = db.batch()
+        for count, (plate, state) in enumerate(states.items(), 1):
+            batch.set(db.collection(self.collection).document(plate), state)
+            # Firestore batches are limited to 500 writes
+            if count % 500 == 0:
+                batch.commit()
+                batch = db.batch()
+        batch.commit()
+
+
+class SqlitePlateStateBackend:
+    """Persists plate states in a local SQLite file."""
+
+    def __init__(self, path="plate_state.db"):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = None
+        self._pid = None
+
+    @property
+    def conn(self):
+        # Opened on first use in each process, never inherited across a pre-fork worker split;
+        # callers hold self._lock
+        if self._pid != os.getpid():
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS plate_state ("
+                " plate TEXT PRIMARY KEY, status TEXT NOT NULL, timestamp TEXT NOT NULL, visitorStatus TEXT)"
+            )
+            conn.commit()
+            self._conn, self._pid = conn, os.getpid()
+        return self._conn
+
+    def load_all(self):
+        with self._lock:
+            rows = self.conn.execute("SELECT plate, status, timestamp, visitorStatus FROM plate_state").fetchall()
+        return {plate: {"status": status, "timestamp": ts, "visitorStatus": vs} for plate, status, ts, vs in rows}
+
+    def save(self, plate, state):
+        self.save_many({plate: state})
+
+    def save_many(self, states):
+        rows = [(plate, s["status"], s["timestamp"], s.get("visitorStatus")) for plate, s in states.items()]
+        with self._lock:
+            conn = self.conn
+            with conn:
+                conn.executemany(
+                    "INSERT INTO plate_state (plate, status, timestamp, visitorStatus) VALUES (?, ?, ?, ?)"
+                    " ON CONFLICT(plate) DO UPDATE SET status=excluded.status, timestamp=excluded.timestamp,"
+                    " visitorStatus=excluded.visitorStatus",
+                    rows,
+                )
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None and self._pid == os.getpid():
+                self._conn.close()
+                self._conn, self._pid = None, None
+
+
+class PendingSaves:
+    """Plates whose state changed since it was last written to the persistent backend.
+
+    Detection only marks plates here; flush() is called from the write-behind writer after it
+    wrote the logs, so Firestore/SQLite latency never sits on the detection path. `read(plates)`
+    returns the current {plate: state} of the store, so a flush never writes an outdated state.
+    """
+
+    def __init__(self, backend, read):
+        self.backend = backend
+        self.read = read
+        self._plates = set()
+        self._lock = threading.Lock()
+        # Two writer threads flushing at once could otherwise save an older state last
+        self._flush_lock = threading.Lock()
+        self.saved = 0
+        self.failed = 0
+
+    def __len__(self):
+        return len(self._plates)
+
+    def add(self, plate):
+        with self._lock:
+            self._plates.add(plate)
+
+    def flush(self):
+        with self._flush_lock:
+            with self._lock:
+                plates, self._plates = self._plates, set()
+            if not plates:
+                return 0
+            try:
+                states = self.read(plates)
+                self.backend.save_many(states)
+            except Exception as e:
+                logger.error("Plate state persist error for %s plates: %s", len(plates), e)
+                # Kept for the next flush unless a newer change already marked them again
+                with self._lock:
+                    self._plates |= plates
+                self.failed += 1
+                return 0
+            self.saved += len(states)
+            return len(states)
+
+
+class PlateStateStore:
+    """Latest status and timestamp per plate, so the entry/exit state machine reads in O(1).
+
+    update() only changes memory; changed plates reach the backend on persist().
+    """
+
+    def __init__(self, backend=None):
+        self.backend = backend
+        self._states = {}
+        self._lock = threading.Lock()
+        self._pending = PendingSaves(backend, self._read) if backend is not None else None
+
+    def __len__(self):
+        return len(self._states)
+
+    def get(self, plate):
+        state = self._states.get(plate)
+        return dict(state) if state is not None else None
+
+    def update(self, plate, status, timestamp, visitor_status=None):
+        # Older events (e.g. from a slower worker) never overwrite a newer state
+        state = {"status": status, "timestamp": timestamp, "visitorStatus": visitor_status}
+        with self._lock:
+            if not is_newer(timestamp, self._states.get(plate)):
+                return False
+            self._states[plate] = state
+        if self._pending is not None:
+            self._pending.add(plate)
+        return True
+
+    def _read(self, plates):
+        with self._lock:
+            return {plate: dict(self._states[plate]) for plate in plates if plate in self._states}
+
+    def persist(self):
+        # Save the plates changed since the last call, returns how many were written
+        return self._pending.flush() if self._pending is not None else 0
+
+    def load(self):
+        if self.backend is None:
+            return 0
+        states = self.backend.load_all()
+        with self._lock:
+            self._states = states
+        return len(states)
+
+    def rebuild_from_logs(self, logs):
+        """Replay the log repository once and keep the newest entry per plate."""
+        states = latest_states_from_logs(logs)
+        with self._lock:
+            self._states = states
+            if self.backend is not None and states:
+                self.backend.save_many(states)
+        return len(states)
+
+
+def create_plate_state_backend(kind, db=None, sqlite_path="plate_state.db"):
+    kind = (kind or "memory").lower()
+    if kind == "firestore":
+        return FirestorePlateStateBackend(db)
+    if kind == "sqlite":
+        return SqlitePlateStateBackend(sqlite_path)
+    return None
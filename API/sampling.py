@@ -0,0 +1,126 @@
+import os
+
+import cv2
+
+SAMPLING_MODE = os.getenv("SAMPLING_MODE", "motion")
+
+
+class FixedSampler:
+    """Analyze every stride-th frame, the original behaviour."""
+
+    def __init__(self, stride=25):
+        self.stride = max(1, int(stride))
+        self.frames_seen = 0
+        self.frames_sampled = 0
+
+    def frames_until_decode(self):
+        # Upcoming frames that can be skipped without being decoded
+        return (self.stride - (self.frames_seen + 1) % self.stride) % self.stride
+
+    def skip(self, count=1):
+        self.frames_seen += count
+
+    def should_sample(self, frame):
+        self.frames_seen += 1
+        if self.frames_seen % self.stride != 0:
+            return False
+        self.frames_sampled += 1
+        return True
+
+    def stats(self):
+        return {"mode": "fixed", "frames_seen": self.frames_seen, "frames_sampled": self.frames_sampled}
+
+
+class MotionSampler:
+    """Analyze frames only while something moves, and more often while a vehicle is in view.
+
+    Every frame is downscaled to a small grayscale image and differenced against the previous one.
+    When the fraction of changed pixels passes motion_threshold the sampler becomes active for
+    hold_frames frames and samples every active_stride frames. While idle it only samples every
+    idle_stride frames (0 disables idle sampling) so a vehicle already standing still is still seen.
+    Motion is measured on every check_every-th frame (active_stride by default); the frames in
+    between are never decoded.
+    """
+
+    def __init__(self, active_stride=5, idle_stride=250, motion_threshold=0.01, pixel_threshold=25,
+                 downscale_width=160, hold_frames=75, check_every=None):
+        self.active_stride = max(1, int(active_stride))
+        self.idle_stride = max(0, int(idle_stride))
+        self.motion_threshold = motion_threshold
+        self.pixel_threshold = pixel_threshold
+        self.downscale_width = downscale_width
+        self.hold_frames = hold_frames
+        self.check_every = max(1, int(check_every or self.active_stride))
+        self._previous = None
+        self._active_until = -1
+        self._since_sample = 0
+        self.frames_seen = 0
+        self.frames_sampled = 0
+        self.motion_frames = 0
+
+    def reset(self):
+        self._previous = None
+        self._active_until = -1
+        self._since_sample = 0
+
+    def motion_score(self, frame):
+        h, w = frame.shape[:2]
+        scale = self.downscale_width / float(w)
+        small = cv2.resize(frame, (self.downscale_width, max(1, int(h * scale))), interpolation=cv2.INTER_AREA)
+        if small.ndim == 3:
+            small = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+        small = cv2.GaussianBlur(small, (5, 5), 0)
+        previous, self._previous = self._previous, small
+        if previous is None or previous.shape != small.shape:
+            return 0.0
+        diff = cv2.absdiff(small, previous)
+        changed = cv2.countNonZero(cv2.threshold(diff, self.pixel_threshold, 255, cv2.THRESH_BINARY)[1])
+        return changed / float(diff.size)
+
+    @property
+    def active(self):
+        return self.frames_seen <= self._active_until
+
+    def frames_until_decode(self):
+        return (self.check_every - (self.frames_seen + 1) % self.check_every) % self.check_every
+
+    def skip(self, count=1):
+        self.frames_seen += count
+        self._since_sample += count
+
+    def should_sample(self, frame):
+        self.frames_seen += 1
+        self._since_sample += 1
+        if self.motion_score(frame) >= self.motion_threshold:
+            self.motion_frames += 1
+            if not self.active:
+                # Motion just started: look at this frame right away
+                self._since_sample = self.active_stride
+            self._active_until = self.frames_seen + self.hold_frames
+
+        stride = self.active_stride if self.active else self.idle_stride
+        if not stride or self._since_sample < stride:
+            return False
+        self._since_sample = 0
+        self.frames_sampled += 1
+        return True
+
+    def stats(self):
+        return {
+            "mode": "motion",
+            "active": self.active,
+            "frames_seen": self.frames_seen,
+            "frames_sampled": self.frames_sampled,
+            "motion_frames": self.motion_frames,
+        }
+
+
+def create_sampler(mode=SAMPLING_MODE, stride=25):
+    if mode == "fixed":
+        return FixedSampler(stride)
+    return MotionSampler(
+        active_stride=int(os.getenv("MOTION_ACTIVE_STRIDE", "5")),
+        idle_stride=int(os.getenv("MOTION_IDLE_STRIDE", str(stride * 10))),
+        motion_threshold=float(os.getenv("MOTION_THRESHOLD", "0.01")),
+        check_every=int(os.getenv("MOTION_CHECK_EVERY", "0")) or None,
+    )
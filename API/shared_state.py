@@ -0,0 +1,343 @@
+import json
+import logging
+import os
+import socket
+import threading
+import time
+
+from lazy import resolve_client
+from live_state import LIVE_EVENTS_CAPACITY, LOG_DEDUP_SECONDS, EventLog, SeenVehicles, page_events
+from plate_state import PendingSaves, PlateStateStore, is_newer, latest_states_from_logs
+
+logger = logging.getLogger(__name__)
+
+# "memory" for a single worker, "redis" to share dedup windows, plate state, live events and
+# camera leases between uvicorn workers and hosts
+SHARED_STATE = os.getenv("SHARED_STATE", "memory")
+SHARED_STATE_URL = os.getenv("SHARED_STATE_URL", "redis://localhost:6379/0")
+SHARED_STATE_PREFIX = os.getenv("SHARED_STATE_PREFIX", "plates:")
+# A camera whose owner stops renewing is free for another worker after this long
+CAMERA_LEASE_TTL = float(os.getenv("CAMERA_LEASE_TTL", "15"))
+
+
+def worker_id():
+    # Evaluated on every call: a state object created before a pre-fork split is shared by all workers
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+class MemorySharedState:
+    """State of a single worker process: the in-memory structures, and leases held in a dict."""
+
+    kind = "memory"
+    distributed = False
+
+    def __init__(self):
+        self._leases = {}
+        self._lock = threading.Lock()
+
+    def seen_vehicles(self, scope):
+        return SeenVehicles()
+
+    def event_log(self, name, capacity=LIVE_EVENTS_CAPACITY):
+        return EventLog(capacity)
+
+    def plate_states(self, backend=None):
+        return PlateStateStore(backend)
+
+    def acquire_lease(self, name, owner, ttl):
+        # Takes a free or expired lease, or extends one the owner already holds
+        with self._lock:
+            current = self._leases.get(name)
+            if current is not None and current[0] != owner and current[1] > time.monotonic():
+                return False
+            self._leases[name] = (owner, time.monotonic() + ttl)
+            return True
+
+    def release_lease(self, name, owner):
+        with self._lock:
+            if self._leases.get(name, (None,))[0] == owner:
+                del self._leases[name]
+
+    def lease_owner(self, name):
+        with self._lock:
+            current = self._leases.get(name)
+        return current[0] if current is not None and current[1] > time.monotonic() else None
+
+    def info(self):
+        return {"backend": self.kind, "worker": worker_id()}
+
+
+class RedisSharedState:
+    """State shared through a Redis-protocol server (Redis, Valkey, KeyDB, or a test stand-in).
+
+    Dedup windows are keys set with NX and an expiry, so exactly one worker wins each window.
+    Compare-and-set updates (plate state, lease renewal) use WATCH/MULTI, no server-side
+    scripts, so any server implementing the basic commands works. Needs redis-py (pip install redis).
+    """
+
+    kind = "redis"
+    distributed = True
+
+    def __init__(self, client=None, url=SHARED_STATE_URL, prefix=SHARED_STATE_PREFIX):
+        import redis
+
+        self._redis = redis
+        # A client object or a zero-argument function returning one; connects on first use by default
+        self._client = client if client is not None else lambda: redis.Redis.from_url(url, decode_responses=True)
+        self._resolved = None
+        self._client_lock = threading.Lock()
+        self.url = url
+        self.prefix = prefix
+
+    @property
+    def client(self):
+        if self._resolved is None:
+            with self._client_lock:
+                if self._resolved is None:
+                    self._resolved = resolve_client(self._client)
+        return self._resolved
+
+    def key(self, name):
+        return f"{self.prefix}{name}"
+
+    def _text(self, value):
+        return value.decode() if isinstance(value, bytes) else value
+
+    def transaction(self, name, fn):
+        """Optimistic read-modify-write of one key, retried if another worker changed it in between.
+
+        fn(pipe) reads through pipe and returns (writes, result); writes(pipe) queues the commands
+        to run atomically, or is None to leave the key untouched.
+        """
+        key = self.key(name)
+        while True:
+            with self.client.pipeline() as pipe:
+                try:
+                    pipe.watch(key)
+                    writes, result = fn(pipe)
+                    if writes is not None:
+                        pipe.multi()
+                        writes(pipe)
+                        pipe.execute()
+                    return result
+                except self._redis.WatchError:
+                    continue
+
+    def claim(self, name, ttl):
+        return bool(self.client.set(self.key(name), worker_id(), nx=True, px=max(1, int(ttl * 1000))))
+
+    def release(self, name):
+        self.client.delete(self.key(name))
+
+    def seen_vehicles(self, scope):
+        return SharedSeenVehicles(self, scope)
+
+    def event_log(self, name, capacity=LIVE_EVENTS_CAPACITY):
+        return RedisEventLog(self, name, capacity)
+
+    def plate_states(self, backend=None):
+        return SharedPlateStateStore(self, backend)
+
+    def acquire_lease(self, name, owner, ttl):
+        key, ttl_ms = self.key(name), max(1, int(ttl * 1000))
+        if self.client.set(key, owner, nx=True, px=ttl_ms):
+            return True
+
+        def renew(pipe):
+            if self._text(pipe.get(key)) != owner:
+                return None, False
+            return (lambda p: p.pexpire(key, ttl_ms)), True
+
+        return self.transaction(name, renew)
+
+    def release_lease(self, name, owner):
+        key = self.key(name)
+
+        def release(pipe):
+            if self._text(pipe.get(key)) != owner:
+                return None, False
+            return (lambda p: p.delete(key)), True
+
+        self.transaction(name, release)
+
+    def lease_owner(self, name):
+        return self._text(self.client.get(self.key(name)))
+
+    def info(self):
+        return {"backend": self.kind, "worker": worker_id(), "url": self.url, "prefix": self.prefix}
+
+
+class SharedSeenVehicles:
+    """Dedup windows as expiring keys: the first worker to claim a plate logs it, the others skip it.
+
+    Windows run on the wall clock of the shared server, which matches the live feeds that use them.
+    """
+
+    def __init__(self, state, scope):
+        self.state = state
+        self.scope = scope
+
+    def _name(self, plate):
+        return f"seen:{self.scope}:{plate}"
+
+    def logged_within(self, plate, when, seconds=LOG_DEDUP_SECONDS):
+        return self.state.client.exists(self.state.key(self._name(plate))) > 0
+
+    def claim(self, plate, when, seconds=LOG_DEDUP_SECONDS):
+        return self.state.claim(self._name(plate), seconds)
+
+    def release(self, plate):
+        self.state.release(self._name(plate))
+
+    def record(self, plate, when, status):
+        # The claimed key already holds the window
+        pass
+
+    def stats(self):
+        return {"shared": True, "scope": self.scope}
+
+
+class RedisEventLog:
+    """EventLog kept in a capped Redis list, numbered by a counter bumped in the same transaction.
+
+    Every append also PUBLISHes the new number, so readers block in wait() instead of polling.
+    """
+
+    def __init__(self, state, name, capacity=LIVE_EVENTS_CAPACITY):
+        self.state = state
+        self.capacity = max(1, capacity)
+        self.list_key = state.key(f"events:{name}")
+        self.seq_key = state.key(f"events:{name}:seq")
+        self.channel = state.key(f"events:{name}:appended")
+        self._pubsub = None
+
+    def __len__(self):
+        return self.state.client.llen(self.list_key)
+
+    @property
+    def seq(self):
+        return int(self.state.client.get(self.seq_key) or 0)
+
+    def append(self, event):
+        with self.state.client.pipeline() as pipe:
+            pipe.rpush(self.list_key, json.dumps(event, default=str))
+            pipe.incr(self.seq_key)
+            pipe.ltrim(self.list_key, -self.capacity, -1)
+            _, seq, _ = pipe.execute()
+        self.state.client.publish(self.channel, seq)
+        return seq
+
+    def wait(self, after, timeout=1.0):
+        """Block until an event numbered above after may exist, or timeout; one reader thread per log.
+
+        The subscription is made before the counter is checked, so an append in between is not missed.
+        """
+        if self._pubsub is None:
+            pubsub = self.state.client.pubsub(ignore_subscribe_messages=True)
+            pubsub.subscribe(self.channel)
+            self._pubsub = pubsub
+        try:
+            if self.seq > after:
+                return True
+            return self._pubsub.get_message(timeout=timeout) is not None
+        except Exception:
+            # Resubscribe on the next call, the connection may have dropped
+            self.close()
+            raise
+
+    def close(self):
+        if self._pubsub is not None:
+            try:
+                self._pubsub.close()
+            finally:
+                self._pubsub = None
+
+    def read(self, after=0, limit=100):
+        # Polling readers are usually caught up, which costs a single GET
+        if 0 <= after == self.seq:
+            return [], after, 0
+        with self.state.client.pipeline() as pipe:
+            pipe.get(self.seq_key)
+            pipe.lrange(self.list_key, 0, -1)
+            latest, items = pipe.execute()
+        latest = int(latest or 0)
+        first = latest - len(items) + 1
+        events = [(first + i, json.loads(item)) for i, item in enumerate(items)]
+        return page_events(events, latest, after, limit)
+
+    def stats(self):
+        return {"size": len(self), "capacity": self.capacity, "seq": self.seq, "shared": True}
+
+
+class SharedPlateStateStore:
+    """PlateStateStore kept in one Redis hash, so every worker decides entry/exit from the same state.
+
+    Updates are compare-and-set on the timestamp. The persistent backend (Firestore/SQLite) is
+    written on persist() by the worker that made the change, with the then current shared state.
+    """
+
+    def __init__(self, state, backend=None, name="plate_state"):
+        self.state = state
+        self.backend = backend
+        self.name = name
+        self.key = state.key(name)
+        self._pending = PendingSaves(backend, self._read) if backend is not None else None
+
+    def __len__(self):
+        return self.state.client.hlen(self.key)
+
+    def get(self, plate):
+        raw = self.state.client.hget(self.key, plate)
+        return json.loads(raw) if raw else None
+
+    def update(self, plate, status, timestamp, visitor_status=None):
+        state = {"status": status, "timestamp": timestamp, "visitorStatus": visitor_status}
+
+        def newer(pipe):
+            raw = pipe.hget(self.key, plate)
+            if not is_newer(timestamp, json.loads(raw) if raw else None):
+                return None, False
+            return (lambda p: p.hset(self.key, plate, json.dumps(state))), True
+
+        if not self.state.transaction(self.name, newer):
+            return False
+        if self._pending is not None:
+            self._pending.add(plate)
+        return True
+
+    def _read(self, plates):
+        plates = list(plates)
+        values = self.state.client.hmget(self.key, plates)
+        return {plate: json.loads(raw) for plate, raw in zip(plates, values) if raw}
+
+    def persist(self):
+        return self._pending.flush() if self._pending is not None else 0
+
+    def _merge(self, states, overwrite):
+        # Chunked so a large table does not become one huge command
+        items = list(states.items())
+        for start in range(0, len(items), 500):
+            with self.state.client.pipeline(transaction=False) as pipe:
+                for plate, state in items[start:start + 500]:
+                    (pipe.hset if overwrite else pipe.hsetnx)(self.key, plate, json.dumps(state))
+                pipe.execute()
+
+    def load(self):
+        # Fill plates no other worker has loaded yet; returns the size of the shared table
+        if self.backend is not None:
+            self._merge(self.backend.load_all(), overwrite=False)
+        return len(self)
+
+    def rebuild_from_logs(self, logs):
+        states = latest_states_from_logs(logs)
+        self._merge(states, overwrite=True)
+        if self.backend is not None and states:
+            self.backend.save_many(states)
+        return len(states)
+
+
+def create_shared_state(kind=SHARED_STATE, url=SHARED_STATE_URL, prefix=SHARED_STATE_PREFIX):
+    kind = (kind or "memory").lower()
+    if kind == "redis":
+        return RedisSharedState(url=url, prefix=prefix)
+    return MemorySharedState()
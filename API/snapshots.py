@@ -0,0 +1,237 @@
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+
+from metrics import SNAPSHOT_BYTES, SNAPSHOT_DEDUPED, SNAPSHOT_ENCODE_SECONDS
+
+logger = logging.getLogger(__name__)
+
+# "jpeg" or "webp"
+SNAPSHOT_FORMAT = os.getenv("SNAPSHOT_FORMAT", "jpeg")
+SNAPSHOT_QUALITY = int(os.getenv("SNAPSHOT_QUALITY", "80"))
+# Full frames are downscaled to this width (0 keeps the camera resolution)
+SNAPSHOT_MAX_WIDTH = int(os.getenv("SNAPSHOT_MAX_WIDTH", "1280"))
+SNAPSHOT_THUMB_WIDTH = int(os.getenv("SNAPSHOT_THUMB_WIDTH", "240"))
+# Margin kept around the plate box, as a fraction of its size
+SNAPSHOT_CROP_PADDING = float(os.getenv("SNAPSHOT_CROP_PADDING", "0.2"))
+# Frames whose 64-bit difference hashes differ in at most this many bits count as the same picture (-1 = no dedup)
+SNAPSHOT_DEDUP_DISTANCE = int(os.getenv("SNAPSHOT_DEDUP_DISTANCE", "6"))
+# Only pictures stored this recently are reused: a similar frame much later is a new visit
+SNAPSHOT_DEDUP_SECONDS = float(os.getenv("SNAPSHOT_DEDUP_SECONDS", "600"))
+
+FORMATS = {
+    "jpeg": (".jpg", "image/jpeg", cv2.IMWRITE_JPEG_QUALITY),
+    "webp": (".webp", "image/webp", cv2.IMWRITE_WEBP_QUALITY),
+}
+CONTENT_TYPES = {extension: content_type for extension, content_type, _ in FORMATS.values()}
+# Log fields holding the URL of each stored image
+URL_FIELDS = {"frame": "snapshot_url", "crop": "crop_url", "thumb": "thumbnail_url"}
+NAME_SUFFIXES = {"frame": "", "crop": "_crop", "thumb": "_thumb"}
+
+
+def content_type_for(name):
+    return CONTENT_TYPES.get(os.path.splitext(name)[1].lower(), "application/octet-stream")
+
+
+def resize_to_width(image, width):
+    h, w = image.shape[:2]
+    if not width or w <= width:
+        return image
+    return cv2.resize(image, (width, max(1, int(h * width / float(w)))), interpolation=cv2.INTER_AREA)
+
+
+def difference_hash(image, size=8):
+    """64-bit perceptual hash: which neighbouring pixels get brighter in a size x size grayscale thumbnail.
+
+    Recompression, sensor noise and small lighting changes flip only a few bits, so a parked
+    car seen again lands within a small Hamming distance of its earlier snapshot.
+    """
+    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) if image.ndim == 3 else image
+    small = cv2.resize(gray, (size + 1, size), interpolation=cv2.INTER_AREA)
+    bits = (small[:, 1:] > small[:, :-1]).flatten()
+    return int.from_bytes(np.packbits(bits).tobytes(), "big")
+
+
+def hamming_distance(a, b):
+    return bin(a ^ b).count("1")
+
+
+def crop_box(frame, box, padding=SNAPSHOT_CROP_PADDING):
+    # Plate box widened by padding on every side and clamped to the frame
+    h, w = frame.shape[:2]
+    x1, y1, x2, y2 = box
+    pad_x, pad_y = int((x2 - x1) * padding), int((y2 - y1) * padding)
+    x1, y1 = max(0, int(x1) - pad_x), max(0, int(y1) - pad_y)
+    x2, y2 = min(w, int(x2) + pad_x), min(h, int(y2) + pad_y)
+    if x2 <= x1 or y2 <= y1:
+        return None
+    return frame[y1:y2, x1:x2]
+
+
+class Snapshot:
+    """The encoded images of one log event: downscaled frame, plate crop (optional) and thumbnail."""
+
+    __slots__ = ("phash", "images", "extension")
+
+    def __init__(self, phash, images, extension):
+        self.phash = phash
+        self.images = images
+        self.extension = extension
+
+    @property
+    def content_type(self):
+        return CONTENT_TYPES[self.extension]
+
+    @property
+    def size(self):
+        return sum(len(data) for data in self.images.values())
+
+    def names(self, prefix):
+        # Content-addressed: the same picture of the same plate always gets the same names
+        return {image: f"{prefix}_{self.phash:016x}{NAME_SUFFIXES[image]}{self.extension}" for image in self.images}
+
+
+class SnapshotEncoder:
+    """Encodes snapshots in memory with the configured format, quality and sizes."""
+
+    def __init__(self, fmt=SNAPSHOT_FORMAT, quality=SNAPSHOT_QUALITY, max_width=SNAPSHOT_MAX_WIDTH,
+                 thumb_width=SNAPSHOT_THUMB_WIDTH, crop_padding=SNAPSHOT_CROP_PADDING):
+        fmt = (fmt or "jpeg").lower()
+        if fmt not in FORMATS:
+            raise ValueError(f"Unknown snapshot format: {fmt}")
+        self.extension, _, quality_flag = FORMATS[fmt]
+        self.params = [quality_flag, int(quality)]
+        self.max_width = max_width
+        self.thumb_width = thumb_width
+        self.crop_padding = crop_padding
+
+    def encode_image(self, image):
+        ok, buffer = cv2.imencode(self.extension, image, self.params)
+        return buffer.tobytes() if ok else None
+
+    def encode(self, frame, box=None, base=None):
+        """Encode frame (and the plate crop for box); pass the Snapshot of an earlier plate
+        in the same frame as base to reuse its frame and thumbnail."""
+        start = time.perf_counter()
+        if base is not None:
+            phash, images = base.phash, {"frame": base.images["frame"], "thumb": base.images.get("thumb")}
+        else:
+            resized = resize_to_width(frame, self.max_width)
+            phash = difference_hash(resized)
+            images = {
+                "frame": self.encode_image(resized),
+                "thumb": self.encode_image(resize_to_width(resized, self.thumb_width)),
+            }
+        crop = crop_box(frame, box, self.crop_padding) if box is not None else None
+        if crop is not None:
+            images["crop"] = self.encode_image(crop)
+        SNAPSHOT_ENCODE_SECONDS.observe(time.perf_counter() - start)
+        if images["frame"] is None:
+            return None
+        return Snapshot(phash, {image: data for image, data in images.items() if data is not None}, self.extension)
+
+
+class SnapshotStore:
+    """Uploads snapshots to a blob store and skips pictures already stored for the same plate.
+
+    The last max_per_plate hashes of up to max_plates plates are kept for max_age seconds; a
+    snapshot within max_distance bits of one of them reuses the stored URLs instead of being
+    uploaded again. resolve() makes that decision before the log is published, so the URLs a
+    log is published with are final; upload() then stores the images under those names.
+    """
+
+    def __init__(self, blobs, max_distance=SNAPSHOT_DEDUP_DISTANCE, max_per_plate=8, max_plates=4096,
+                 max_age=SNAPSHOT_DEDUP_SECONDS):
+        self.blobs = blobs
+        self.max_distance = max_distance
+        self.max_per_plate = max_per_plate
+        self.max_plates = max_plates
+        self.max_age = max_age
+        self._stored = OrderedDict()
+        self._lock = threading.Lock()
+        self.uploaded = 0
+        self.deduplicated = 0
+        self.bytes_uploaded = 0
+
+    def urls(self, prefix, snapshot):
+        return {URL_FIELDS[image]: self.blobs.public_url(name) for image, name in snapshot.names(prefix).items()}
+
+    def find(self, prefix, phash, now=None):
+        if self.max_distance < 0:
+            return None
+        cutoff = (now if now is not None else time.monotonic()) - self.max_age
+        with self._lock:
+            for stored_hash, urls, stored_at in self._stored.get(prefix, ()):
+                if stored_at >= cutoff and hamming_distance(phash, stored_hash) <= self.max_distance:
+                    self._stored.move_to_end(prefix)
+                    return urls
+        return None
+
+    def remember(self, prefix, phash, urls, now=None):
+        with self._lock:
+            entries = self._stored.setdefault(prefix, [])
+            entries.append((phash, urls, now if now is not None else time.monotonic()))
+            del entries[:-self.max_per_plate]
+            self._stored.move_to_end(prefix)
+            while len(self._stored) > self.max_plates:
+                self._stored.popitem(last=False)
+
+    def forget(self, prefix, phash):
+        with self._lock:
+            entries = self._stored.get(prefix)
+            if entries is not None:
+                entries[:] = [entry for entry in entries if entry[0] != phash]
+
+    def resolve(self, prefix, snapshot):
+        """Decide where the snapshot of a plate is stored and return (log fields, needs_upload).
+
+        A matching recent picture gives its URLs and nothing to upload; otherwise the URLs are
+        those upload() will put this snapshot under, remembered right away so another reading
+        of the same picture before the upload finishes reuses them too.
+        """
+        urls = self.find(prefix, snapshot.phash)
+        if urls is not None:
+            self.deduplicated += 1
+            SNAPSHOT_DEDUPED.inc()
+            logger.debug("Snapshot of %s matches a stored one, not uploading", prefix)
+            return dict(urls), False
+        urls = self.urls(prefix, snapshot)
+        self.remember(prefix, snapshot.phash, urls)
+        return dict(urls), True
+
+    def upload(self, prefix, snapshot):
+        """Upload the images of a resolved snapshot and return the log fields pointing at them."""
+        urls = {}
+        content_type = snapshot.content_type
+        try:
+            for image, name in snapshot.names(prefix).items():
+                data = snapshot.images[image]
+                urls[URL_FIELDS[image]] = self.blobs.put(name, data, content_type)
+                self.bytes_uploaded += len(data)
+                SNAPSHOT_BYTES.inc(len(data), image=image)
+        except Exception:
+            # Later readings must not reuse URLs that were never stored
+            self.forget(prefix, snapshot.phash)
+            raise
+        self.uploaded += 1
+        return urls
+
+    def save(self, prefix, snapshot):
+        """Store the snapshot of a plate and return the log fields pointing at it."""
+        urls, needs_upload = self.resolve(prefix, snapshot)
+        return self.upload(prefix, snapshot) if needs_upload else urls
+
+    def stats(self):
+        with self._lock:
+            plates = len(self._stored)
+        return {
+            "uploaded": self.uploaded,
+            "deduplicated": self.deduplicated,
+            "bytes_uploaded": self.bytes_uploaded,
+            "plates_tracked": plates,
+        }
@@ -0,0 +1,390 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+
+from lazy import resolve_client
+from log_query import encode_cursor
+
+logger = logging.getLogger(__name__)
+
+# "firestore" (Firestore + Supabase storage) or "local" (SQLite + filesystem snapshots)
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "firestore")
+STORAGE_SQLITE_PATH = os.getenv("STORAGE_SQLITE_PATH", "plates.db")
+STORAGE_BLOB_DIR = os.getenv("STORAGE_BLOB_DIR", "snapshots")
+
+# Firestore batches are limited to 500 writes
+FIRESTORE_BATCH_LIMIT = 500
+
+
+class FirestoreWatch:
+    def __init__(self, watch):
+        self._watch = watch
+
+    def unsubscribe(self):
+        self._watch.unsubscribe()
+
+
+class FirestoreVisitorRepository:
+    """Visitor documents in the Firestore visitors collection.
+
+    `db` is the Firestore client or a zero-argument function returning it.
+    """
+
+    def __init__(self, db, collection="visitors"):
+        self._db = db
+        self.collection = collection
+
+    @property
+    def db(self):
+        return resolve_client(self._db)
+
+    def find_by_plate(self, plate):
+        # (doc_id, visitor) of the first visitor registered with this plate, or None
+        docs = list(self.db.collection(self.collection).where("plate", "==", plate).limit(1).stream())
+        if not docs:
+            return None
+        return docs[0].id, docs[0].to_dict()
+
+    def iter_all(self):
+        for doc in self.db.collection(self.collection).stream():
+            yield doc.id, doc.to_dict()
+
+    def watch(self, callback):
+        """Call callback([(doc_id, visitor, removed), ...]) on every change; the first call lists every visitor."""
+        def on_snapshot(col_snapshot, changes, read_time):
+            callback([
+                (change.document.id, change.document.to_dict() or {}, change.type.name == "REMOVED")
+                for change in changes
+            ])
+
+        return FirestoreWatch(self.db.collection(self.collection).on_snapshot(on_snapshot))
+
+
+class FirestoreLogRepository:
+    """Entry/exit log documents in the Firestore logs collection."""
+
+    def __init__(self, db, collection="logs"):
+        self._db = db
+        self.collection = collection
+
+    @property
+    def db(self):
+        return resolve_client(self._db)
+
+    def add_many(self, entries):
+        db = self.db
+        batch = db.batch()
+        for count, entry in enumerate(entries, 1):
+            batch.set(db.collection(self.collection).document(), entry)
+            if count % FIRESTORE_BATCH_LIMIT == 0:
+                batch.commit()
+                batch = db.batch()
+        batch.commit()
+
+    def iter_all(self, visitor_statuses=None):
+        query = self.db.collection(self.collection)
+        if visitor_statuses:
+            query = query.where("visitorStatus", "in", list(visitor_statuses))
+        for doc in query.stream():
+            yield doc.to_dict()
+
+    def query(self, q):
+        """One newest-first page of logs matching q and the cursor of the next page (or None).
+
+        Needs the composite indexes in firestore.indexes.json.
+        """
+        collection = self.db.collection(self.collection)
+        query = collection
+        if q.visitor_statuses:
+            query = query.where("visitorStatus", "in", list(q.visitor_statuses))
+        if q.statuses:
+            query = query.where("status", "in", list(q.statuses))
+        if q.plate:
+            query = query.where("plate", "==", q.plate)
+        if q.camera:
+            query = query.where("camera", "==", q.camera)
+        if q.since:
+            query = query.where("timestamp", ">=", q.since)
+        if q.until:
+            query = query.where("timestamp", "<", q.until)
+        query = query.order_by("timestamp", direction="DESCENDING").order_by("__name__", direction="DESCENDING")
+        if q.cursor:
+            last = collection.document(q.cursor[1]).get()
+            if last.exists:
+                query = query.start_after(last)
+        docs = list(query.limit(q.limit + 1).stream())
+        next_cursor = None
+        if len(docs) > q.limit:
+            docs = docs[:q.limit]
+            next_cursor = encode_cursor(docs[-1].get("timestamp"), docs[-1].id)
+        return [doc.to_dict() for doc in docs], next_cursor
+
+
+class SupabaseBlobStore:
+    """Snapshot images in a public Supabase storage bucket."""
+
+    def __init__(self, client, bucket, base_url, prefix="snapshots"):
+        self._client = client
+        self.bucket = bucket
+        self.base_url = base_url
+        self.prefix = prefix
+
+    @property
+    def client(self):
+        return resolve_client(self._client)
+
+    def public_url(self, name):
+        return f"{self.base_url}/storage/v1/object/public/{self.bucket}/{self.prefix}/{name}"
+
+    def put(self, name, data, content_type="image/jpeg"):
+        self.client.storage.from_(self.bucket).upload(
+            f"{self.prefix}/{name}", data,
+            file_options={"content-type": content_type, "x-upsert": "true"}
+        )
+        return self.public_url(name)
+
+
+class SqliteDatabase:
+    """One SQLite file in WAL mode shared by the local repositories."""
+
+    def __init__(self, path=STORAGE_SQLITE_PATH):
+        self.path = path
+        self.lock = threading.Lock()
+        self._conn = None
+        self._pid = None
+        self._connect_lock = threading.Lock()
+
+    @property
+    def conn(self):
+        # Opened on first use in each process: with gunicorn preload_app the module is imported
+        # in the master, and a SQLite connection must not be shared across fork
+        if self._pid != os.getpid():
+            with self._connect_lock:
+                if self._pid != os.getpid():
+                    self._conn = self._connect()
+                    self._pid = os.getpid()
+        return self._conn
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        with conn:
+            conn.executescript(
+                "CREATE TABLE IF NOT EXISTS visitors ("
+                " id TEXT PRIMARY KEY, plate TEXT, data TEXT NOT NULL);"
+                "CREATE INDEX IF NOT EXISTS idx_visitors_plate ON visitors (plate);"
+                "CREATE TABLE IF NOT EXISTS logs ("
+                " id INTEGER PRIMARY KEY AUTOINCREMENT, plate TEXT, status TEXT, timestamp TEXT,"
+                " visitorStatus TEXT, camera TEXT, data TEXT NOT NULL);"
+                "CREATE INDEX IF NOT EXISTS idx_logs_plate_timestamp ON logs (plate, timestamp);"
+                "CREATE INDEX IF NOT EXISTS idx_logs_visitor_status ON logs (visitorStatus);"
+                "CREATE INDEX IF NOT EXISTS idx_logs_timestamp ON logs (timestamp);"
+                "CREATE INDEX IF NOT EXISTS idx_logs_camera_timestamp ON logs (camera, timestamp);"
+            )
+        return conn
+
+    def execute(self, sql, params=()):
+        with self.lock:
+            return self.conn.execute(sql, params).fetchall()
+
+    def write(self, sql, rows):
+        with self.lock, self.conn:
+            self.conn.executemany(sql, rows)
+
+    def close(self):
+        with self.lock:
+            if self._conn is not None and self._pid == os.getpid():
+                self._conn.close()
+                self._conn, self._pid = None, None
+
+
+class LocalWatch:
+    def __init__(self, callbacks, callback):
+        self._callbacks = callbacks
+        self._callback = callback
+
+    def unsubscribe(self):
+        if self._callback in self._callbacks:
+            self._callbacks.remove(self._callback)
+
+
+class SqliteVisitorRepository:
+    """Visitors in the local database; writes through upsert/delete notify watchers in-process."""
+
+    def __init__(self, database):
+        self.database = database
+        self._callbacks = []
+
+    def find_by_plate(self, plate):
+        rows = self.database.execute("SELECT id, data FROM visitors WHERE plate = ? LIMIT 1", (plate,))
+        if not rows:
+            return None
+        return rows[0][0], json.loads(rows[0][1])
+
+    def iter_all(self):
+        for doc_id, data in self.database.execute("SELECT id, data FROM visitors"):
+            yield doc_id, json.loads(data)
+
+    def upsert(self, doc_id, visitor):
+        old = self.database.execute("SELECT data FROM visitors WHERE id = ?", (doc_id,))
+        self.database.write(
+            "INSERT INTO visitors (id, plate, data) VALUES (?, ?, ?)"
+            " ON CONFLICT(id) DO UPDATE SET plate=excluded.plate, data=excluded.data",
+            [(doc_id, visitor.get("plate"), json.dumps(visitor, default=str))],
+        )
+        changes = [(doc_id, json.loads(old[0][0]), True)] if old else []
+        self._notify(changes + [(doc_id, visitor, False)])
+
+    def delete(self, doc_id):
+        old = self.database.execute("SELECT data FROM visitors WHERE id = ?", (doc_id,))
+        if not old:
+            return False
+        self.database.write("DELETE FROM visitors WHERE id = ?", [(doc_id,)])
+        self._notify([(doc_id, json.loads(old[0][0]), True)])
+        return True
+
+    def _notify(self, changes):
+        for callback in list(self._callbacks):
+            try:
+                callback(changes)
+            except Exception as e:
+                logger.error("Visitor watch callback error: %s", e)
+
+    def watch(self, callback):
+        # Same contract as Firestore: the first call lists every existing visitor
+        self._callbacks.append(callback)
+        callback([(doc_id, visitor, False) for doc_id, visitor in self.iter_all()])
+        return LocalWatch(self._callbacks, callback)
+
+
+class SqliteLogRepository:
+    """Logs in the local database, indexed on (plate, timestamp) and visitorStatus."""
+
+    def __init__(self, database):
+        self.database = database
+
+    def add_many(self, entries):
+        self.database.write(
+            "INSERT INTO logs (plate, status, timestamp, visitorStatus, camera, data) VALUES (?, ?, ?, ?, ?, ?)",
+            [
+                (e.get("plate"), e.get("status"), e.get("timestamp"), e.get("visitorStatus"), e.get("camera"),
+                 json.dumps(e, default=str))
+                for e in entries
+            ],
+        )
+
+    def iter_all(self, visitor_statuses=None):
+        if visitor_statuses:
+            placeholders = ",".join("?" for _ in visitor_statuses)
+            rows = self.database.execute(
+                f"SELECT data FROM logs WHERE visitorStatus IN ({placeholders}) ORDER BY id", tuple(visitor_statuses)
+            )
+        else:
+            rows = self.database.execute("SELECT data FROM logs ORDER BY id")
+        for (data,) in rows:
+            yield json.loads(data)
+
+    def query(self, q):
+        """One newest-first page of logs matching q and the cursor of the next page (or None).
+
+        Pages walk (timestamp, id) downwards from the cursor, so every page costs the same no
+        matter how deep it is. The low-cardinality status columns are written as +column so the
+        planner walks the plate, camera or timestamp index in order instead of sorting.
+        """
+        where, params = [], []
+        if q.visitor_statuses:
+            where.append(f"+visitorStatus IN ({','.join('?' for _ in q.visitor_statuses)})")
+            params.extend(q.visitor_statuses)
+        if q.statuses:
+            where.append(f"+status IN ({','.join('?' for _ in q.statuses)})")
+            params.extend(q.statuses)
+        if q.plate:
+            where.append("plate = ?")
+            params.append(q.plate)
+        if q.camera:
+            where.append("camera = ?")
+            params.append(q.camera)
+        if q.since:
+            where.append("timestamp >= ?")
+            params.append(q.since)
+        if q.until:
+            where.append("timestamp < ?")
+            params.append(q.until)
+        if q.cursor:
+            where.append("(timestamp < ? OR (timestamp = ? AND id < ?))")
+            params.extend([q.cursor[0], q.cursor[0], q.cursor[1]])
+        sql = "SELECT id, timestamp, data FROM logs"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY timestamp DESC, id DESC LIMIT ?"
+        params.append(q.limit + 1)
+
+        rows = self.database.execute(sql, tuple(params))
+        next_cursor = None
+        if len(rows) > q.limit:
+            rows = rows[:q.limit]
+            next_cursor = encode_cursor(rows[-1][1], rows[-1][0])
+        return [json.loads(data) for _, _, data in rows], next_cursor
+
+
+class LocalBlobStore:
+    """Snapshot images as files under root, served back by the API under base_url."""
+
+    def __init__(self, root=STORAGE_BLOB_DIR, base_url="http://localhost:8000/snapshots"):
+        self.root = root
+        self.base_url = base_url.rstrip("/")
+        os.makedirs(root, exist_ok=True)
+
+    def path(self, name):
+        # Names never leave the blob directory
+        return os.path.join(self.root, os.path.basename(name))
+
+    def public_url(self, name):
+        return f"{self.base_url}/{os.path.basename(name)}"
+
+    def put(self, name, data, content_type="image/jpeg"):
+        path = self.path(name)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+        return self.public_url(name)
+
+
+class Storage:
+    """The repositories the API reads and writes: visitors, logs and snapshot blobs."""
+
+    def __init__(self, kind, visitors, logs, blobs, database=None):
+        self.kind = kind
+        self.visitors = visitors
+        self.logs = logs
+        self.blobs = blobs
+        self.database = database
+
+    def close(self):
+        if self.database is not None:
+            self.database.close()
+
+
+def create_storage(kind=STORAGE_BACKEND, db=None, supabase=None, bucket=None, supabase_url=None,
+                   sqlite_path=STORAGE_SQLITE_PATH, blob_dir=STORAGE_BLOB_DIR,
+                   blob_base_url="http://localhost:8000/snapshots"):
+    kind = (kind or "firestore").lower()
+    if kind == "local":
+        database = SqliteDatabase(sqlite_path)
+        return Storage(
+            kind,
+            SqliteVisitorRepository(database),
+            SqliteLogRepository(database),
+            LocalBlobStore(blob_dir, blob_base_url),
+            database,
+        )
+    return Storage(
+        "firestore",
+        FirestoreVisitorRepository(db),
+        FirestoreLogRepository(db),
+        SupabaseBlobStore(supabase, bucket, supabase_url),
+    )
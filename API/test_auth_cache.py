@@ -0,0 +1,161 @@
+import threading
+from datetime import datetime
+
+import pytest
+
+import auth_cache
+from auth_cache import AuthorizationCache
+
+
+class FakeVisitors:
+    """The visitors repository: find_by_plate plus a change feed."""
+
+    def __init__(self, docs=None):
+        self.docs = dict(docs or {})
+        self.lookups = 0
+        self.callbacks = []
+        self.before_lookup = None
+
+    def find_by_plate(self, plate):
+        self.lookups += 1
+        if self.before_lookup is not None:
+            self.before_lookup(plate)
+        for doc_id, visitor in self.docs.items():
+            if visitor.get("plate") == plate:
+                return doc_id, dict(visitor)
+        return None
+
+    def watch(self, callback):
+        self.callbacks.append(callback)
+        return self
+
+    def unsubscribe(self):
+        self.callbacks.clear()
+
+    def change(self, doc_id, visitor):
+        if visitor is None:
+            self.docs.pop(doc_id, None)
+        else:
+            self.docs[doc_id] = visitor
+        for callback in list(self.callbacks):
+            callback([(doc_id, visitor, visitor is None)])
+
+
+class FakeMonotonic:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeMonotonic()
+    monkeypatch.setattr(auth_cache.time, "monotonic", clock)
+    return clock
+
+
+@pytest.fixture
+def visitors():
+    return FakeVisitors({"doc1": {"plate": "KA01AB1234", "visitorType": "authorized"}})
+
+
+def test_hit_within_ttl_and_refetch_after(visitors, clock):
+    cache = AuthorizationCache(visitors, ttl=60)
+    assert cache.get_status("KA01AB1234") == "authorized"
+    assert cache.get_status("KA01AB1234") == "authorized"
+    assert visitors.lookups == 1
+    clock.now += 61
+    cache.get("KA01AB1234")
+    assert visitors.lookups == 2
+    assert cache.stats()["expirations"] == 1
+
+
+def test_missing_plate_is_cached_as_unauthorized(visitors, clock):
+    cache = AuthorizationCache(visitors)
+    assert cache.get_status("XX00XX0000") == "unauthorized"
+    assert cache.get_status("XX00XX0000") == "unauthorized"
+    assert visitors.lookups == 1
+
+
+def test_lru_eviction_forgets_document_index(clock):
+    visitors = FakeVisitors({f"doc{i}": {"plate": f"P{i}", "visitorType": "authorized"} for i in range(3)})
+    cache = AuthorizationCache(visitors, max_size=2)
+    for plate in ("P0", "P1", "P2"):
+        cache.get(plate)
+    assert cache.stats()["evictions"] == 1
+    assert "doc0" not in cache._plate_by_doc
+    assert set(cache._plate_by_doc) == {"doc1", "doc2"}
+
+
+def test_change_feed_invalidates_old_and_new_plate(visitors, clock):
+    cache = AuthorizationCache(visitors)
+    cache.start_listener()
+    cache.get("KA01AB1234")
+    # The document now holds another plate: the old one must not stay authorized
+    visitors.change("doc1", {"plate": "KA01AB9999", "visitorType": "authorized"})
+    assert cache.get_status("KA01AB1234") == "unauthorized"
+    assert cache.get_status("KA01AB9999") == "authorized"
+    cache.stop_listener()
+    assert visitors.callbacks == []
+
+
+def test_removed_document_is_unauthorized(visitors, clock):
+    cache = AuthorizationCache(visitors)
+    cache.start_listener()
+    cache.get("KA01AB1234")
+    visitors.change("doc1", None)
+    assert cache.get_status("KA01AB1234") == "unauthorized"
+
+
+def test_invalidation_during_lookup_is_not_lost(visitors, clock):
+    cache = AuthorizationCache(visitors)
+    cache.start_listener()
+
+    def revoke_once(plate):
+        # The change lands while the old document is being read
+        visitors.before_lookup = None
+        old = dict(visitors.docs["doc1"])
+        visitors.change("doc1", dict(old, visitorType="visitor", isApproved=False))
+        visitors.docs["doc1"] = old
+
+    visitors.before_lookup = revoke_once
+    assert cache.get_status("KA01AB1234") == "authorized"
+    visitors.docs["doc1"]["visitorType"] = "visitor"
+    visitors.docs["doc1"]["isApproved"] = False
+    assert cache.get_status("KA01AB1234") == "unauthorized"
+    assert visitors.lookups == 2
+
+
+def test_concurrent_lookups_of_many_plates(clock):
+    visitors = FakeVisitors({f"doc{i}": {"plate": f"P{i}", "visitorType": "authorized"} for i in range(50)})
+    cache = AuthorizationCache(visitors, max_size=20)
+    errors = []
+
+    def lookup(offset):
+        try:
+            for i in range(200):
+                assert cache.get_status(f"P{(i + offset) % 50}") == "authorized"
+        except AssertionError as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=lookup, args=(n,)) for n in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert not errors
+    assert len(cache._entries) <= 20
+    assert len(cache._plate_by_doc) == len(cache._entries)
+
+
+def test_visitor_window(clock):
+    visitors = FakeVisitors({"doc1": {
+        "plate": "KA01AB1234", "visitorType": "visitor",
+        "authorizationTill": {"from": "2024-01-01T08:00:00", "to": "2024-01-01T18:00:00"},
+    }})
+    cache = AuthorizationCache(visitors)
+    assert cache.get_status("KA01AB1234", datetime(2024, 1, 1, 12)) == "visitor"
+    assert cache.get_status("KA01AB1234", datetime(2024, 1, 1, 19)) == "unauthorized"
+    assert cache.get_status("KA01AB1234", datetime(2024, 1, 1, 7)) == "unauthorized"
@@ -0,0 +1,87 @@
+import pytest
+
+import detection
+from detection import SEEK_MIN_GAP, iter_sampled_frames
+from sampling import FixedSampler
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class FakeCapture:
+    """A file of total frames: a grab costs one frame of decoding, a seek decodes forward from the
+    preceding keyframe (every gop frames)."""
+
+    def __init__(self, clock, total=1000, gop=250, decode_seconds=0.001):
+        self.clock = clock
+        self.total = total
+        self.gop = gop
+        self.decode_seconds = decode_seconds
+        self.position = 0
+        self.grabs = 0
+        self.seeks = 0
+
+    def grab(self):
+        if self.position >= self.total:
+            return False
+        self.clock.now += self.decode_seconds
+        self.position += 1
+        self.grabs += 1
+        return True
+
+    def retrieve(self):
+        return True, self.position
+
+    def set(self, prop, value):
+        self.clock.now += (value % self.gop + 1) * self.decode_seconds
+        self.position = int(value)
+        self.seeks += 1
+        return True
+
+    def get(self, prop):
+        return self.position * 40.0
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(detection.time, "perf_counter", clock)
+    return clock
+
+
+def sampled(cap, stride=25, seek_gap=SEEK_MIN_GAP):
+    return [frame_number for frame_number, _, _ in iter_sampled_frames(cap, stride, FixedSampler(stride), seek_gap=seek_gap)]
+
+
+def test_default_gap_considers_the_default_stride():
+    assert 0 < SEEK_MIN_GAP <= 24
+
+
+def test_short_gop_seeks(clock):
+    cap = FakeCapture(clock, gop=1)
+    assert sampled(cap) == list(range(25, 1001, 25))
+    assert cap.seeks > 30
+
+
+def test_long_gop_grabs_after_one_probe(clock):
+    cap = FakeCapture(clock, gop=250)
+    assert sampled(cap) == list(range(25, 1001, 25))
+    assert cap.seeks <= 1
+
+
+def test_seeking_disabled(clock):
+    cap = FakeCapture(clock, gop=1)
+    assert sampled(cap, seek_gap=0) == list(range(25, 1001, 25))
+    assert cap.seeks == 0
+    assert cap.grabs == 1000
+
+
+def test_gap_below_minimum_never_seeks(clock):
+    cap = FakeCapture(clock, gop=1)
+    assert sampled(cap, stride=5, seek_gap=8) == list(range(5, 1001, 5))
+    assert cap.seeks == 0
@@ -0,0 +1,73 @@
+import random
+import string
+import tracemalloc
+from datetime import datetime, timedelta
+
+import pytest
+
+from live_state import EventLog, SeenVehicles
+
+STEP = timedelta(seconds=3)
+
+
+def random_plate(rng):
+    return "".join(rng.choice(string.ascii_uppercase + string.digits) for _ in range(rng.randint(4, 10)))
+
+
+def replay(seen, events, readings_per_sample, samples, garbage=0.3, visitors=200, seed=1):
+    """A shortened live feed: regular visitors plus random OCR garbage on a simulated clock, going
+    through the claim -> record -> append path of handle_plate. Returns (traced bytes, plates, events)
+    after each sample."""
+    rng = random.Random(seed)
+    regulars = [random_plate(rng) for _ in range(visitors)]
+    clock = datetime(2024, 1, 1)
+    sizes = []
+    tracemalloc.start()
+    try:
+        for _ in range(samples):
+            for _ in range(readings_per_sample):
+                clock += STEP
+                plate = random_plate(rng) if rng.random() < garbage else rng.choice(regulars)
+                if not seen.claim(plate, clock):
+                    continue
+                seen.record(plate, clock, "entry")
+                events.append({"plate": plate, "status": "entry", "timestamp": clock.isoformat(),
+                               "snapshot_url": f"http://localhost:8000/snapshots/{plate}.jpg"})
+            current, _ = tracemalloc.get_traced_memory()
+            sizes.append((current, len(seen), len(events)))
+    finally:
+        tracemalloc.stop()
+    return sizes
+
+
+def test_long_feed_stays_bounded():
+    seen, events = SeenVehicles(ttl=120), EventLog(capacity=500)
+    # 6 samples of 2 simulated hours each
+    sizes = replay(seen, events, readings_per_sample=2400, samples=6)
+    # Only plates logged within the ttl are kept, one reading every STEP seconds
+    window = int(seen.ttl / STEP.total_seconds()) + 1
+    assert all(plates <= window for _, plates, _ in sizes)
+    assert all(count <= 500 for _, _, count in sizes)
+    assert events.seq > 500
+    first, last = sizes[0][0], sizes[-1][0]
+    assert last - first <= 0.2 * first
+
+
+def test_burst_of_distinct_plates_is_capped():
+    seen = SeenVehicles(ttl=3600, max_size=50)
+    clock = datetime(2024, 1, 1)
+    for i in range(1000):
+        assert seen.claim(f"GARBAGE{i}", clock + timedelta(seconds=i))
+    assert len(seen) == 50
+    assert seen.evicted == 950
+
+
+@pytest.mark.parametrize("capacity", [1, 10])
+def test_event_log_keeps_capacity_newest(capacity):
+    events = EventLog(capacity)
+    for i in range(100):
+        events.append({"plate": f"P{i}"})
+    page, after, missed = events.read(0, 100)
+    assert len(events) == capacity
+    assert [event["plate"] for event in page] == [f"P{i}" for i in range(100 - capacity, 100)]
+    assert after == 100 and missed == 100 - capacity
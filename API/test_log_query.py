@@ -0,0 +1,40 @@
+import base64
+import json
+
+import pytest
+
+from log_query import InvalidCursor, LogQuery, decode_cursor, encode_cursor
+
+
+def raw_cursor(value):
+    return base64.urlsafe_b64encode(json.dumps(value).encode()).decode().rstrip("=")
+
+
+@pytest.mark.parametrize("timestamp, key", [
+    ("2024-01-01T00:00:00", "doc-id"),
+    ("2024-01-01T00:00:00", 42),
+    (None, "doc-id"),
+])
+def test_cursor_round_trip(timestamp, key):
+    assert decode_cursor(encode_cursor(timestamp, key)) == (timestamp, key)
+
+
+@pytest.mark.parametrize("cursor", [
+    "not base64 !",
+    raw_cursor({"a": 1}),
+    raw_cursor(["2024-01-01T00:00:00"]),
+    raw_cursor(["2024-01-01T00:00:00", ["a"]]),
+    raw_cursor(["2024-01-01T00:00:00", {"a": 1}]),
+    raw_cursor([["2024"], "doc-id"]),
+    raw_cursor([{"t": 1}, 1]),
+    raw_cursor(["2024-01-01T00:00:00", True]),
+    raw_cursor(["2024-01-01T00:00:00", 1.5]),
+])
+def test_malformed_cursor_is_rejected(cursor):
+    with pytest.raises(InvalidCursor):
+        decode_cursor(cursor)
+
+
+def test_query_key_is_hashable():
+    q = LogQuery(plate="KA01AB1234", cursor=encode_cursor("2024-01-01T00:00:00", "doc-id"))
+    assert hash(q.key())
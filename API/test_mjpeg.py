@@ -0,0 +1,89 @@
+import asyncio
+import threading
+import time
+
+from frame_buffer import FrameRingBuffer
+from mjpeg import MjpegBroadcaster
+
+
+class FakeCamera:
+    """Pushes a frame every few milliseconds while capturing."""
+
+    camera_id = "test"
+
+    def __init__(self):
+        self.viewers = 0
+        self.detecting = False
+        self.buffer = FrameRingBuffer(4)
+        self._thread = None
+        self._stop = threading.Event()
+
+    @property
+    def capturing(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start_capture(self):
+        if not self.capturing:
+            self._stop = threading.Event()
+            self.buffer.open()
+            self._thread = threading.Thread(target=self._capture, args=(self._stop,), daemon=True)
+            self._thread.start()
+        return True
+
+    def _capture(self, stop):
+        while not stop.is_set():
+            self.buffer.push(b"frame")
+            time.sleep(0.005)
+
+    def stop_capture(self, timeout=5.0):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        self.buffer.close()
+
+    def wait_frame(self, after_seq, timeout=1.0):
+        return self.buffer.wait_newer(after_seq, timeout)
+
+
+def broadcaster():
+    mjpeg = MjpegBroadcaster(FakeCamera(), max_fps=0)
+    mjpeg.encode = lambda frame: b"jpeg"
+    return mjpeg
+
+
+async def read_chunks(mjpeg, count):
+    stream = mjpeg.stream()
+    chunks = [await stream.__anext__() for _ in range(count)]
+    await stream.aclose()
+    return chunks
+
+
+def wait_for(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+
+def test_viewers_share_the_encoder():
+    mjpeg = broadcaster()
+
+    async def two_viewers():
+        return await asyncio.gather(read_chunks(mjpeg, 3), read_chunks(mjpeg, 3))
+
+    first, second = asyncio.run(two_viewers())
+    assert first[0].endswith(b"jpeg\r\n") and len(second) == 3
+    assert wait_for(lambda: mjpeg.viewers == 0 and mjpeg.camera.viewers == 0)
+    assert wait_for(lambda: not mjpeg.running)
+
+
+def test_viewer_arriving_while_encoder_stops_gets_frames():
+    mjpeg = broadcaster()
+
+    async def leave_and_rejoin():
+        await read_chunks(mjpeg, 2)
+        # The release runs in the executor; join right behind it
+        await asyncio.sleep(0)
+        return await asyncio.wait_for(read_chunks(mjpeg, 5), 5.0)
+
+    assert len(asyncio.run(leave_and_rejoin())) == 5
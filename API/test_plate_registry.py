@@ -0,0 +1,85 @@
+import pytest
+
+from plate_registry import PlateGrammar, PlateRegistry, PlateResolver, confusion_cost
+
+REGISTERED = "KA01AB1234"
+
+
+@pytest.fixture
+def registry():
+    registry = PlateRegistry()
+    registry.rebuild([REGISTERED, "MH12CD5678"])
+    return registry
+
+
+@pytest.fixture
+def resolver(registry):
+    return PlateResolver(registry, PlateGrammar("IN"))
+
+
+@pytest.mark.parametrize("read", [
+    "KA01AB1235",   # one real substitution
+    "KA01AB9234",
+    "KA01XB1234",
+    "XA01AB1234",
+    "KA01AB12345",  # one character extra
+    "KA01AB123",    # one character missing
+])
+def test_real_edits_are_other_plates(registry, resolver, read):
+    assert registry.match(read) is None
+    assert resolver.resolve(read) != REGISTERED
+
+
+@pytest.mark.parametrize("read", ["KA01A81234", "KA0IAB1234", "KA01A8I234"])
+def test_lookalike_misreads_match(registry, resolver, read):
+    assert registry.match(read) == REGISTERED
+    assert resolver.resolve(read) == REGISTERED
+    assert resolver.registry_corrections == 1
+
+
+def test_too_many_lookalikes_do_not_match(registry):
+    assert registry.match("KA0IA8I234") is None
+
+
+def test_ambiguous_match_is_rejected():
+    registry = PlateRegistry()
+    registry.rebuild(["KA01AB1234", "KA01A8I234"])
+    # One swap away from each
+    assert registry.match("KA01A81234") is None
+
+
+def test_remove_drops_plate(registry):
+    registry.remove(REGISTERED)
+    assert REGISTERED not in registry
+    assert registry.match("KA01A81234") is None
+
+
+def test_confusion_cost():
+    assert confusion_cost("KA01AB1234", "KA01AB1234") == 0
+    assert confusion_cost("KA01A81234", "KA01AB1234") == 1
+    assert confusion_cost("KA01AB1235", "KA01AB1234") is None
+    assert confusion_cost("KA01AB123", "KA01AB1234") is None
+
+
+def test_raw_read_is_logged_on_correction(resolver, caplog):
+    with caplog.at_level("WARNING", logger="plate_registry"):
+        resolver.resolve("KA01A81234")
+    assert "KA01A81234" in caplog.text
+
+
+@pytest.mark.parametrize("region", ["GENERIC", "EU"])
+@pytest.mark.parametrize("read", ["TAXI", "STOP", "EXIT", "BUSSTOP"])
+def test_letter_only_reads_are_not_given_a_digit(region, read):
+    grammar = PlateGrammar(region)
+    assert grammar.correct(read) is None
+    assert PlateResolver(PlateRegistry(), grammar).resolve(read) is None
+
+
+def test_generic_keeps_valid_reads():
+    assert PlateGrammar("GENERIC").correct("AB12") == "AB12"
+
+
+def test_positional_grammar_corrects_lookalikes():
+    grammar = PlateGrammar("IN")
+    assert grammar.correct("KAO1AB1234") == "KA01AB1234"
+    assert grammar.correct("KA01AB12S4") == "KA01AB1254"
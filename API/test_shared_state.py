@@ -0,0 +1,143 @@
+import threading
+import time
+from datetime import datetime
+
+import pytest
+
+from broadcaster import EventBroadcaster, EventRelay
+from shared_state import MemorySharedState, RedisSharedState, worker_id
+
+fakeredis = pytest.importorskip("fakeredis")
+
+
+@pytest.fixture
+def server():
+    return fakeredis.FakeServer()
+
+
+@pytest.fixture
+def state(server):
+    return RedisSharedState(client=fakeredis.FakeRedis(server=server, decode_responses=True), prefix="test:")
+
+
+def other_worker(server):
+    # A second worker process: its own client on the same server
+    return RedisSharedState(client=fakeredis.FakeRedis(server=server, decode_responses=True), prefix="test:")
+
+
+def test_claim_is_exclusive_until_expiry(state, server):
+    other = other_worker(server)
+    assert state.claim("seen:cam:P1", ttl=0.2)
+    assert not other.claim("seen:cam:P1", ttl=0.2)
+    time.sleep(0.3)
+    assert other.claim("seen:cam:P1", ttl=0.2)
+
+
+def test_claim_release(state, server):
+    other = other_worker(server)
+    assert state.claim("seen:cam:P1", ttl=30)
+    state.release("seen:cam:P1")
+    assert other.claim("seen:cam:P1", ttl=30)
+
+
+def test_seen_vehicles_window_shared_between_workers(state, server):
+    now = datetime.utcnow()
+    first, second = state.seen_vehicles("cam"), other_worker(server).seen_vehicles("cam")
+    assert first.claim("KA01AB1234", now, 30)
+    assert not second.claim("KA01AB1234", now, 30)
+    assert second.logged_within("KA01AB1234", now)
+    # Another camera has its own windows
+    assert other_worker(server).seen_vehicles("gate2").claim("KA01AB1234", now, 30)
+
+
+def test_concurrent_claims_have_one_winner(server):
+    winners = []
+
+    def claim():
+        if other_worker(server).claim("seen:cam:P1", ttl=30):
+            winners.append(threading.get_ident())
+
+    threads = [threading.Thread(target=claim) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(winners) == 1
+
+
+def test_lease_owner_renew_and_release(state, server):
+    other = other_worker(server)
+    assert state.acquire_lease("camera:cam", "worker-a", ttl=5)
+    assert state.lease_owner("camera:cam") == "worker-a"
+    assert not other.acquire_lease("camera:cam", "worker-b", ttl=5)
+    # The owner renews its own lease
+    assert state.acquire_lease("camera:cam", "worker-a", ttl=5)
+    # Only the owner can release it
+    other.release_lease("camera:cam", "worker-b")
+    assert state.lease_owner("camera:cam") == "worker-a"
+    state.release_lease("camera:cam", "worker-a")
+    assert state.lease_owner("camera:cam") is None
+    assert other.acquire_lease("camera:cam", "worker-b", ttl=5)
+
+
+def test_expired_lease_is_taken_over(state, server):
+    assert state.acquire_lease("camera:cam", "worker-a", ttl=0.2)
+    time.sleep(0.3)
+    assert other_worker(server).acquire_lease("camera:cam", "worker-b", ttl=5)
+    assert not state.acquire_lease("camera:cam", "worker-a", ttl=5)
+
+
+def test_memory_lease():
+    state = MemorySharedState()
+    assert state.acquire_lease("camera:cam", worker_id(), 5)
+    assert not state.acquire_lease("camera:cam", "elsewhere", 5)
+    state.release_lease("camera:cam", worker_id())
+    assert state.lease_owner("camera:cam") is None
+
+
+def test_plate_state_keeps_newest(state, server):
+    plates, other = state.plate_states(), other_worker(server).plate_states()
+    assert plates.update("P1", "entry", "2024-01-01T10:00:00")
+    assert other.update("P1", "exit", "2024-01-01T10:05:00")
+    assert not plates.update("P1", "entry", "2024-01-01T10:01:00")
+    assert plates.get("P1")["status"] == "exit"
+
+
+def test_event_log_numbering_and_capacity(state):
+    log = state.event_log("live", capacity=3)
+    for i in range(5):
+        log.append({"plate": f"P{i}"})
+    events, after, missed = log.read(0, 10)
+    assert [event["plate"] for event in events] == ["P2", "P3", "P4"]
+    assert [event["seq"] for event in events] == [3, 4, 5]
+    assert after == 5 and missed == 2
+    assert log.read(5, 10) == ([], 5, 0)
+
+
+def test_event_log_wait_wakes_on_append(state, server):
+    log = state.event_log("live")
+    writer = other_worker(server).event_log("live")
+    assert not log.wait(0, timeout=0.05)
+    threading.Timer(0.05, writer.append, args=({"plate": "P1"},)).start()
+    started = time.monotonic()
+    assert log.wait(0, timeout=2.0)
+    assert time.monotonic() - started < 1.0
+    log.close()
+
+
+def test_relay_publishes_appended_events(state, server):
+    broadcaster = EventBroadcaster()
+    received = []
+    broadcaster.publish = received.append
+    relay = EventRelay(state.event_log("live"), broadcaster, interval=5.0, wait_timeout=0.5)
+    relay.start()
+    try:
+        time.sleep(0.1)
+        other_worker(server).event_log("live").append({"plate": "P1"})
+        deadline = time.monotonic() + 2.0
+        while not received and time.monotonic() < deadline:
+            time.sleep(0.01)
+    finally:
+        relay.stop()
+    # Well under the polling interval: the relay was woken by the append
+    assert [event["plate"] for event in received] == ["P1"]
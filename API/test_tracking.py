@@ -0,0 +1,66 @@
+import pytest
+
+import tracking
+from tracking import PlateTracker, read_tracked_plates
+
+BOX = (100, 100, 200, 140)
+
+
+@pytest.fixture
+def fake_ocr(monkeypatch):
+    # Every crop is "sharp" and readable, the readings come from the test
+    readings = []
+    monkeypatch.setattr(tracking, "crop_plates", lambda frame, boxes: [f"crop-{frame}" for _ in boxes])
+    monkeypatch.setattr(tracking, "sharpness", lambda crop: 1.0)
+    monkeypatch.setattr(tracking, "recognize_plates_with_scores",
+                        lambda ocr, crops, min_score: [readings.pop(0) if readings else None for _ in crops])
+    return readings
+
+
+def test_single_reading_is_held_back_while_the_track_lives(fake_ocr):
+    tracker = PlateTracker(max_missed=2)
+    fake_ocr.append(("KA01AB1234", 70))
+    assert read_tracked_plates(tracker, None, ["f0"], [[BOX]]) == [[None]]
+    assert tracker.pop_ended() == []
+
+
+def test_expired_track_releases_its_reading(fake_ocr):
+    tracker = PlateTracker(max_missed=2)
+    fake_ocr.append(("KA01AB1234", 70))
+    assert read_tracked_plates(tracker, None, ["f0"], [[BOX]], tags=[0]) == [[None]]
+    # The vehicle left: no boxes for more than max_missed samples
+    read_tracked_plates(tracker, None, ["f1", "f2", "f3"], [[], [], []], tags=[1, 2, 3])
+    assert tracker.pop_ended() == [("KA01AB1234", "f0", BOX, 0)]
+    assert tracker.tracks == {}
+    assert tracker.plates_emitted == 1
+
+
+def test_flush_releases_pending_readings(fake_ocr):
+    tracker = PlateTracker()
+    fake_ocr.append(("KA01AB1234", 70))
+    read_tracked_plates(tracker, None, ["f0"], [[BOX]], tags=[(0, 0.0)])
+    assert tracker.flush() == [("KA01AB1234", "f0", BOX, (0, 0.0))]
+    assert tracker.tracks == {}
+    assert tracker.flush() == []
+
+
+def test_released_tracks_are_not_released_again(fake_ocr):
+    tracker = PlateTracker()
+    fake_ocr.append(("KA01AB1234", 90))
+    assert read_tracked_plates(tracker, None, ["f0"], [[BOX]]) == [["KA01AB1234"]]
+    assert tracker.flush() == []
+    assert tracker.plates_emitted == 1
+
+
+def test_track_without_readings_ends_silently(fake_ocr):
+    tracker = PlateTracker(max_missed=0)
+    read_tracked_plates(tracker, None, ["f0", "f1"], [[BOX], []])
+    assert tracker.pop_ended() == []
+    assert tracker.flush() == []
+
+
+def test_reading_below_min_score_is_not_released():
+    tracker = PlateTracker(min_score=60)
+    track = tracker.update([BOX])[0]
+    tracker.add_reading(track, ("KA01AB1234", 50))
+    assert tracker.release(track, final=True) is None
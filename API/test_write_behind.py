@@ -0,0 +1,148 @@
+import threading
+
+import pytest
+
+from write_behind import WriteBehindWriter, retry
+
+
+class FakeLogs:
+    def __init__(self, failures=0):
+        self.failures = failures
+        self.batches = []
+
+    def add_many(self, entries):
+        if self.failures:
+            self.failures -= 1
+            raise IOError("write failed")
+        self.batches.append(entries)
+
+    @property
+    def entries(self):
+        return [entry for batch in self.batches for entry in batch]
+
+
+class FakeUpload:
+    def __init__(self, failures=0):
+        self.failures = failures
+        self.names = []
+
+    def __call__(self, snapshot, name):
+        if self.failures:
+            self.failures -= 1
+            raise IOError("upload failed")
+        self.names.append(name)
+        return {"snapshot_url": f"http://blobs/{name}.jpg", "thumbnail_url": f"http://blobs/{name}_thumb.jpg"}
+
+
+def writer(upload=None, logs=None, **options):
+    options.setdefault("backoff", 0)
+    options.setdefault("flush_interval", 0.01)
+    return WriteBehindWriter(upload or FakeUpload(), logs if logs is not None else FakeLogs(), **options)
+
+
+def test_retry_counts_retries():
+    calls = []
+
+    def flaky():
+        calls.append(1)
+        if len(calls) < 3:
+            raise IOError
+        return "ok"
+
+    assert retry(flaky, attempts=3, backoff=0) == ("ok", 2)
+
+
+def test_retry_gives_up():
+    with pytest.raises(IOError):
+        retry(lambda: (_ for _ in ()).throw(IOError()), attempts=2, backoff=0)
+
+
+def test_flush_writes_everything_with_upload_fields():
+    logs = FakeLogs()
+    w = writer(logs=logs, batch_size=4)
+    for i in range(10):
+        assert w.submit(b"jpeg", f"P{i}", {"plate": f"P{i}"})
+    w.flush()
+    assert sorted(entry["plate"] for entry in logs.entries) == [f"P{i}" for i in range(10)]
+    assert all(entry["snapshot_url"] == f"http://blobs/{entry['plate']}.jpg" for entry in logs.entries)
+    assert all(len(batch) <= 4 for batch in logs.batches)
+    stats = w.stats()
+    assert stats["logs_written"] == 10 and stats["uploaded"] == 10 and stats["queue_depth"] == 0
+    w.close()
+
+
+def test_no_snapshot_writes_log_only():
+    logs, upload = FakeLogs(), FakeUpload()
+    w = writer(upload, logs)
+    w.submit(None, "P1", {"plate": "P1", "snapshot_url": "http://blobs/earlier.jpg"})
+    w.flush()
+    assert upload.names == []
+    assert logs.entries[0]["snapshot_url"] == "http://blobs/earlier.jpg"
+    w.close()
+
+
+def test_upload_and_log_write_are_retried():
+    logs, upload = FakeLogs(failures=2), FakeUpload(failures=2)
+    w = writer(upload, logs, attempts=3)
+    w.submit(b"jpeg", "P1", {"plate": "P1"})
+    w.flush()
+    assert logs.entries[0]["snapshot_url"] == "http://blobs/P1.jpg"
+    stats = w.stats()
+    assert stats["retries"] == 4 and stats["upload_failed"] == 0 and stats["log_write_failed"] == 0
+    w.close()
+
+
+def test_failed_upload_still_writes_the_log():
+    logs = FakeLogs()
+    w = writer(FakeUpload(failures=5), logs, attempts=2)
+    w.submit(b"jpeg", "P1", {"plate": "P1"})
+    w.flush()
+    assert logs.entries[0]["snapshot_url"] == "upload_failed"
+    assert w.stats()["upload_failed"] == 1
+    w.close()
+
+
+def test_failed_log_write_is_counted_and_skips_callback():
+    written = []
+    w = writer(logs=FakeLogs(failures=5), attempts=2, on_written=written.extend)
+    w.submit(None, "P1", {"plate": "P1"})
+    w.flush()
+    assert w.stats()["log_write_failed"] == 1
+    assert written == []
+    w.close()
+
+
+def test_on_written_gets_every_entry():
+    written = []
+    w = writer(on_written=written.extend)
+    for i in range(5):
+        w.submit(None, f"P{i}", {"plate": f"P{i}"})
+    w.flush()
+    assert sorted(entry["plate"] for entry in written) == [f"P{i}" for i in range(5)]
+    w.close()
+
+
+def test_full_queue_drops_instead_of_blocking():
+    gate = threading.Event()
+
+    class BlockedLogs(FakeLogs):
+        def add_many(self, entries):
+            gate.wait(5)
+            super().add_many(entries)
+
+    logs = BlockedLogs()
+    w = writer(logs=logs, workers=1, queue_size=2, batch_size=1, put_timeout=0.01)
+    results = [w.submit(None, f"P{i}", {"plate": f"P{i}"}) for i in range(6)]
+    assert not all(results)
+    assert w.stats()["dropped"] == results.count(False)
+    gate.set()
+    w.flush()
+    assert len(logs.entries) == results.count(True)
+    w.close()
+
+
+def test_closed_writer_drops():
+    w = writer()
+    w.close()
+    assert not w.submit(None, "P1", {"plate": "P1"})
+    assert w.stats()["dropped"] == 1
@@ -0,0 +1,244 @@
+import itertools
+import os
+from collections import defaultdict
+
+from plate_ocr import OCR_MIN_SCORE, crop_plates, recognize_plates_with_scores
+from plate_preprocess import sharpness
+
+TRACKING_ENABLED = os.getenv("TRACKING", "1") == "1"
+
+
+def iou(a, b):
+    ix1, iy1 = max(a[0], b[0]), max(a[1], b[1])
+    ix2, iy2 = min(a[2], b[2]), min(a[3], b[3])
+    inter = max(0, ix2 - ix1) * max(0, iy2 - iy1)
+    if inter == 0:
+        return 0.0
+    area_a = (a[2] - a[0]) * (a[3] - a[1])
+    area_b = (b[2] - b[0]) * (b[3] - b[1])
+    return inter / float(area_a + area_b - inter)
+
+
+def centroid_distance(a, b):
+    # Distance between box centres relative to the larger box side
+    ax, ay = (a[0] + a[2]) / 2.0, (a[1] + a[3]) / 2.0
+    bx, by = (b[0] + b[2]) / 2.0, (b[1] + b[3]) / 2.0
+    size = max(a[2] - a[0], a[3] - a[1], b[2] - b[0], b[3] - b[1], 1)
+    return ((ax - bx) ** 2 + (ay - by) ** 2) ** 0.5 / size
+
+
+def vote_plate_text(readings):
+    """Confidence-weighted per-character vote over (text, score) readings of one plate.
+
+    Readings are grouped by length first (the length with the most total score wins), then each
+    position takes the character with the highest summed score. Returns (text, agreement 0..1).
+    """
+    readings = [(t, s) for t, s in readings if t]
+    if not readings:
+        return None, 0.0
+
+    weight_by_length = defaultdict(float)
+    for text, score in readings:
+        weight_by_length[len(text)] += score
+    length = max(weight_by_length, key=weight_by_length.get)
+    same_length = [(t, s) for t, s in readings if len(t) == length]
+
+    chars, agreement = [], []
+    for position in range(length):
+        weights = defaultdict(float)
+        for text, score in same_length:
+            weights[text[position]] += score
+        char = max(weights, key=weights.get)
+        chars.append(char)
+        agreement.append(weights[char] / sum(weights.values()))
+    return "".join(chars), min(agreement) * weight_by_length[length] / sum(weight_by_length.values())
+
+
+class Track:
+    __slots__ = ("track_id", "box", "hits", "missed", "since_ocr", "ocr_count", "best_sharpness",
+                 "readings", "emitted_text", "last_read")
+
+    def __init__(self, track_id, box):
+        self.track_id = track_id
+        self.box = box
+        self.hits = 1
+        self.missed = 0
+        self.since_ocr = 0
+        self.ocr_count = 0
+        self.best_sharpness = 0.0
+        self.readings = []
+        self.emitted_text = None
+        # (frame, box, tag) of the latest reading, so a plate released after the track is gone has a picture
+        self.last_read = None
+
+    def voted_text(self):
+        return vote_plate_text(self.readings)
+
+
+class PlateTracker:
+    """Assigns YOLO boxes to tracks across sampled frames and decides which crops are worth OCR.
+
+    Boxes are matched greedily by IoU, then by centroid distance for fast vehicles whose boxes
+    no longer overlap between samples. A track is OCR'd when it is new, when a crop is sharper
+    than any crop read so far, or every retry_every updates, up to max_ocr times. Its plate is
+    released once (after min_readings readings, or one reading of at least confident_score).
+    A track that ends before that (it expires, or flush() ends the stream) releases whatever it has
+    read above min_score; those plates are collected by pop_ended() / returned by flush().
+    """
+
+    def __init__(self, iou_threshold=0.3, max_centroid_distance=1.5, max_missed=5, max_ocr=3,
+                 min_readings=2, confident_score=85, retry_every=3, min_score=OCR_MIN_SCORE):
+        self.iou_threshold = iou_threshold
+        self.max_centroid_distance = max_centroid_distance
+        self.max_missed = max_missed
+        self.max_ocr = max_ocr
+        self.min_readings = min_readings
+        self.confident_score = confident_score
+        self.retry_every = retry_every
+        self.min_score = min_score
+        self.tracks = {}
+        self.ended = []
+        self._ids = itertools.count(1)
+        self.tracks_created = 0
+        self.ocr_crops = 0
+        self.plates_emitted = 0
+
+    def update(self, boxes):
+        """Match boxes to tracks and return the track for each box, in box order."""
+        tracks = list(self.tracks.values())
+        assigned = [None] * len(boxes)
+        used = set()
+
+        pairs = sorted(
+            ((iou(box, t.box), i, t.track_id) for i, box in enumerate(boxes) for t in tracks),
+            reverse=True,
+        )
+        for overlap, i, track_id in pairs:
+            if overlap < self.iou_threshold:
+                break
+            if assigned[i] is None and track_id not in used:
+                assigned[i] = self.tracks[track_id]
+                used.add(track_id)
+
+        pairs = sorted(
+            (centroid_distance(box, t.box), i, t.track_id)
+            for i, box in enumerate(boxes) if assigned[i] is None
+            for t in tracks if t.track_id not in used
+        )
+        for distance, i, track_id in pairs:
+            if distance > self.max_centroid_distance:
+                break
+            if assigned[i] is None and track_id not in used:
+                assigned[i] = self.tracks[track_id]
+                used.add(track_id)
+
+        for track in tracks:
+            if track.track_id not in used:
+                track.missed += 1
+                if track.missed > self.max_missed:
+                    self._end(track)
+
+        for i, box in enumerate(boxes):
+            track = assigned[i]
+            if track is None:
+                track = assigned[i] = Track(next(self._ids), box)
+                self.tracks[track.track_id] = track
+                self.tracks_created += 1
+            else:
+                track.box = box
+                track.hits += 1
+                track.missed = 0
+                track.since_ocr += 1
+        return assigned
+
+    def wants_ocr(self, track, crop):
+        if track.emitted_text is not None or track.ocr_count >= self.max_ocr:
+            return False
+        crop_sharpness = sharpness(crop)
+        if track.ocr_count and crop_sharpness <= track.best_sharpness and track.since_ocr < self.retry_every:
+            return False
+        track.best_sharpness = max(track.best_sharpness, crop_sharpness)
+        track.ocr_count += 1
+        track.since_ocr = 0
+        self.ocr_crops += 1
+        return True
+
+    def add_reading(self, track, reading):
+        if reading:
+            track.readings.append(reading)
+
+    def release(self, track, final=False):
+        # The voted plate text, returned once per track when the readings are good enough; a final
+        # release (the track is ending) only needs one reading that cleared min_score
+        if track.emitted_text is not None or not track.readings:
+            return None
+        best_score = max(score for _, score in track.readings)
+        enough = len(track.readings) >= self.min_readings
+        confident = best_score >= self.confident_score
+        exhausted = track.ocr_count >= self.max_ocr
+        if not (enough or confident or exhausted or (final and best_score > self.min_score)):
+            return None
+        text, _ = track.voted_text()
+        track.emitted_text = text
+        track.last_read = None
+        self.plates_emitted += 1
+        return text
+
+    def _end(self, track):
+        del self.tracks[track.track_id]
+        last_read = track.last_read
+        text = self.release(track, final=True)
+        if text is not None:
+            frame, box, tag = last_read or (None, track.box, None)
+            self.ended.append((text, frame, box, tag))
+
+    def pop_ended(self):
+        """(text, frame, box, tag) for the plates released by tracks that expired since the last call."""
+        ended, self.ended = self.ended, []
+        return ended
+
+    def flush(self):
+        # End of stream: end every track and return the plates that were still waiting for a reading
+        for track in list(self.tracks.values()):
+            self._end(track)
+        return self.pop_ended()
+
+    def stats(self):
+        return {
+            "active_tracks": len(self.tracks),
+            "tracks_created": self.tracks_created,
+            "ocr_crops": self.ocr_crops,
+            "plates_emitted": self.plates_emitted,
+        }
+
+
+def read_tracked_plates(tracker, ocr, frames, boxes_per_frame, min_score=OCR_MIN_SCORE, tags=None):
+    """Track boxes over a batch of frames, OCR only the crops the tracker asks for (in one call),
+    and return per frame the voted plate text for each box (None when nothing is released).
+
+    tags (one per frame, e.g. its frame number) come back with plates from tracker.pop_ended().
+    """
+    tags = tags or [None] * len(frames)
+    tracks_per_frame, requests = [], []
+    for frame_index, (frame, boxes) in enumerate(zip(frames, boxes_per_frame)):
+        tracks = tracker.update(boxes)
+        tracks_per_frame.append(tracks)
+        for box_index, (crop, track) in enumerate(zip(crop_plates(frame, boxes), tracks)):
+            if crop is not None and tracker.wants_ocr(track, crop):
+                requests.append((frame_index, box_index, crop))
+
+    readings = recognize_plates_with_scores(ocr, [crop for _, _, crop in requests], min_score)
+    readings_by_box = {(f, b): r for (f, b, _), r in zip(requests, readings)}
+
+    texts_per_frame = []
+    for frame_index, tracks in enumerate(tracks_per_frame):
+        texts = []
+        for box_index, track in enumerate(tracks):
+            reading = readings_by_box.get((frame_index, box_index))
+            tracker.add_reading(track, reading)
+            text = tracker.release(track)
+            if reading and text is None:
+                track.last_read = (frames[frame_index], boxes_per_frame[frame_index][box_index], tags[frame_index])
+            texts.append(text)
+        texts_per_frame.append(texts)
+    return texts_per_frame
@@ -0,0 +1,146 @@
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import cv2
+
+from detection import YOLO_BATCH_SIZE, detect_batch, iter_batches, iter_sampled_frames, open_video
+from detector_backends import DETECTOR_BACKEND, create_detector
+from plate_ocr import is_valid_plate_text, recognize_plates_per_frame
+from sampling import create_sampler
+from snapshots import SnapshotEncoder
+from tracking import PlateTracker, read_tracked_plates
+
+VIDEO_WORKERS = int(os.getenv("VIDEO_WORKERS", str(os.cpu_count() or 2)))
+# Chunks shorter than this are not worth a separate worker
+MIN_CHUNK_FRAMES = 1500
+# Each chunk starts decoding this many frames before its range, so the motion sampler and the tracker
+# reach the range in the state a sequential pass would have. Covers the idle stride of the motion
+# sampler (250) and a track's max_missed samples at stride 25 (125)
+CHUNK_OVERLAP_FRAMES = int(os.getenv("CHUNK_OVERLAP_FRAMES", "250"))
+
+# Per-process models, loaded once by init_worker
+_models = {}
+
+
+def init_worker(weights):
+    from paddleocr import PaddleOCR
+
+    _models["yolo"] = create_detector(DETECTOR_BACKEND, weights)
+    _models["ocr"] = PaddleOCR(use_angle_cls=True, use_gpu=False)
+
+
+def create_video_pool(weights, workers=VIDEO_WORKERS):
+    # spawn keeps Firebase/gRPC threads of the API process out of the workers
+    return ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=init_worker,
+        initargs=(weights,),
+    )
+
+
+def split_frame_ranges(total_frames, chunks, min_chunk_frames=MIN_CHUNK_FRAMES):
+    chunks = max(1, min(chunks, total_frames // max(1, min_chunk_frames)))
+    size = -(-total_frames // chunks)
+    return [(start, min(start + size, total_frames)) for start in range(0, total_frames, size)]
+
+
+def count_frames(video_path):
+    cap = cv2.VideoCapture(video_path, cv2.CAP_FFMPEG)
+    try:
+        if not cap.isOpened():
+            return 0
+        return int(cap.get(cv2.CAP_PROP_FRAME_COUNT) or 0)
+    finally:
+        cap.release()
+
+
+def process_chunk(video_path, start_frame, end_frame, stride=25, sampling="fixed", tracking=True,
+                  batch_size=YOLO_BATCH_SIZE, overlap=0):
+    """Detect and read plates in frames [start_frame, end_frame) and return
+    (frame_number, pts_seconds, plate_text, snapshot) for every plate reading, in frame order.
+
+    With overlap, analysis starts up to overlap frames before start_frame to warm up the sampler
+    and tracker; readings from those frames belong to the previous chunk and are dropped.
+    """
+    yolo, ocr = _models["yolo"], _models["ocr"]
+    cap = open_video(video_path)
+    if not cap.isOpened():
+        raise RuntimeError(f"Cannot open video: {video_path}")
+
+    # The fixed stride stays aligned to absolute frame numbers, so chunking samples the same frames;
+    # the motion sampler counts from where it starts, so it starts on a frame aligned to its checks
+    sampler = None if sampling == "fixed" else create_sampler(sampling, stride)
+    align = getattr(sampler, "check_every", stride)
+    warm_start = max(0, start_frame - overlap) // align * align if start_frame else 0
+    if warm_start:
+        cap.set(cv2.CAP_PROP_POS_FRAMES, warm_start)
+    tracker = PlateTracker() if tracking else None
+    encoder = SnapshotEncoder()
+    detections = []
+    try:
+        sampled = iter_sampled_frames(cap, stride, sampler, warm_start, end_frame)
+        for batch in iter_batches(sampled, batch_size):
+            frames = [frame for _, frame, _ in batch]
+            boxes_per_frame = detect_batch(yolo, frames)
+            if tracker is not None:
+                tags = [(frame_number, pts) for frame_number, _, pts in batch]
+                texts_per_frame = read_tracked_plates(tracker, ocr, frames, boxes_per_frame, tags=tags)
+            else:
+                texts_per_frame = recognize_plates_per_frame(ocr, frames, boxes_per_frame)
+            for (frame_number, frame, pts), boxes, texts in zip(batch, boxes_per_frame, texts_per_frame):
+                if frame_number < start_frame:
+                    continue
+                snapshot = None
+                for box, text in zip(boxes, texts):
+                    if not is_valid_plate_text(text):
+                        continue
+                    # Only the compressed snapshot crosses the process boundary, not the raw frame;
+                    # plates of the same frame share its encoded frame and thumbnail
+                    snapshot = encoder.encode(frame, box, base=snapshot)
+                    detections.append((frame_number, pts, text, snapshot))
+            if tracker is not None:
+                detections += ended_detections(tracker.pop_ended(), encoder, start_frame)
+        if tracker is not None:
+            detections += ended_detections(tracker.flush(), encoder, start_frame)
+    finally:
+        cap.release()
+    # Ended tracks are reported at the frame they were last read in, which can be before later releases
+    detections.sort(key=lambda detection: detection[0])
+    return detections
+
+
+def ended_detections(ended, encoder, start_frame):
+    # Plates of tracks that ended before a second reading, as detections at the frame last read
+    detections = []
+    for text, frame, box, (frame_number, pts) in ended:
+        if frame_number >= start_frame and is_valid_plate_text(text):
+            detections.append((frame_number, pts, text, encoder.encode(frame, box)))
+    return detections
+
+
+def submit_chunks(pool, video_path, total_frames, workers=VIDEO_WORKERS, **options):
+    # One future per frame range; merge_detections puts their results back in order
+    return [
+        pool.submit(process_chunk, video_path, start, end, **options)
+        for start, end in split_frame_ranges(total_frames, workers)
+    ]
+
+
+def merge_detections(chunk_results, overlap=0):
+    """All readings in frame order. A track cut by a chunk edge can be released on both sides of it,
+    so a plate reported by the next chunk within overlap frames of the previous chunk's last
+    reading of it is dropped."""
+    merged, last_frame = [], {}
+    for result in chunk_results:
+        # Only readings of earlier chunks count, a chunk's own tracks are released once each
+        earlier = dict(last_frame)
+        for detection in result:
+            frame_number, _, text, _ = detection
+            previous = earlier.get(text)
+            if previous is None or frame_number - previous > overlap:
+                merged.append(detection)
+            last_frame[text] = frame_number
+    merged.sort(key=lambda detection: detection[0])
+    return merged
@@ -0,0 +1,189 @@
+import logging
+import os
+import queue
+import threading
+import time
+
+from metrics import LOG_WRITE_SECONDS, SNAPSHOT_UPLOAD_SECONDS
+
+logger = logging.getLogger(__name__)
+
+WRITER_WORKERS = 2
+WRITER_QUEUE_SIZE = 256
+WRITER_BATCH_SIZE = 20
+
+
+def retry(fn, attempts=3, backoff=0.5, max_backoff=8.0):
+    # Call fn until it succeeds, sleeping backoff, 2*backoff, ... between attempts
+    delay = backoff
+    for attempt in range(1, attempts + 1):
+        try:
+            return fn(), attempt - 1
+        except Exception:
+            if attempt == attempts:
+                raise
+            time.sleep(delay)
+            delay = min(delay * 2, max_backoff)
+
+
+class WriteEvent:
+    __slots__ = ("snapshot", "snapshot_name", "log_entry", "enqueued_at")
+
+    def __init__(self, snapshot, snapshot_name, log_entry):
+        self.snapshot = snapshot
+        self.snapshot_name = snapshot_name
+        self.log_entry = log_entry
+        self.enqueued_at = time.monotonic()
+
+
+class WriteBehindWriter:
+    """Bounded background pipeline that uploads snapshots and batches log writes.
+
+    `upload(snapshot, name)` stores a snapshot and returns the log fields pointing at it
+    (e.g. {"snapshot_url": ...}, see snapshots.SnapshotStore) and `logs` only needs
+    `add_many(entries)` (see storage.py), so both can be local stubs in tests. `on_written(entries)`
+    is called after every successful batch, e.g. to invalidate read caches.
+    """
+
+    def __init__(self, upload, logs, workers=WRITER_WORKERS, queue_size=WRITER_QUEUE_SIZE,
+                 batch_size=WRITER_BATCH_SIZE, flush_interval=0.5, attempts=3, backoff=0.5, put_timeout=0.05,
+                 on_written=None):
+        self.upload = upload
+        self.logs = logs
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.attempts = attempts
+        self.backoff = backoff
+        self.put_timeout = put_timeout
+        self.on_written = on_written
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._stop = threading.Event()
+        self._stats_lock = threading.Lock()
+        self.stats_counters = {
+            "submitted": 0,
+            "dropped": 0,
+            "uploaded": 0,
+            "upload_failed": 0,
+            "logs_written": 0,
+            "log_write_failed": 0,
+            "batches": 0,
+            "retries": 0,
+        }
+        self.worker_count = workers
+        self._workers = []
+        self._workers_pid = None
+        self._workers_lock = threading.Lock()
+
+    def _ensure_workers(self):
+        # Threads start on the first submit of each process: a writer created before a
+        # pre-fork (preload) worker split would otherwise have no threads in the children
+        if self._workers_pid == os.getpid():
+            return
+        with self._workers_lock:
+            if self._workers_pid == os.getpid():
+                return
+            self._workers = [
+                threading.Thread(target=self._run, name=f"write-behind-{i}", daemon=True)
+                for i in range(self.worker_count)
+            ]
+            for worker in self._workers:
+                worker.start()
+            self._workers_pid = os.getpid()
+
+    def _count(self, key, amount=1):
+        with self._stats_lock:
+            self.stats_counters[key] += amount
+
+    def submit(self, snapshot, snapshot_name, log_entry):
+        """Queue a snapshot + log entry; returns False (and counts a drop) if the queue stays full."""
+        if self._stop.is_set():
+            self._count("dropped")
+            return False
+        self._ensure_workers()
+        try:
+            # Brief blocking gives backpressure on bursts, a full queue then drops instead of stalling detection
+            self._queue.put(WriteEvent(snapshot, snapshot_name, log_entry), timeout=self.put_timeout)
+        except queue.Full:
+            self._count("dropped")
+            return False
+        self._count("submitted")
+        return True
+
+    def _next_batch(self):
+        try:
+            events = [self._queue.get(timeout=self.flush_interval)]
+        except queue.Empty:
+            return []
+        deadline = time.monotonic() + self.flush_interval
+        while len(events) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                events.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return events
+
+    def _upload(self, event):
+        if event.snapshot is None:
+            return
+        try:
+            with SNAPSHOT_UPLOAD_SECONDS.time():
+                fields, retries = retry(lambda: self.upload(event.snapshot, event.snapshot_name), self.attempts, self.backoff)
+            event.log_entry.update(fields)
+            self._count("uploaded")
+            self._count("retries", retries)
+        except Exception as e:
+            logger.error("Snapshot upload error: %s", e)
+            event.log_entry["snapshot_url"] = "upload_failed"
+            self._count("upload_failed")
+
+    def _write_logs(self, events):
+        def commit():
+            self.logs.add_many([dict(event.log_entry) for event in events])
+
+        try:
+            with LOG_WRITE_SECONDS.time():
+                _, retries = retry(commit, self.attempts, self.backoff)
+            self._count("logs_written", len(events))
+            self._count("batches")
+            self._count("retries", retries)
+        except Exception as e:
+            logger.error("Log write error: %s", e)
+            self._count("log_write_failed", len(events))
+            return
+        if self.on_written is not None:
+            try:
+                self.on_written([event.log_entry for event in events])
+            except Exception as e:
+                logger.error("Log write callback error: %s", e)
+
+    def _run(self):
+        while not (self._stop.is_set() and self._queue.empty()):
+            events = self._next_batch()
+            if not events:
+                continue
+            try:
+                for event in events:
+                    self._upload(event)
+                self._write_logs(events)
+            finally:
+                for _ in events:
+                    self._queue.task_done()
+
+    def flush(self):
+        # Block until everything queued so far has been written (or has failed)
+        self._queue.join()
+
+    def close(self, timeout=10.0):
+        self._stop.set()
+        for worker in self._workers:
+            worker.join(timeout)
+
+    def stats(self):
+        with self._stats_lock:
+            stats = dict(self.stats_counters)
+        stats["queue_depth"] = self._queue.qsize()
+        stats["queue_capacity"] = self._queue.maxsize
+        return stats